@@ -0,0 +1,368 @@
+"""Long-lived local_agent daemon: warm model clients and capture backend, jobs over a loopback socket."""
+
+from __future__ import annotations
+
+import argparse
+import hmac
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+from local_agent import (
+    MODEL_CLIENT_ARGS,
+    ModelClients,
+    RunResult,
+    build_model_clients,
+    parse_args,
+    run_job,
+    warm_capture_backend,
+)
+
+DEFAULT_ADDRESS = "127.0.0.1:8731"
+TOKEN_ENV = "AGENT_DAEMON_TOKEN"
+MAX_WARM_CLIENTS = 4
+
+JobRunner = Callable[[argparse.Namespace, ModelClients | None], tuple[int, RunResult]]
+
+
+@dataclass(slots=True)
+class DaemonStats:
+    jobs: int = 0
+    failed: int = 0
+    rejected: int = 0
+    client_builds: int = 0
+    client_hits: int = 0
+    warm_seconds: float = 0.0
+
+
+@dataclass(slots=True)
+class _Job:
+    job_id: str
+    argv: list[str]
+    reply: Callable[[dict[str, Any]], None]
+    done: Callable[[], None]
+    enqueued_at: float
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected host:port, got {address!r}")
+    return host, int(port)
+
+
+class AgentDaemon:
+    """Runs install jobs one at a time in a single warm process.
+
+    The desktop is one shared resource, so jobs are queued and executed in
+    order by one worker thread; any number of connections may submit. Model
+    clients (genai client and HTTP pool, retry/hedging executor with its
+    latency histograms, decision cache, tier-0 classifier) are built once per
+    distinct set of MODEL_CLIENT_ARGS and reused, with session history and
+    per-run counters reset between jobs. The capture backend is imported and
+    initialised at startup.
+
+    Every job runs an installer on this desktop, so the daemon refuses to
+    start without a shared secret and answers "bad token" to any request
+    that does not carry it, whatever address it listens on.
+
+    Wire format is one JSON object per line. A client sends
+    {"argv": [...local_agent flags...], "job_id": optional, "token": ...}
+    and receives {"kind": "accepted", ...} and later {"kind": "result",
+    "exit_code": ..., "result": {RunResult}, "queue_s": ..., "run_s": ...}
+    for each job; {"op": "ping"} and {"op": "shutdown"} are also understood.
+    Job flags are appended to the daemon's own agent_args, so they override them.
+    """
+
+    def __init__(
+        self,
+        agent_args: list[str],
+        token: str,
+        address: str = DEFAULT_ADDRESS,
+        runner: JobRunner = run_job,
+    ) -> None:
+        if not token:
+            raise ValueError(f"agent daemon needs a shared secret (--token or ${TOKEN_ENV})")
+        self.agent_args = agent_args
+        self.address = parse_address(address)
+        self.token = token.encode("utf-8")
+        self.runner = runner
+        self.stats = DaemonStats()
+        self._clients: OrderedDict[tuple[Any, ...], ModelClients] = OrderedDict()
+        self._jobs: queue.Queue[_Job | None] = queue.Queue()
+        self._counter = 0
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run_jobs, name="agent-daemon-jobs", daemon=True)
+        self._server: socketserver.ThreadingTCPServer | None = None
+
+    def warm_up(self) -> None:
+        """Import and build everything a job needs before the first one arrives; failures leave that part cold."""
+        started = time.perf_counter()
+        try:
+            warm_capture_backend()
+        except RuntimeError as exc:
+            print(f"agent daemon: capture backend unavailable: {exc}", file=sys.stderr)
+        try:
+            self._clients_for(parse_args(["--file", "-", *self.agent_args]))
+        except Exception as exc:
+            print(f"agent daemon: model clients not warmed: {exc}", file=sys.stderr)
+        self.stats.warm_seconds = round(time.perf_counter() - started, 3)
+
+    def start(self) -> tuple[str, int]:
+        """Bind and serve on background threads; returns the bound (host, port)."""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                daemon._serve_connection(self.rfile, self.wfile)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        self._worker.start()
+        threading.Thread(target=self._server.serve_forever, name="agent-daemon-server", daemon=True).start()
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def wait(self) -> None:
+        self._worker.join()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._jobs.put(None)
+        if self._worker.is_alive():
+            self._worker.join()
+        for clients in self._clients.values():
+            clients.close()
+        self._clients.clear()
+
+    def _serve_connection(self, rfile: Any, wfile: Any) -> None:
+        write_lock = threading.Lock()
+        pending = threading.Semaphore(0)
+        submitted = 0
+
+        def reply(message: dict[str, Any]) -> None:
+            with write_lock:
+                try:
+                    wfile.write((json.dumps(message, ensure_ascii=True) + "\n").encode("utf-8"))
+                    wfile.flush()
+                except OSError:
+                    pass  # Client went away; the job still runs to completion.
+
+        for line in rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply({"kind": "error", "reason": "malformed request"})
+                continue
+            if not isinstance(request, dict):
+                reply({"kind": "error", "reason": "malformed request"})
+                continue
+            if not hmac.compare_digest(str(request.get("token", "")).encode("utf-8"), self.token):
+                self.stats.rejected += 1
+                reply({"kind": "error", "reason": "bad token"})
+                continue
+            op = request.get("op", "run")
+            if op == "ping":
+                reply({"kind": "pong", "queued": self._jobs.qsize(), **asdict(self.stats)})
+            elif op == "shutdown":
+                reply({"kind": "shutting_down"})
+                threading.Thread(target=self.stop, name="agent-daemon-stop", daemon=True).start()
+                break
+            elif op == "run" and isinstance(request.get("argv"), list):
+                with self._lock:
+                    if self._stopping:
+                        reply({"kind": "error", "reason": "daemon is shutting down"})
+                        continue
+                    self._counter += 1
+                    job_id = str(request.get("job_id") or self._counter)
+                    submitted += 1
+                    self._jobs.put(_Job(job_id, [str(a) for a in request["argv"]], reply, pending.release, time.time()))
+                reply({"kind": "accepted", "job_id": job_id, "queued": self._jobs.qsize()})
+            else:
+                reply({"kind": "error", "reason": f"unknown request {op!r}"})
+        # Keep the connection open until every job it submitted has answered.
+        for _ in range(submitted):
+            pending.acquire()
+
+    def _run_jobs(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            started = time.time()
+            try:
+                exit_code, result = self._run_one(job.argv)
+            except Exception as exc:
+                exit_code, result = 2, RunResult(
+                    status="failed",
+                    reason=f"Daemon job crashed: {exc}",
+                    binary_paths=[],
+                    artifacts_dir="",
+                    steps=0,
+                    error_code="daemon_job_failed",
+                )
+            self.stats.jobs += 1
+            if result.status != "success":
+                self.stats.failed += 1
+            job.reply(
+                {
+                    "kind": "result",
+                    "job_id": job.job_id,
+                    "exit_code": exit_code,
+                    "result": asdict(result),
+                    "queue_s": round(started - job.enqueued_at, 3),
+                    "run_s": round(time.time() - started, 3),
+                }
+            )
+            job.done()
+
+    def _run_one(self, argv: list[str]) -> tuple[int, RunResult]:
+        try:
+            args = parse_args([*self.agent_args, *argv])
+        except SystemExit:
+            result = RunResult(
+                status="failed",
+                reason=f"Invalid job arguments: {' '.join(argv)}",
+                binary_paths=[],
+                artifacts_dir="",
+                steps=0,
+                error_code="invalid_arguments",
+            )
+            return 2, result
+        try:
+            clients = self._clients_for(args)
+        except Exception as exc:
+            # Let the job build its own clients so the failure surfaces as its usual RunResult.
+            print(f"agent daemon: model clients unavailable: {exc}", file=sys.stderr)
+            clients = None
+        return self.runner(args, clients)
+
+    def _clients_for(self, args: argparse.Namespace) -> ModelClients:
+        key = tuple(getattr(args, name) for name in MODEL_CLIENT_ARGS)
+        clients = self._clients.get(key)
+        if clients is not None:
+            self._clients.move_to_end(key)
+            self.stats.client_hits += 1
+            return clients
+        clients = build_model_clients(args)
+        self.stats.client_builds += 1
+        self._clients[key] = clients
+        if len(self._clients) > MAX_WARM_CLIENTS:
+            _, evicted = self._clients.popitem(last=False)
+            evicted.close()
+        return clients
+
+
+def _request(address: str, messages: list[dict[str, Any]], timeout: float | None) -> socket.socket:
+    sock = socket.create_connection(parse_address(address), timeout=timeout)
+    sock.sendall(b"".join((json.dumps(message, ensure_ascii=True) + "\n").encode("utf-8") for message in messages))
+    return sock
+
+
+def submit_job(
+    address: str,
+    argv: list[str],
+    token: str | None = None,
+    timeout: float | None = None,
+) -> tuple[int, RunResult]:
+    """Send one job to a daemon and block until its RunResult arrives.
+
+    timeout bounds the whole exchange, not each read: a daemon that keeps
+    sending lines still raises TimeoutError once it has passed.
+    """
+    message: dict[str, Any] = {"argv": argv}
+    if token:
+        message["token"] = token
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    with _request(address, [message], timeout) as sock, sock.makefile("rb") as reader:
+        while True:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"agent daemon job still running after {timeout:g}s")
+                sock.settimeout(remaining)
+            line = reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            if reply.get("kind") == "error":
+                raise RuntimeError(f"agent daemon refused job: {reply.get('reason')}")
+            if reply.get("kind") == "result":
+                return int(reply["exit_code"]), RunResult(**reply["result"])
+    raise RuntimeError("agent daemon closed the connection before returning a result")
+
+
+def control(address: str, op: str, token: str | None = None, timeout: float | None = 10.0) -> dict[str, Any]:
+    message: dict[str, Any] = {"op": op}
+    if token:
+        message["token"] = token
+    with _request(address, [message], timeout) as sock, sock.makefile("rb") as reader:
+        line = reader.readline()
+    if not line:
+        raise RuntimeError("agent daemon closed the connection without replying")
+    return json.loads(line)
+
+
+def parse_cli(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run local_agent as a warm daemon and submit jobs to it")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port to listen on or connect to")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV),
+        help=f"Shared secret every request must carry; required to serve (default ${TOKEN_ENV})",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Warm up and run jobs until stopped")
+    serve.add_argument("agent_args", nargs=argparse.REMAINDER, help="Default local_agent flags after --")
+    submit = sub.add_parser("submit", help="Run one job on the daemon and print its RunResult")
+    submit.add_argument("--timeout", type=float, default=None, help="Give up after this many seconds")
+    submit.add_argument("agent_args", nargs=argparse.REMAINDER, help="local_agent flags after --, e.g. --file x.exe")
+    sub.add_parser("ping", help="Print daemon status")
+    sub.add_parser("stop", help="Stop the daemon once queued jobs finish")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_cli(sys.argv[1:] if argv is None else argv)
+    agent_args = [a for a in getattr(args, "agent_args", []) if a != "--"]
+    if args.command == "serve":
+        try:
+            daemon = AgentDaemon(agent_args, args.token, address=args.address)
+        except ValueError as exc:
+            print(f"agent daemon: {exc}", file=sys.stderr)
+            return 2
+        daemon.warm_up()
+        host, port = daemon.start()
+        print(f"agent daemon listening on {host}:{port} (warm-up {daemon.stats.warm_seconds:.2f}s)", file=sys.stderr)
+        try:
+            daemon.wait()
+        except KeyboardInterrupt:
+            daemon.stop()
+        return 0
+    if args.command == "submit":
+        exit_code, result = submit_job(args.address, agent_args, token=args.token, timeout=args.timeout)
+        print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
+        return exit_code
+    print(json.dumps(control(args.address, "shutdown" if args.command == "stop" else "ping", token=args.token)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""End-to-end agent loop benchmark against the simulated installer wizard.
+
+Runs on any platform (no Windows, screen or model key needed). Run from the
+repository root:
+
+    python -m benchmarks.end_to_end [--installs 3] [--brain-latency-ms 800]
+    python -m benchmarks.end_to_end --save-baseline
+
+Each install drives StepPipeline through a fresh SimulatedWizard with a
+FakeBrain, using local_agent's default flags plus any --agent-args. Reports
+steps/sec, wall time per install and peak Python heap per run (measured in a
+separate tracemalloc run so tracing overhead does not skew the timings), and
+compares them with the stored baseline; the exit status is 1 when a metric
+regresses by more than --tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import shlex
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from installer_sim import DEFAULT_PAGES, FakeBrain, SimulatedRun, SimulatedWizard, run_simulated_install
+from model_client import lognormal_latency
+
+BASELINE_PATH = Path(__file__).with_name("baselines") / "end_to_end.json"
+# Metric name -> True when higher is better.
+METRICS = {"steps_per_s": True, "wall_s_mean": False, "wall_s_max": False, "peak_heap_mib": False}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop end to end on a simulated wizard")
+    parser.add_argument("--installs", type=int, default=3, help="Timed installs")
+    parser.add_argument("--brain-latency-ms", type=float, default=800.0, help="Median fake model latency")
+    parser.add_argument("--progress-seconds", type=float, default=6.0, help="Duration of the install progress page")
+    parser.add_argument("--agent-args", default="", help="Extra local_agent flags, e.g. '--stream --fixed-delay'")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression per metric")
+    return parser.parse_args()
+
+
+def install_once(args: argparse.Namespace, seed: int, root: Path) -> SimulatedRun:
+    pages = tuple(
+        dataclasses.replace(page, progress_seconds=args.progress_seconds) if page.progress_seconds else page
+        for page in DEFAULT_PAGES
+    )
+    wizard = SimulatedWizard(pages)
+    brain = FakeBrain(wizard, lognormal_latency(args.brain_latency_ms, sigma=0.25), seed=seed)
+    run = run_simulated_install(wizard, brain, root / f"install-{seed}", shlex.split(args.agent_args))
+    if run.status != "success":
+        raise RuntimeError(f"simulated install {seed} ended with {run.status}: {run.reason}")
+    return run
+
+
+def measure(args: argparse.Namespace) -> dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix="e2e-bench-") as tmp:
+        root = Path(tmp)
+        runs = [install_once(args, args.seed + index, root) for index in range(args.installs)]
+        tracemalloc.start()
+        install_once(args, args.seed + args.installs, root)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    walls = [run.wall_s for run in runs]
+    for index, run in enumerate(runs, start=1):
+        keys = " ".join(run.keys)
+        print(f"install {index}: {run.steps} steps in {run.wall_s:.2f}s, {run.frames} frames, keys {keys}")
+    return {
+        "steps_per_s": round(sum(run.steps for run in runs) / sum(walls), 4),
+        "wall_s_mean": round(statistics.fmean(walls), 3),
+        "wall_s_max": round(max(walls), 3),
+        "peak_heap_mib": round(peak / (1 << 20), 2),
+    }
+
+
+def compare(metrics: dict[str, float], baseline: dict[str, float], tolerance: float) -> list[str]:
+    regressions: list[str] = []
+    print(f"{'metric':<14} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, higher_is_better in METRICS.items():
+        before = baseline.get(name)
+        after = metrics[name]
+        if not before:
+            print(f"{name:<14} {'-':>10} {after:>10.3f} {'-':>8}")
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"{name:<14} {before:>10.3f} {after:>10.3f} {change * 100:>7.1f}%{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    args = parse_args()
+    config = {
+        "installs": args.installs,
+        "brain_latency_ms": args.brain_latency_ms,
+        "progress_seconds": args.progress_seconds,
+        "agent_args": args.agent_args,
+        "seed": args.seed,
+    }
+    started = time.perf_counter()
+    metrics = measure(args)
+    print(f"benchmark took {time.perf_counter() - started:.1f}s")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({"config": config, "metrics": metrics}, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline written to {baseline_path}")
+        for name, value in metrics.items():
+            print(f"{name:<14} {value:>10.3f}")
+        return 0
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path}; run with --save-baseline first")
+        compare(metrics, {}, args.tolerance)
+        return 0
+    stored = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if stored.get("config") != config:
+        print(f"warning: baseline was recorded with {stored.get('config')}")
+    regressions = compare(metrics, stored.get("metrics", {}), args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
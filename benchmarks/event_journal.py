@@ -0,0 +1,108 @@
+"""Compare EventJournal with the per-event open/append/close events.jsonl writer it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.event_journal [--events 20000] [--events-per-step 4] [--dir /mnt/shared]
+
+"caller us/event" is the time the step loop spends per event (what sits on its
+critical path); "events/s" covers the whole run until every event is on disk.
+Point --dir at a network or shared volume to see the small-write cost there.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from event_journal import EventJournal
+
+
+def legacy_write_jsonl(path: Path, payload: dict[str, Any]) -> None:
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(payload, ensure_ascii=True) + "\n")
+
+
+def decision_event(step: int) -> dict[str, Any]:
+    return {
+        "step": step,
+        "observation": {
+            "step_index": step,
+            "screenshot_path": f"/runs/run-1/screenshots/step-{step:03d}.png",
+            "state_hash": f"{step:064x}",
+            "window_title": "Example App Setup",
+            "timestamp": 1_760_000_000.0 + step,
+            "ocr_text": "License Agreement. Please read the following license agreement carefully. " * 4,
+            "intent": "license",
+        },
+        "decision": {
+            "intent": "license",
+            "confidence": 0.93,
+            "done": False,
+            "needs_human": False,
+            "reason": "License page with accept radio",
+            "actions": [{"keys": ["alt", "a"], "reason": "accept"}, {"keys": ["alt", "n"], "reason": "next"}],
+        },
+        "source": "model",
+        "upload": {"bytes": 48211, "mime_type": "image/png", "encode_ms": 11.8, "model_ms": 812.4},
+    }
+
+
+def run_legacy(path: Path, events: int, per_step: int) -> tuple[float, float]:
+    caller = 0.0
+    started = time.perf_counter()
+    for index in range(events):
+        payload = decision_event(index // per_step)
+        before = time.perf_counter()
+        legacy_write_jsonl(path, payload)
+        caller += time.perf_counter() - before
+    return caller, time.perf_counter() - started
+
+
+def run_journal(path: Path, events: int, per_step: int, **kwargs: Any) -> tuple[float, float]:
+    caller = 0.0
+    started = time.perf_counter()
+    journal = EventJournal(path, **kwargs)
+    for index in range(events):
+        payload = decision_event(index // per_step)
+        before = time.perf_counter()
+        if index % per_step == 0:
+            journal.mark_step()
+        journal.write(payload)
+        caller += time.perf_counter() - before
+    journal.close()
+    return caller, time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the buffered event journal")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--events-per-step", type=int, default=4)
+    parser.add_argument("--dir", default=None, help="Directory to write into (default: a temporary directory)")
+    args = parser.parse_args()
+
+    variants = {
+        "write_jsonl (legacy)": lambda path: run_legacy(path, args.events, args.events_per_step),
+        "journal flush=step": lambda path: run_journal(path, args.events, args.events_per_step, flush="step"),
+        "journal flush=interval": lambda path: run_journal(path, args.events, args.events_per_step, flush="interval"),
+        "journal flush=exit": lambda path: run_journal(path, args.events, args.events_per_step, flush="exit"),
+        "journal step+fsync": lambda path: run_journal(
+            path, args.events, args.events_per_step, flush="step", fsync=True
+        ),
+    }
+    print(f"{args.events} events, {args.events_per_step} per step")
+    print(f"{'writer':<24} {'caller us/event':>16} {'events/s':>10} {'file bytes':>11}")
+    with tempfile.TemporaryDirectory(prefix="journal-bench-", dir=args.dir) as tmp:
+        for index, (name, run) in enumerate(variants.items()):
+            path = Path(tmp) / f"events-{index}.jsonl"
+            caller, total = run(path)
+            size = path.stat().st_size
+            print(f"{name:<24} {caller / args.events * 1e6:>16.2f} {args.events / total:>10.0f} {size:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""Measure screenshot storage with the frame store against one file per step.
+
+Drives the simulated installer wizard through every page, capturing each page
+--repeats times (as a stalled screen does) and the progress page as its bar
+advances. Run from the repository root:
+
+    python -m benchmarks.frame_store [--repeats 4] [--progress-seconds 2] [--preset full]
+
+"stored" is what lands under frames/objects; "legacy" is the sum of the
+step-NNN files the previous writer produced for the same captures.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import tempfile
+import time
+from pathlib import Path
+
+from frame_store import FrameReader, FrameStore
+from image_pipeline import PRESETS, EncodedImage, preprocess
+from installer_sim import DEFAULT_PAGES, SimulatedWizard
+
+
+def capture_frames(repeats: int, progress_seconds: float, preset: str) -> list[EncodedImage]:
+    pages = tuple(
+        dataclasses.replace(page, progress_seconds=progress_seconds) if page.progress_seconds else page
+        for page in DEFAULT_PAGES
+    )
+    wizard = SimulatedWizard(pages, transition_seconds=0.01)
+    wizard.start()
+    frames: list[EncodedImage] = []
+
+    def grab() -> None:
+        frames.append(preprocess(wizard.screenshot(), PRESETS[preset]))
+
+    while (page := wizard.page()) is not None:
+        if page.progress_seconds:
+            while wizard.page() is page:
+                grab()
+                time.sleep(progress_seconds / 40)
+            continue
+        for _ in range(repeats):
+            grab()
+        for combo in page.accept_keys[:1]:
+            wizard.hotkey(*combo.split("+"))
+            grab()
+        wizard.hotkey(*page.next_keys[0].split("+"))
+        time.sleep(wizard.transition_seconds * 2)
+    return frames
+
+
+def store_frames(root: Path, frames: list[EncodedImage], max_delta_fraction: float) -> tuple[dict, float, float]:
+    started = time.perf_counter()
+    store = FrameStore(root, max_delta_fraction=max_delta_fraction)
+    for index, encoded in enumerate(frames):
+        store.submit(f"step-{index:03d}", encoded.data, encoded.mime_type)
+    report = store.close().report()
+    store_s = time.perf_counter() - started
+    reader = FrameReader(root)
+    started = time.perf_counter()
+    for name in reader.names():
+        reader.load(name)
+    return report, store_s, time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the content-addressed screenshot store")
+    parser.add_argument("--repeats", type=int, default=4, help="Captures per static page")
+    parser.add_argument("--progress-seconds", type=float, default=2.0)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="full")
+    args = parser.parse_args()
+
+    frames = capture_frames(args.repeats, args.progress_seconds, args.preset)
+    legacy = sum(len(encoded.data) for encoded in frames)
+    print(f"{len(frames)} frames, legacy step files {legacy} bytes")
+    print(
+        f"{'store':<18} {'stored bytes':>12} {'saved':>7} {'keys':>5} {'dups':>5} {'deltas':>6} "
+        f"{'store ms/frame':>15} {'load ms/frame':>14}"
+    )
+    with tempfile.TemporaryDirectory(prefix="frame-store-bench-") as tmp:
+        for name, fraction in (("dedupe only", 0.0), ("dedupe + deltas", 0.3)):
+            report, store_s, load_s = store_frames(Path(tmp) / name.replace(" ", ""), frames, fraction)
+            print(
+                f"{name:<18} {report['stored_bytes']:>12} {report['saved_fraction']:>7.1%} {report['keyframes']:>5} "
+                f"{report['duplicates']:>5} {report['deltas']:>6} {store_s / len(frames) * 1000:>15.2f} "
+                f"{load_s / len(frames) * 1000:>14.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+"""Compare snapshot-diff binary discovery with directory walking on a synthetic tree.
+
+Run from the repository root:
+
+    python -m benchmarks.fs_snapshot --dirs 20000 --files-per-dir 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from fs_snapshot import FsSnapshot
+from local_agent import discover_binary_candidates
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark snapshot diff vs directory walk")
+    parser.add_argument("--dirs", type=int, default=20000, help="Directories in the synthetic tree")
+    parser.add_argument("--files-per-dir", type=int, default=8, help="Files per directory")
+    parser.add_argument("--fanout", type=int, default=12, help="Subdirectories per directory")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic tree")
+    return parser.parse_args()
+
+
+def build_tree(root: Path, dirs: int, files_per_dir: int, fanout: int, rng: random.Random) -> None:
+    queue = [root]
+    created = 0
+    while queue and created < dirs:
+        parent = queue.pop(0)
+        for index in range(fanout):
+            if created >= dirs:
+                break
+            child = parent / f"vendor{created:05d}-{index}"
+            child.mkdir()
+            created += 1
+            queue.append(child)
+            for number in range(files_per_dir):
+                suffix = ".exe" if rng.random() < 0.2 else ".dll"
+                (child / f"file{number}{suffix}").write_bytes(b"x" * rng.randint(1, 64))
+
+
+def timed(label: str, func: Callable[..., Any], *args: Any) -> tuple[str, float, Any]:
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    return label, elapsed, result
+
+
+def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    base = Path(tempfile.mkdtemp(prefix="fs-snapshot-bench-"))
+    program_files = base / "Program Files"
+    program_files.mkdir()
+    try:
+        build_tree(program_files, args.dirs, args.files_per_dir, args.fanout, rng)
+        roots = [str(program_files)]
+        index_path = base / "fs-snapshot.json"
+        _, build_seconds, snapshot = timed("build", FsSnapshot.build, roots)
+        snapshot.save(index_path)
+
+        install_dir = program_files / "Acme Tools" / "bin"
+        install_dir.mkdir(parents=True)
+        (install_dir / "acme.exe").write_bytes(b"MZ")
+        nested = sorted(program_files.iterdir())[3]
+        (nested / "helper-service.exe").write_bytes(b"MZ")
+
+        os.environ["ProgramFiles"] = str(program_files)
+        os.environ.pop("ProgramFiles(x86)", None)
+        os.environ.pop("LocalAppData", None)
+        rows = [
+            timed("legacy stem walk", discover_binary_candidates, Path("Acme Tools setup.exe")),
+            timed("full rglob", lambda: [str(p) for p in program_files.rglob("*.exe")]),
+            timed("snapshot load", FsSnapshot.load, index_path, roots),
+        ]
+        loaded = rows[-1][2]
+        rows.append(timed("snapshot diff", loaded.refresh))
+
+        print(f"synthetic tree: {len(snapshot.dirs)} dirs under {program_files}")
+        print(f"initial snapshot build: {build_seconds * 1000:.1f} ms")
+        print(f"{'method':<18} {'ms':>10} {'found':>8}")
+        for label, seconds, result in rows:
+            found = len(result) if isinstance(result, list) else "-"
+            print(f"{label:<18} {seconds * 1000:>10.1f} {found!s:>8}")
+        diff = rows[-1][2]
+        print("snapshot diff found:", *diff, sep="\n  ")
+        print(f"dirs statted {loaded.last_stats.dirs_statted}, listed {loaded.last_stats.dirs_listed}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(base, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+"""Tail latency of model calls with and without hedging, against a simulated client.
+
+Run from the repository root:
+
+    python -m benchmarks.hedging [--calls 400] [--median-ms 40] [--tail-prob 0.03] [--tail-factor 6]
+
+Latencies are scaled down (tens of ms instead of seconds) so the run is quick;
+only the shape of the distribution matters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+
+from google.genai import types
+
+from model_client import SimulatedClient, lognormal_latency
+from request_executor import RequestPolicy, ResilientClient
+
+REPLY = json.dumps(
+    {
+        "ocr_text": "",
+        "language": "en",
+        "intent": "license",
+        "done": False,
+        "needs_human": False,
+        "confidence": 0.9,
+        "reason": "",
+        "actions": [],
+    }
+)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(args: argparse.Namespace, hedge: bool) -> tuple[list[float], ResilientClient]:
+    simulated = SimulatedClient(
+        [REPLY],
+        lognormal_latency(args.median_ms, args.sigma, args.tail_prob, args.tail_factor),
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    policy = RequestPolicy(deadline=30.0, attempt_timeout=10.0, backoff_base=0.01, hedge=hedge)
+    client = ResilientClient(simulated, policy, seed=args.seed)
+    contents = [types.Content(role="user", parts=[types.Part.from_text(text="step")])]
+    config = types.GenerateContentConfig()
+    latencies: list[float] = []
+    for _ in range(args.calls):
+        started = time.perf_counter()
+        client.generate("simulated", contents, config)
+        latencies.append((time.perf_counter() - started) * 1000)
+    client.close()
+    return latencies, client
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hedged model requests")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--median-ms", type=float, default=40.0)
+    parser.add_argument("--sigma", type=float, default=0.3)
+    parser.add_argument("--tail-prob", type=float, default=0.03, help="Probability of a slow-mode response")
+    parser.add_argument("--tail-factor", type=float, default=6.0, help="Slow-mode latency multiplier")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="Transient (retryable) failure rate")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'requests/call':>14} {'hedge wins':>11}"
+    )
+    for hedge in (False, True):
+        latencies, client = run(args, hedge)
+        stats = client.stats
+        print(
+            f"{'hedged' if hedge else 'plain':<10} {statistics.median(latencies):>8.1f} "
+            f"{percentile(latencies, 0.95):>8.1f} {percentile(latencies, 0.99):>8.1f} {max(latencies):>8.1f} "
+            f"{stats.attempts / stats.calls:>14.2f} {stats.hedge_wins:>11}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+"""Benchmark screenshot preprocessing presets against stored .agent_runs screenshots.
+
+Run from the repository root:
+
+    python -m benchmarks.image_presets --artifacts-dir .agent_runs [--with-model]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from brain_agent import BrainDecision, GeminiBrain
+from event_journal import read_events
+from frame_store import frame_refs, load_frame, read_frame
+from image_pipeline import PRESETS, preprocess
+
+
+@dataclass(slots=True)
+class PresetStats:
+    sizes: list[int] = field(default_factory=list)
+    encode_ms: list[float] = field(default_factory=list)
+    model_ms: list[float] = field(default_factory=list)
+    agreements: int = 0
+    compared: int = 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing presets")
+    parser.add_argument("--artifacts-dir", default=".agent_runs", help="Directory containing run-* folders")
+    parser.add_argument("--limit", type=int, default=200, help="Maximum screenshots to process")
+    parser.add_argument("--presets", nargs="*", default=sorted(PRESETS), help="Presets to compare")
+    parser.add_argument(
+        "--with-model",
+        action="store_true",
+        help="Also ask Gemini for each preset and measure decision agreement with the full-resolution baseline",
+    )
+    parser.add_argument("--model", default="gemini-3-flash-preview", help="Gemini model")
+    parser.add_argument("--gemini-api-key", default=None, help="Gemini API key override")
+    return parser.parse_args()
+
+
+def load_window_titles(run_dir: Path) -> dict[str, str]:
+    titles: dict[str, str] = {}
+    # read_events also walks the rotated .gz segments a long run leaves behind.
+    for event in read_events(run_dir / "events.jsonl"):
+        observation = event.get("observation")
+        if isinstance(observation, dict):
+            titles[Path(observation.get("screenshot_path", "")).name] = observation.get("window_title", "")
+    return titles
+
+
+def collect_screenshots(artifacts_dir: Path, limit: int) -> list[tuple[Path, str]]:
+    found: list[tuple[Path, str]] = []
+    for run_dir in sorted(artifacts_dir.glob("run-*")):
+        titles = load_window_titles(run_dir)
+        for path in frame_refs(run_dir):
+            found.append((path, titles.get(path.name, "")))
+            if len(found) >= limit:
+                return found
+    return found
+
+
+def decision_key(decision: BrainDecision) -> tuple[str, tuple[tuple[str, ...], ...]]:
+    return decision.intent, tuple(tuple(a.keys) for a in decision.actions)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main() -> int:
+    args = parse_args()
+    screenshots = collect_screenshots(Path(args.artifacts_dir), args.limit)
+    if not screenshots:
+        print(f"No screenshots found under {args.artifacts_dir}")
+        return 1
+
+    brain = None
+    if args.with_model:
+        brain = GeminiBrain(api_key=args.gemini_api_key, model=args.model)
+
+    stats = {name: PresetStats() for name in args.presets}
+    for path, window_title in screenshots:
+        with load_frame(path) as source:
+            image = source.convert("RGB")
+        baseline_key = None
+        if brain is not None:
+            context = {"window_title": window_title, "previous_ocr": "", "recent_actions": []}
+            baseline_key = decision_key(brain.analyze_step(image_bytes=read_frame(path), context=context))
+
+        for name in args.presets:
+            encoded = preprocess(image, PRESETS[name])
+            entry = stats[name]
+            entry.sizes.append(len(encoded.data))
+            entry.encode_ms.append(encoded.encode_seconds * 1000)
+            if brain is None or baseline_key is None:
+                continue
+            started = time.perf_counter()
+            decision = brain.analyze_step(image_bytes=encoded.data, context=context, mime_type=encoded.mime_type)
+            entry.model_ms.append((time.perf_counter() - started) * 1000)
+            entry.compared += 1
+            entry.agreements += int(decision_key(decision) == baseline_key)
+
+    print(f"{len(screenshots)} screenshots from {args.artifacts_dir}")
+    header = f"{'preset':<10} {'mean KiB':>10} {'p95 KiB':>10} {'enc p50 ms':>11} {'enc p95 ms':>11}"
+    if brain is not None:
+        header += f" {'model p50 ms':>13} {'agreement':>10}"
+    print(header)
+    for name in args.presets:
+        entry = stats[name]
+        row = (
+            f"{name:<10} {statistics.fmean(entry.sizes) / 1024:>10.1f} "
+            f"{percentile(entry.sizes, 0.95) / 1024:>10.1f} "
+            f"{percentile(entry.encode_ms, 0.5):>11.2f} {percentile(entry.encode_ms, 0.95):>11.2f}"
+        )
+        if brain is not None:
+            agreement = entry.agreements / entry.compared if entry.compared else 0.0
+            row += f" {percentile(entry.model_ms, 0.5):>13.1f} {agreement:>10.1%}"
+        print(row)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
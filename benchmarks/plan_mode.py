@@ -0,0 +1,83 @@
+"""Model calls and wall time per install: plan-ahead mode against one model call per screen.
+
+Runs on any platform (no Windows, screen or model key needed). Run from the
+repository root:
+
+    python -m benchmarks.plan_mode [--installs 3] [--brain-latency-ms 800]
+
+Every install drives StepPipeline through a fresh SimulatedWizard with a
+FakeBrain. "per-screen" is the default loop; "plan" adds --plan, so the
+first reply carries a plan of the following pages and later pages are
+verified against the window's control captions and layout instead of
+calling the model; "plan, 1 miss" leaves the destination page out of every
+plan, as a model that did not anticipate it would, forcing one re-plan.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import shlex
+import statistics
+import tempfile
+from pathlib import Path
+
+from installer_sim import DEFAULT_PAGES, FakeBrain, SimulatedWizard, run_simulated_install
+from model_client import lognormal_latency
+
+MODES = (
+    ("per-screen", [], ()),
+    ("plan", ["--plan"], ()),
+    ("plan, 1 miss", ["--plan"], ("path",)),
+)
+
+
+def install_once(
+    args: argparse.Namespace,
+    agent_args: list[str],
+    unplanned: tuple[str, ...],
+    seed: int,
+    root: Path,
+) -> tuple[float, int, int]:
+    pages = tuple(
+        dataclasses.replace(page, progress_seconds=args.progress_seconds) if page.progress_seconds else page
+        for page in DEFAULT_PAGES
+    )
+    wizard = SimulatedWizard(pages)
+    brain = FakeBrain(wizard, lognormal_latency(args.brain_latency_ms, sigma=0.25), seed=seed, unplanned=unplanned)
+    run = run_simulated_install(wizard, brain, root, [*agent_args, *shlex.split(args.agent_args)])
+    if run.status != "success":
+        raise RuntimeError(f"simulated install {seed} ended with {run.status}: {run.reason}")
+    return run.wall_s, brain.calls, run.steps
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark plan-ahead mode on a simulated wizard")
+    parser.add_argument("--installs", type=int, default=3, help="Installs per mode")
+    parser.add_argument("--brain-latency-ms", type=float, default=800.0, help="Median fake model latency")
+    parser.add_argument("--progress-seconds", type=float, default=3.0, help="Duration of the install progress page")
+    parser.add_argument("--agent-args", default="", help="Extra local_agent flags for every mode")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14} {'steps':>6} {'model calls':>12} {'wall s mean':>12} {'wall s max':>11} {'vs per-screen':>14}")
+    baseline = 0.0
+    with tempfile.TemporaryDirectory(prefix="plan-bench-") as tmp:
+        for name, agent_args, unplanned in MODES:
+            runs = [
+                install_once(args, agent_args, unplanned, args.seed + index, Path(tmp) / f"{name}-{index}")
+                for index in range(args.installs)
+            ]
+            walls = [wall for wall, _, _ in runs]
+            mean = statistics.fmean(walls)
+            baseline = baseline or mean
+            print(
+                f"{name:<14} {statistics.fmean(steps for _, _, steps in runs):>6.1f} "
+                f"{statistics.fmean(calls for _, calls, _ in runs):>12.1f} {mean:>12.2f} {max(walls):>11.2f} "
+                f"{(mean - baseline) / baseline:>13.1%}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+"""Remote agent over loopback: link bytes per step and round-trip latency against a local run.
+
+Runs on any platform (no Windows, VM, screen or model key needed). Run from
+the repository root:
+
+    python -m benchmarks.remote_agent [--brain-latency-ms 300] [--drop-after 6]
+
+A RemoteAgent whose screen and windows are a SimulatedWizard dials a
+RemoteController on 127.0.0.1, and StepPipeline drives the install from the
+controller with a FakeBrain, exactly as run_remote_install does against a
+VM. "keyframes" sends every capture as a full PNG; "deltas" sends dirty
+rectangles when they cover at most 30% of the frame. --drop-after N closes
+the guest's connection after its Nth frame to exercise reconnect and resend.
+"local" is the same install through installer_sim without the link.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any
+
+from installer_sim import DEFAULT_PAGES, FakeBrain, SimulatedWizard, run_simulated_install
+from model_client import lognormal_latency
+from remote_agent import RemoteAgent
+from remote_controller import RemoteController, run_remote_install
+
+
+def make_wizard(progress_seconds: float) -> SimulatedWizard:
+    pages = tuple(
+        dataclasses.replace(page, progress_seconds=progress_seconds) if page.progress_seconds else page
+        for page in DEFAULT_PAGES
+    )
+    return SimulatedWizard(pages)
+
+
+def drop_after(controller: RemoteController, agent: RemoteAgent, frames: int, done: threading.Event) -> None:
+    while not done.wait(0.005):
+        if controller.stats.keyframes + controller.stats.deltas >= frames:
+            agent.drop_link()
+            return
+
+
+def remote_once(args: argparse.Namespace, fraction: float, root: Path) -> dict[str, Any]:
+    wizard = make_wizard(args.progress_seconds)
+    brain = FakeBrain(wizard, lognormal_latency(args.brain_latency_ms, sigma=0.25), seed=args.seed)
+    controller = RemoteController("127.0.0.1:0", heartbeat=args.heartbeat)
+    host, port = controller.address
+
+    def launch(_file: str, _run_as_admin: bool) -> tuple[SimulatedWizard, int]:
+        wizard.start()
+        return wizard, wizard.pid
+
+    agent = RemoteAgent(
+        f"{host}:{port}",
+        screen=wizard,
+        windows=wizard.windows,
+        launcher=launch,
+        heartbeat=args.heartbeat,
+        max_delta_fraction=fraction,
+        reconnect_delay=0.05,
+    )
+    guest = threading.Thread(target=agent.run, name="remote-agent", daemon=True)
+    guest.start()
+    done = threading.Event()
+    if args.drop_after:
+        threading.Thread(target=drop_after, args=(controller, agent, args.drop_after, done), daemon=True).start()
+    try:
+        if not controller.wait_for_guest(5.0):
+            raise RuntimeError("remote agent did not connect")
+        run = run_remote_install(controller, brain, "simulated-setup.exe", root)
+    finally:
+        done.set()
+        controller.close()
+        guest.join(timeout=5.0)
+    if run.status != "success":
+        raise RuntimeError(f"remote install ended with {run.status}: {run.reason}")
+    return {"wall_s": run.wall_s, "steps": run.steps, "guest_connections": agent.connections, **run.link}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the remote agent link over loopback")
+    parser.add_argument("--brain-latency-ms", type=float, default=300.0, help="Median fake model latency")
+    parser.add_argument("--progress-seconds", type=float, default=3.0, help="Duration of the install progress page")
+    parser.add_argument("--heartbeat", type=float, default=0.5, help="Link heartbeat interval in seconds")
+    parser.add_argument("--drop-after", type=int, default=0, help="Drop the guest's link after this many frames")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows: list[tuple[str, dict[str, Any]]] = []
+    with tempfile.TemporaryDirectory(prefix="remote-bench-") as tmp:
+        wizard = make_wizard(args.progress_seconds)
+        brain = FakeBrain(wizard, lognormal_latency(args.brain_latency_ms, sigma=0.25), seed=args.seed)
+        local = run_simulated_install(wizard, brain, Path(tmp) / "local")
+        if local.status != "success":
+            raise RuntimeError(f"local install ended with {local.status}: {local.reason}")
+        rows.append(("local", {"wall_s": local.wall_s, "steps": local.steps}))
+        for name, fraction in (("keyframes", 0.0), ("deltas", 0.3)):
+            rows.append((name, remote_once(args, fraction, Path(tmp) / name)))
+
+    print(
+        f"{'mode':<10} {'steps':>5} {'wall s':>7} {'bytes/step':>10} {'keys':>5} {'deltas':>6} "
+        f"{'rtt p50 ms':>10} {'rtt p95 ms':>10} {'hb ms':>6} {'reconn':>6} {'resent':>6}"
+    )
+    for name, row in rows:
+        if "bytes_per_step" not in row:
+            print(f"{name:<10} {row['steps']:>5} {row['wall_s']:>7.2f}")
+            continue
+        print(
+            f"{name:<10} {row['steps']:>5} {row['wall_s']:>7.2f} {row['bytes_per_step']:>10} {row['keyframes']:>5} "
+            f"{row['deltas']:>6} {row['capture_rtt_ms_p50']:>10.2f} {row['capture_rtt_ms_p95']:>10.2f} "
+            f"{row['heartbeat_rtt_ms_p50']:>6.2f} {row['reconnects']:>6} "
+            f"{row['resent_batches'] + row['resent_captures']:>6}"
+        )
+    keyframes, deltas = rows[1][1], rows[2][1]
+    saved = 1 - deltas["bytes_per_step"] / keyframes["bytes_per_step"]
+    print(f"delta frames cut link bytes per step by {saved:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+"""Benchmark the run-history index against rescanning every events.jsonl.
+
+Builds a synthetic .agent_runs history in a temporary directory:
+
+    python -m benchmarks.run_index [--runs 5000] [--steps 12]
+
+Reports full and incremental ingest time, peak Python heap while ingesting,
+and query latency compared with a full rescan computing the same answer.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from run_index import RunIndex
+
+INTENTS = ("license", "path_select", "confirm", "progress", "finish")
+FRAMEWORKS = ("inno", "nsis", "msi", "unknown")
+
+
+def write_run(root: Path, index: int, steps: int, rng: random.Random) -> None:
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(1_760_000_000 + index * 60))
+    run_dir = root / f"run-{stamp}"
+    run_dir.mkdir()
+    installer = f"{rng.randrange(200):064x}"
+    failed = rng.random() < 0.1
+    lines = [{"kind": "fingerprint", "framework": rng.choice(FRAMEWORKS), "evidence": [], "sections": []}]
+    for step in range(1, steps + 1):
+        intent = INTENTS[min(step * len(INTENTS) // steps, len(INTENTS) - 1)]
+        model_ms = rng.lognormvariate(6.7, 0.35)
+        lines.append(
+            {
+                "step": step,
+                "observation": {"step_index": step, "window_title": "Example Setup", "ocr_text": "lorem " * 40},
+                "decision": {
+                    "intent": intent,
+                    "confidence": round(rng.uniform(0.5, 1.0), 3),
+                    "done": step == steps and not failed,
+                    "needs_human": False,
+                    "reason": "synthetic",
+                    "actions": [{"keys": ["alt", "n"], "reason": "next"}],
+                },
+                "source": "model",
+                "upload": {"bytes": 48000, "mime_type": "image/png", "encode_ms": 12.0, "model_ms": model_ms},
+            }
+        )
+        lines.append({"step": step, "kind": "timings", "capture_ms": 20.0, "inference_ms": model_ms, "wait_ms": 400.0})
+    lines.append({"kind": "pipeline", "wall_s": steps * 1.4})
+    lines.append(
+        {
+            "kind": "result",
+            "status": "failed" if failed else "success",
+            "reason": "Model confidence too low for safe automation" if failed else "Installer process exited",
+            "steps": steps,
+            "installer_sha256": installer,
+        }
+    )
+    with (run_dir / "events.jsonl").open("w", encoding="utf-8") as handle:
+        for line in lines:
+            handle.write(json.dumps(line) + "\n")
+
+
+def rescan_latency(root: Path) -> dict[str, float]:
+    by_intent: dict[str, list[float]] = {}
+    for events_file in root.glob("run-*/events.jsonl"):
+        with events_file.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                event = json.loads(line)
+                if "decision" in event:
+                    by_intent.setdefault(event["decision"]["intent"], []).append(event["upload"]["model_ms"])
+    return {intent: statistics.quantiles(values, n=100)[89] for intent, values in by_intent.items()}
+
+
+def timed(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the run-history index")
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--steps", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="run-index-bench-") as tmp:
+        root = Path(tmp) / "runs"
+        root.mkdir()
+        for index in range(args.runs):
+            write_run(root, index, args.steps, rng)
+        index = RunIndex(Path(tmp) / "index.sqlite")
+        full = index.ingest(root)
+        # Heap is measured on a separate index so tracemalloc overhead does not skew the ingest time.
+        traced = RunIndex(Path(tmp) / "traced.sqlite")
+        tracemalloc.start()
+        traced.ingest(root)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        traced.close()
+        noop = index.ingest(root)
+        for extra in range(args.runs, args.runs + 20):
+            write_run(root, extra, args.steps, rng)
+        incremental = index.ingest(root)
+
+        print(f"{args.runs} runs x {args.steps} steps")
+        print(f"full ingest        {full.seconds * 1000:>9.1f} ms  ({full.ingested / full.seconds:.0f} runs/s)")
+        print(f"peak heap (ingest) {peak / (1 << 20):>9.2f} MiB")
+        print(f"no-op ingest       {noop.seconds * 1000:>9.1f} ms  ({noop.unchanged} unchanged)")
+        print(f"+20 runs ingest    {incremental.seconds * 1000:>9.1f} ms  ({incremental.ingested} ingested)")
+        queries = {
+            "latency by intent (builds index)": lambda: index.latency("model_ms", "intent"),
+            "latency by intent": lambda: index.latency("model_ms", "intent"),
+            "latency by framework": lambda: index.latency("inference_ms", "framework"),
+            "failures by installer": lambda: index.failures("installer"),
+            "confidence histogram": lambda: index.confidence(),
+        }
+        rescan_ms = timed(lambda: rescan_latency(root), repeat=1)
+        print(f"{'query':<34} {'index ms':>9}")
+        for name, query in queries.items():
+            print(f"{name:<34} {timed(query, repeat=1 if 'builds' in name else 5):>9.1f}")
+        print(f"{'latency by intent, full rescan':<34} {rescan_ms:>9.1f}")
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Compare stateless prompts with session mode on a recorded model, offline.
+
+Run from the repository root:
+
+    python -m benchmarks.session_prompt [--recording replies.jsonl] [--steps 12]
+
+Without --recording a built-in wizard transcript is used. Input tokens are
+estimated from the requests each mode actually sends (see RecordedClient);
+latency is the recorded latency plus a prefill cost per uncached input token.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import statistics
+
+from PIL import Image, ImageDraw
+
+from brain_agent import GeminiBrain
+from model_client import RecordedClient
+
+WIZARD = [
+    ("license", ["alt", "a"], 0.93),
+    ("license", ["alt", "n"], 0.9),
+    ("path_select", ["alt", "n"], 0.88),
+    ("confirm", ["alt", "i"], 0.91),
+    ("progress", None, 0.95),
+    ("progress", None, 0.95),
+    ("progress", None, 0.94),
+    ("finish", ["enter"], 0.96),
+]
+
+
+def builtin_recording() -> list[dict[str, object]]:
+    replies = []
+    for index, (intent, keys, confidence) in enumerate(WIZARD):
+        payload = {
+            "ocr_text": f"Setup - Example App. Screen {index + 1}: {intent} " + "lorem ipsum " * 30,
+            "language": "en",
+            "intent": intent,
+            "done": intent == "finish",
+            "needs_human": False,
+            "confidence": confidence,
+            "reason": f"{intent} screen",
+            "actions": [{"keys": keys, "reason": "advance"}] if keys else [],
+        }
+        replies.append({"text": json.dumps(payload), "latency_ms": 900.0 if intent != "progress" else 700.0})
+    return replies
+
+
+def screenshot(step: int) -> bytes:
+    image = Image.new("RGB", (640, 480), "white")
+    ImageDraw.Draw(image).text((20, 20 + step * 10), f"step {step}", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def run(session: bool, replies: list[dict[str, object]], steps: int, prefill: float) -> list[tuple[int, int, float]]:
+    client = RecordedClient(replies, prefill_ms_per_1k=prefill)
+    brain = GeminiBrain(model="recorded", client=client, session=session, history_turns=4)
+    rows: list[tuple[int, int, float]] = []
+    previous_ocr = ""
+    recent: list[list[str]] = []
+    for step in range(1, steps + 1):
+        context = {
+            "step_index": step,
+            "window_title": "Example App Setup",
+            "previous_ocr": previous_ocr,
+            "recent_actions": recent[-6:],
+        }
+        decision = brain.analyze_step(screenshot(step), context)
+        previous_ocr = decision.ocr_text
+        recent.extend(action.keys for action in decision.actions)
+        rows.append((brain.last_usage.input_tokens, brain.last_usage.cached_tokens, brain.last_latency_ms))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark stateless vs session prompting")
+    parser.add_argument("--recording", default=None, help="JSONL written by --record-model")
+    parser.add_argument("--steps", type=int, default=12)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=120.0, help="Latency per 1k uncached input tokens")
+    args = parser.parse_args()
+
+    replies = RecordedClient.load(args.recording).replies if args.recording else builtin_recording()
+    results = {
+        mode: run(mode == "session", replies, args.steps, args.prefill_ms_per_1k) for mode in ("stateless", "session")
+    }
+
+    print(f"{'step':>4} {'stateless in':>13} {'session in':>11} {'cached':>7} {'stateless ms':>13} {'session ms':>11}")
+    for index in range(args.steps):
+        before = results["stateless"][index]
+        after = results["session"][index]
+        print(f"{index + 1:>4} {before[0]:>13} {after[0]:>11} {after[1]:>7} {before[2]:>13.1f} {after[2]:>11.1f}")
+    for mode, rows in results.items():
+        uncached = [total - cached for total, cached, _ in rows]
+        print(
+            f"{mode:<10} uncached input tokens/step mean {statistics.fmean(uncached):.0f}, "
+            f"latency/step mean {statistics.fmean(row[2] for row in rows):.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+"""Time-to-first-screenshot for a cold local_agent process versus a job on a warm agent daemon.
+
+Runs on any platform (no Windows, screen or model key needed). Run from the
+repository root:
+
+    python -m benchmarks.startup [--runs 5]
+
+Both paths do the same work up to the first capture: parse the job's flags,
+get model clients (a GenaiClient with a placeholder key; no request is sent)
+and capture one frame of the simulated installer wizard. "cold" starts a new
+interpreter per job, as the plain CLI and fleet "local" workers do; "warm"
+submits the job over loopback to an AgentDaemon that has already warmed up.
+Also reports the wall time of `local_agent.py --help`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from agent_daemon import AgentDaemon, submit_job
+from image_pipeline import resolve_config
+from installer_sim import SimulatedWizard
+from local_agent import (
+    ModelClients,
+    RunResult,
+    build_model_clients,
+    capture_observation,
+    parse_args,
+    set_screen_backend,
+    set_window_backend,
+)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+JOB_ARGV = ["--file", "simulated-setup.exe", "--gemini-api-key", "startup-benchmark"]
+
+
+def first_screenshot(args: argparse.Namespace, clients: ModelClients | None) -> tuple[int, RunResult]:
+    """Job runner that stops at the first captured frame."""
+    owned = clients is None
+    if clients is None:
+        clients = build_model_clients(args)
+    clients.begin_job()
+    wizard = SimulatedWizard()
+    set_window_backend(wizard.windows)
+    set_screen_backend(wizard)
+    try:
+        wizard.start()
+        with tempfile.TemporaryDirectory(prefix="startup-bench-") as tmp:
+            capture_observation(1, Path(tmp), wizard.pid, preprocess_config=resolve_config(args.image_preset))
+    finally:
+        set_screen_backend(None)
+        set_window_backend(None)
+        if owned:
+            clients.close()
+    return 0, RunResult(status="success", reason="first screenshot", binary_paths=[], artifacts_dir="", steps=1)
+
+
+def cold_once() -> float:
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert child.stdout is not None
+    line = child.stdout.readline()
+    elapsed = time.perf_counter() - started
+    if child.wait() != 0 or line.strip() != "captured":
+        raise RuntimeError("cold start child failed")
+    return elapsed
+
+
+def help_once() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "local_agent.py", "--help"], cwd=REPO_ROOT, check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def row(name: str, samples: list[float]) -> str:
+    p50, low, high = (value * 1000 for value in (statistics.median(samples), min(samples), max(samples)))
+    return f"{name:<22} {p50:>9.1f} {low:>9.1f} {high:>9.1f}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cold CLI startup against a warm agent daemon")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        first_screenshot(parse_args(JOB_ARGV), None)
+        print("captured", flush=True)
+        return 0
+
+    help_times = [help_once() for _ in range(args.runs)]
+    cold_times = [cold_once() for _ in range(args.runs)]
+
+    token = secrets.token_hex(16)
+    daemon = AgentDaemon(JOB_ARGV[2:], token, address="127.0.0.1:0", runner=first_screenshot)
+    warm_started = time.perf_counter()
+    daemon.warm_up()
+    host, port = daemon.start()
+    warm_up = time.perf_counter() - warm_started
+    warm_times = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        exit_code, _ = submit_job(f"{host}:{port}", JOB_ARGV, token=token)
+        warm_times.append(time.perf_counter() - started)
+        if exit_code != 0:
+            raise RuntimeError("warm daemon job failed")
+    daemon.stop()
+
+    print(f"{'path':<22} {'p50 ms':>9} {'min ms':>9} {'max ms':>9}")
+    print(row("local_agent --help", help_times))
+    print(row("cold first screenshot", cold_times))
+    print(row("warm first screenshot", warm_times))
+    print(f"daemon warm-up (once)  {warm_up * 1000:>9.1f}  ({daemon.stats.client_hits} warm client hits)")
+    print(f"speedup (p50)          {statistics.median(cold_times) / statistics.median(warm_times):>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
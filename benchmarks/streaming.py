@@ -0,0 +1,81 @@
+"""Time-to-first-action with and without streaming, against a simulated client.
+
+Run from the repository root:
+
+    python -m benchmarks.streaming [--steps 40] [--first-token-ms 60] [--chars-per-second 4000]
+
+The simulated model waits --first-token-ms, then emits the reply at
+--chars-per-second; replies carry a long ocr_text after the decision fields,
+as the schema asks for.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any
+
+from brain_agent import BrainAction, GeminiBrain
+from model_client import SimulatedClient, lognormal_latency
+
+
+def reply(index: int, ocr_chars: int) -> str:
+    return json.dumps(
+        {
+            "intent": "license",
+            "done": False,
+            "needs_human": False,
+            "confidence": 0.92,
+            "actions": [{"keys": ["alt", "a"], "reason": "accept"}, {"keys": ["alt", "n"], "reason": "next"}],
+            "reason": "License agreement with an accept radio button and a Next button.",
+            "language": "en",
+            "ocr_text": (f"Screen {index}. " + "End user license agreement text. " * ocr_chars)[:ocr_chars],
+        }
+    )
+
+
+def run(args: argparse.Namespace, stream: bool) -> list[float]:
+    client = SimulatedClient(
+        [reply(index, args.ocr_chars) for index in range(8)],
+        lognormal_latency(args.first_token_ms, 0.2),
+        seed=3,
+        chars_per_second=args.chars_per_second,
+    )
+    brain = GeminiBrain(model="simulated", client=client, stream=stream)
+    samples: list[float] = []
+    for step in range(1, args.steps + 1):
+        first: list[float] = []
+
+        def on_action(index: int, action: BrainAction, gate: dict[str, Any]) -> None:
+            if not first:
+                first.append(time.perf_counter())
+
+        context = {"step_index": step, "window_title": "Setup", "on_stream_action": on_action}
+        started = time.perf_counter()
+        decision = brain.analyze_step(b"", context)
+        finished = time.perf_counter()
+        if decision.actions:
+            samples.append(((first[0] if first else finished) - started) * 1000)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark streamed action dispatch")
+    parser.add_argument("--steps", type=int, default=40)
+    parser.add_argument("--first-token-ms", type=float, default=60.0)
+    parser.add_argument("--chars-per-second", type=float, default=4000.0)
+    parser.add_argument("--ocr-chars", type=int, default=1500, help="Length of ocr_text in each reply")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'ttfa p50 ms':>12} {'ttfa p95 ms':>12}")
+    for stream in (False, True):
+        samples = sorted(run(args, stream))
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        print(f"{'streamed' if stream else 'buffered':<10} {statistics.median(samples):>12.1f} {p95:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+"""Benchmark WindowTracker against a full window enumeration per lookup.
+
+Runs on any platform using the in-memory FakeWindowSystem:
+
+    python -m benchmarks.window_tracker --windows 400 --steps 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from window_tracker import FakeWindowSystem, WindowTracker
+
+INSTALLER_PID = 4242
+CHILD_PID = 4343
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark cached window tracking")
+    parser.add_argument("--windows", type=int, default=400, help="Unrelated top-level windows")
+    parser.add_argument("--steps", type=int, default=200, help="Simulated agent steps")
+    parser.add_argument("--lookups-per-step", type=int, default=3, help="Window lookups per step")
+    parser.add_argument("--handoff-step", type=int, default=20, help="Step at which msiexec takes over")
+    parser.add_argument("--no-events", action="store_true", help="Backend without window events")
+    return parser.parse_args()
+
+
+def build_system(windows: int, supports_events: bool) -> tuple[FakeWindowSystem, int]:
+    system = FakeWindowSystem(supports_events=supports_events)
+    for index in range(windows):
+        pid = 10000 + index
+        system.spawn(pid)
+        system.create_window(pid, f"Window {index}", visible=index % 3 != 0)
+    system.spawn(INSTALLER_PID)
+    bootstrap = system.create_window(INSTALLER_PID, "Product Setup")
+    return system, bootstrap
+
+
+def legacy_lookup(system: FakeWindowSystem, pid: int) -> int | None:
+    matches: list[int] = []
+    for hwnd in system.enum_windows():
+        if not system.is_visible(hwnd):
+            continue
+        if system.window_pid(hwnd) != pid:
+            continue
+        if system.window_title(hwnd).strip():
+            matches.append(hwnd)
+    return matches[0] if matches else None
+
+
+def simulate(args: argparse.Namespace, use_tracker: bool) -> dict[str, float]:
+    system, bootstrap = build_system(args.windows, not args.no_events)
+    tracker = WindowTracker(system, INSTALLER_PID) if use_tracker else None
+    lost = 0
+    started = time.perf_counter()
+    for step in range(args.steps):
+        if step == args.handoff_step:
+            system.spawn(CHILD_PID, INSTALLER_PID)
+            system.set_visible(bootstrap, False)
+            system.create_window(CHILD_PID, "Product Setup (MSI)")
+        for _ in range(args.lookups_per_step):
+            hwnd = tracker.target() if tracker is not None else legacy_lookup(system, INSTALLER_PID)
+            if hwnd is None:
+                lost += 1
+    elapsed = time.perf_counter() - started
+    if tracker is not None:
+        tracker.close()
+    lookups = args.steps * args.lookups_per_step
+    return {
+        "us_per_lookup": elapsed / lookups * 1e6,
+        "enum_calls": system.enum_calls,
+        "title_calls": system.title_calls,
+        "lost_lookups": lost,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    print(f"{args.windows} windows, {args.steps} steps x {args.lookups_per_step} lookups, events={not args.no_events}")
+    print(f"{'strategy':<10} {'us/lookup':>10} {'EnumWindows':>12} {'titles':>8} {'lost':>6}")
+    for label, use_tracker in (("legacy", False), ("tracker", True)):
+        row = simulate(args, use_tracker)
+        print(
+            f"{label:<10} {row['us_per_lookup']:>10.1f} {row['enum_calls']:>12} "
+            f"{row['title_calls']:>8} {row['lost_lookups']:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,12 +5,15 @@ from __future__ import annotations
 import json
 import os
 import re
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Callable
 
-from google import genai
 from google.genai import types
 
+from model_client import GenaiClient, ModelClient, ModelReply, TokenUsage
+from stream_parser import DecisionStreamParser
+from tracing import span
+
 
 ALLOWED_SIMPLE_KEYS = {
     "tab",
@@ -28,6 +31,61 @@ ALLOWED_SIMPLE_KEYS = {
 }
 ALLOWED_MODIFIERS = {"alt", "shift", "ctrl"}
 
+INSTRUCTIONS = (
+    "You are a Windows installer keyboard automation agent.\n"
+    "Given this screenshot, extract text and decide the safest next key actions.\n"
+    "Prefer reversible actions (Tab, Shift+Tab, arrows, Enter, Space, Alt+letter).\n"
+    "Avoid destructive shortcuts and never invent unsupported keys.\n"
+    "If uncertain, set needs_human=true and return no actions.\n\n"
+)
+RESPONSE_SCHEMA = (
+    "Return ONLY JSON with this exact schema:\n"
+    "{\n"
+    '  "intent": "license|path_select|progress|finish|confirm|not_installer|unknown",\n'
+    '  "done": false,\n'
+    '  "needs_human": false,\n'
+    '  "confidence": 0.0,\n'
+    '  "actions": [\n'
+    '    {"keys": ["alt", "n"], "reason": "string"}\n'
+    "  ],\n"
+    '  "reason": "string",\n'
+    '  "language": "string",\n'
+    '  "ocr_text": "string"\n'
+    "}\n"
+    "Keep the fields in this order.\n"
+    "Rules for keys:\n"
+    "- keys must be lowercase strings\n"
+    "- allow simple keys: tab, enter, space, esc, up, down, left, right, home, end, pagedown, pageup\n"
+    "- allow modifiers alt/shift/ctrl with one additional key\n"
+    "- no more than 3 actions\n"
+    "- if intent is progress, usually return empty actions unless a prompt requires confirmation\n"
+)
+PLAN_SCHEMA = (
+    "Also plan ahead: after ocr_text add a \"plan\" field listing, in order, the installer pages you expect "
+    "AFTER this one, at most 6, stopping at the first page you cannot predict:\n"
+    '  "plan": [\n'
+    '    {"page": "string", "intent": "license|path_select|progress|finish|confirm", "title": "string", '
+    '"labels": ["string"], "actions": [{"keys": ["alt", "n"], "reason": "string"}], "done": false}\n'
+    "  ]\n"
+    "Each planned page is checked locally before its actions are sent, so:\n"
+    "- title is a substring of that page's window title (empty if unknown)\n"
+    "- labels are 1-3 exact button captions or headings shown on that page that no other page shows\n"
+    "- actions follow the same key rules; use no actions for progress pages\n"
+    "Return an empty plan when the following pages are not predictable.\n"
+)
+SESSION_NOTES = (
+    "You are driving one installer across several turns. Each turn brings the current screenshot "
+    "and what changed since your previous answer; earlier turns are summarised.\n\n"
+)
+SUMMARY_LIMIT = 24
+# Fields that must be known before a streamed action may be dispatched.
+STREAM_GATE_FIELDS = ("intent", "done", "needs_human", "confidence")
+MAX_ACTIONS = 3
+MAX_PLAN_PAGES = 6
+MAX_PLAN_LABELS = 3
+
+StreamActionCallback = Callable[[int, "BrainAction", dict[str, Any]], None]
+
 
 @dataclass(slots=True)
 class BrainAction:
@@ -35,6 +93,34 @@ class BrainAction:
     reason: str
 
 
+@dataclass(slots=True, frozen=True)
+class Route:
+    model: str
+    thinking_level: str = "HIGH"
+
+    def __str__(self) -> str:
+        return f"{self.model}:{self.thinking_level}"
+
+
+@dataclass(slots=True)
+class SessionTurn:
+    step_index: int
+    prompt: str
+    reply: str
+
+
+@dataclass(slots=True)
+class PlanPage:
+    """A page the model expects later in the wizard, with what identifies it and what to press there."""
+
+    name: str
+    intent: str
+    title: str
+    labels: list[str]
+    actions: list[BrainAction]
+    done: bool = False
+
+
 @dataclass(slots=True)
 class BrainDecision:
     ocr_text: str
@@ -45,80 +131,191 @@ class BrainDecision:
     confidence: float
     reason: str
     actions: list[BrainAction]
+    plan: list[PlanPage] = field(default_factory=list)
 
 
 class GeminiBrain:
-    """Wraps Gemini OCR + reasoning for next-step keyboard actions."""
+    """Wraps Gemini OCR + reasoning for next-step keyboard actions.
+
+    In session mode the instructions and schema are sent once as a (cached)
+    system instruction; each step adds the new screenshot and a compact delta,
+    and older turns beyond history_turns are folded into a one-line summary.
+
+    In stream mode the reply is parsed as it arrives and every validated action
+    is passed to context["on_stream_action"] (index, action, gate fields) once
+    intent/done/needs_human/confidence are known; the caller decides whether to
+    act on it before the full decision is returned.
+
+    When context["plan"] is set the reply also carries a short plan of the
+    pages expected after this one (see PLAN_SCHEMA); install_plan.PlanningBrain
+    checks those pages locally and only comes back here when one does not match.
+    """
 
-    def __init__(self, api_key: str | None = None, model: str = "gemini-3-flash-preview") -> None:
-        key = api_key or os.environ.get("GEMINI_API_KEY")
-        if not key:
-            raise RuntimeError("GEMINI_API_KEY is not set")
-        self.client = genai.Client(api_key=key)
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = "gemini-3-flash-preview",
+        client: ModelClient | None = None,
+        session: bool = False,
+        history_turns: int = 4,
+        stream: bool = False,
+    ) -> None:
+        if client is None:
+            key = api_key or os.environ.get("GEMINI_API_KEY")
+            if not key:
+                raise RuntimeError("GEMINI_API_KEY is not set")
+            client = GenaiClient(api_key=key)
+        self.client = client
         self.model = model
+        self.session = session
+        self.history_turns = history_turns
+        self.stream = stream
+        self.turns: list[SessionTurn] = []
+        self.summary: list[str] = []
+        self.last_usage = TokenUsage()
+        self.last_latency_ms = 0.0
+        self.usage = TokenUsage()
+        self.calls = 0
 
-    def analyze_step(self, image_bytes: bytes, context: dict[str, Any]) -> BrainDecision:
-        prompt = self._build_prompt(context)
-        contents = [
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+        route: Route | None = None,
+    ) -> BrainDecision:
+        route = route or Route(self.model)
+        step_index = int(context.get("step_index", 0))
+        if self.turns and self.turns[-1].step_index == step_index:
+            # Escalated retry of the same step: replace the previous answer.
+            self.turns.pop()
+        contents: list[types.Content] = []
+        system_instruction = None
+        if self.session:
+            delta = self._build_delta(context)
+            prompt = delta
+            if self.summary:
+                prompt = "Earlier steps: " + "; ".join(self.summary[-SUMMARY_LIMIT:]) + "\n" + delta
+            system_instruction = SESSION_NOTES + INSTRUCTIONS + RESPONSE_SCHEMA
+            for turn in self.turns:
+                contents.append(types.Content(role="user", parts=[types.Part.from_text(text=turn.prompt)]))
+                contents.append(types.Content(role="model", parts=[types.Part.from_text(text=turn.reply)]))
+        else:
+            prompt = self._build_prompt(context)
+        if context.get("plan"):
+            # Appended to this turn only, so session history keeps the compact delta.
+            prompt += PLAN_SCHEMA
+        contents.append(
             types.Content(
                 role="user",
                 parts=[
-                    types.Part.from_bytes(data=image_bytes, mime_type="image/png"),
+                    types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
                     types.Part.from_text(text=prompt),
                 ],
             )
-        ]
+        )
 
         config = types.GenerateContentConfig(
             response_mime_type="application/json",
             temperature=0.1,
-            thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
+            thinking_config=types.ThinkingConfig(thinking_level=route.thinking_level),
         )
 
-        response = self.client.models.generate_content(
-            model=self.model,
-            contents=contents,
-            config=config,
-        )
+        on_action = context.get("on_stream_action")
+        with span("model", step=step_index or None, route=str(route), stream=self.stream) as model_span:
+            if self.stream:
+                reply = self._stream_reply(route, contents, config, system_instruction, on_action)
+            else:
+                reply = self.client.generate(route.model, contents, config, system_instruction=system_instruction)
+            model_span.set(
+                input_tokens=reply.usage.input_tokens,
+                cached_tokens=reply.usage.cached_tokens,
+                output_tokens=reply.usage.output_tokens,
+                thinking_tokens=reply.usage.thinking_tokens,
+            )
+        self.calls += 1
+        self.last_usage = reply.usage
+        self.last_latency_ms = reply.latency_ms
+        self.usage.add(reply.usage)
+
+        payload = self._parse_json(reply.text)
+        decision = self._validate(payload)
+        if self.session:
+            self._remember(step_index, delta, decision)
+        return decision
+
+    def _stream_reply(
+        self,
+        route: Route,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None,
+        on_action: StreamActionCallback | None,
+    ) -> ModelReply:
+        parser = DecisionStreamParser()
+        pending: list[BrainAction] = []
+        emitted = 0
 
-        text = response.text or ""
-        payload = self._parse_json(text)
-        return self._validate(payload)
+        def on_text(text: str) -> None:
+            nonlocal emitted
+            for kind, key, value in parser.feed(text):
+                if kind == "action" and isinstance(key, int) and key < MAX_ACTIONS:
+                    action = self._normalize_action(value)
+                    if action is not None:
+                        pending.append(action)
+            if on_action is None or not pending:
+                return
+            if any(name not in parser.fields for name in STREAM_GATE_FIELDS):
+                return
+            gate = {name: parser.fields[name] for name in STREAM_GATE_FIELDS}
+            for action in pending:
+                on_action(emitted, action, gate)
+                emitted += 1
+            pending.clear()
+
+        return self.client.stream(route.model, contents, config, on_text, system_instruction=system_instruction)
+
+    def reset_session(self) -> None:
+        self.turns.clear()
+        self.summary.clear()
 
     def _build_prompt(self, context: dict[str, Any]) -> str:
         recent = context.get("recent_actions", [])
         window_title = context.get("window_title", "")
         previous_ocr = context.get("previous_ocr", "")
         return (
-            "You are a Windows installer keyboard automation agent.\n"
-            "Given this screenshot, extract text and decide the safest next key actions.\n"
-            "Prefer reversible actions (Tab, Shift+Tab, arrows, Enter, Space, Alt+letter).\n"
-            "Avoid destructive shortcuts and never invent unsupported keys.\n"
-            "If uncertain, set needs_human=true and return no actions.\n\n"
-            f"Current window title: {window_title}\n"
+            INSTRUCTIONS
+            + f"Current window title: {window_title}\n"
             f"Recent actions: {recent}\n"
             f"Previous OCR excerpt: {previous_ocr[:500]}\n\n"
-            "Return ONLY JSON with this exact schema:\n"
-            "{\n"
-            '  "ocr_text": "string",\n'
-            '  "language": "string",\n'
-            '  "intent": "license|path_select|progress|finish|confirm|not_installer|unknown",\n'
-            '  "done": false,\n'
-            '  "needs_human": false,\n'
-            '  "confidence": 0.0,\n'
-            '  "reason": "string",\n'
-            '  "actions": [\n'
-            '    {"keys": ["alt", "n"], "reason": "string"}\n'
-            "  ]\n"
-            "}\n"
-            "Rules for keys:\n"
-            "- keys must be lowercase strings\n"
-            "- allow simple keys: tab, enter, space, esc, up, down, left, right, home, end, pagedown, pageup\n"
-            "- allow modifiers alt/shift/ctrl with one additional key\n"
-            "- no more than 3 actions\n"
-            "- if intent is progress, usually return empty actions unless a prompt requires confirmation\n"
+            + RESPONSE_SCHEMA
         )
 
+    def _build_delta(self, context: dict[str, Any]) -> str:
+        lines = [f"Step {context.get('step_index', '?')}. Window title: {context.get('window_title', '')}"]
+        recent = context.get("recent_actions", [])
+        if recent:
+            lines.append(f"Recent keys sent: {recent[-3:]}")
+        return "\n".join(lines)
+
+    def _remember(self, step_index: int, prompt: str, decision: BrainDecision) -> None:
+        # Only the compact outcome is kept as the model turn; OCR text is dropped.
+        reply = json.dumps(
+            {
+                "intent": decision.intent,
+                "done": decision.done,
+                "confidence": decision.confidence,
+                "actions": [action.keys for action in decision.actions],
+            },
+            separators=(",", ":"),
+        )
+        self.turns.append(SessionTurn(step_index=step_index, prompt=prompt, reply=reply))
+        while len(self.turns) > self.history_turns:
+            oldest = self.turns.pop(0)
+            summary = json.loads(oldest.reply)
+            keys = "+".join("-".join(keys) for keys in summary["actions"]) or "wait"
+            self.summary.append(f"{oldest.step_index}:{summary['intent']}->{keys}")
+
     def _parse_json(self, text: str) -> dict[str, Any]:
         raw = text.strip()
         if not raw:
@@ -144,22 +341,25 @@ class GeminiBrain:
             raise ValueError("actions must be a list")
 
         actions: list[BrainAction] = []
-        for item in raw_actions[:3]:
-            if not isinstance(item, dict):
-                continue
-            keys = item.get("keys", [])
-            if not isinstance(keys, list) or not keys:
-                continue
-            normalized = [str(k).strip().lower() for k in keys if str(k).strip()]
-            if not self._is_allowed_action(normalized):
-                continue
-            actions.append(BrainAction(keys=normalized, reason=str(item.get("reason", ""))))
+        for item in raw_actions[:MAX_ACTIONS]:
+            action = self._normalize_action(item)
+            if action is not None:
+                actions.append(action)
 
         if confidence < 0.0:
             confidence = 0.0
         if confidence > 1.0:
             confidence = 1.0
 
+        plan: list[PlanPage] = []
+        raw_plan = payload.get("plan", [])
+        if isinstance(raw_plan, list) and not needs_human:
+            for item in raw_plan[:MAX_PLAN_PAGES]:
+                page = self._normalize_plan_page(item)
+                if page is None:
+                    break  # Pages after one we cannot use are not reachable locally either.
+                plan.append(page)
+
         if needs_human:
             actions = []
 
@@ -172,8 +372,41 @@ class GeminiBrain:
             confidence=confidence,
             reason=reason,
             actions=actions,
+            plan=plan,
+        )
+
+    def _normalize_plan_page(self, item: Any) -> PlanPage | None:
+        if not isinstance(item, dict) or not isinstance(item.get("actions", []), list):
+            return None
+        labels = item.get("labels", [])
+        if not isinstance(labels, list):
+            return None
+        actions: list[BrainAction] = []
+        for raw in item.get("actions", [])[:MAX_ACTIONS]:
+            action = self._normalize_action(raw)
+            if action is None:
+                return None  # A page whose keys we would drop cannot be replayed faithfully.
+            actions.append(action)
+        return PlanPage(
+            name=str(item.get("page", "")),
+            intent=str(item.get("intent", "unknown")),
+            title=str(item.get("title", "")),
+            labels=[str(label) for label in labels if str(label).strip()][:MAX_PLAN_LABELS],
+            actions=actions,
+            done=bool(item.get("done", False)),
         )
 
+    def _normalize_action(self, item: Any) -> BrainAction | None:
+        if not isinstance(item, dict):
+            return None
+        keys = item.get("keys", [])
+        if not isinstance(keys, list) or not keys:
+            return None
+        normalized = [str(k).strip().lower() for k in keys if str(k).strip()]
+        if not self._is_allowed_action(normalized):
+            return None
+        return BrainAction(keys=normalized, reason=str(item.get("reason", "")))
+
     def _is_allowed_action(self, keys: list[str]) -> bool:
         if not keys:
             return False
@@ -0,0 +1,226 @@
+"""Persistent perceptual-hash cache for brain decisions."""
+
+from __future__ import annotations
+
+import io
+import json
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+from PIL import Image
+
+from brain_agent import BrainAction, BrainDecision
+
+# 256-bit keys: at 64 bits a ticked and an unticked licence checkbox hash the same.
+CACHE_HASH_SIZE = 16
+TOGGLE_KEYS = frozenset({"space"})
+
+
+class Brain(Protocol):
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision: ...
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """Difference hash: one bit per horizontally adjacent grayscale pixel pair."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | int(pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
+
+
+def cacheable(decision: BrainDecision) -> bool:
+    """Whether replaying the decision on a look-alike page is safe.
+
+    Only single-action decisions qualify: a multi-action one (alt+a then
+    alt+n) sets controls before advancing, and replayed on a page where the
+    box is already ticked its toggle would untick it again. A lone space
+    toggles whatever has focus.
+    """
+    if len(decision.actions) > 1:
+        return False
+    return not any(len(action.keys) == 1 and action.keys[0].lower() in TOGGLE_KEYS for action in decision.actions)
+
+
+def decision_to_dict(decision: BrainDecision) -> dict[str, Any]:
+    return asdict(decision)
+
+
+def decision_from_dict(payload: dict[str, Any]) -> BrainDecision:
+    actions = [BrainAction(keys=list(a["keys"]), reason=str(a.get("reason", ""))) for a in payload["actions"]]
+    return BrainDecision(
+        ocr_text=str(payload["ocr_text"]),
+        language=str(payload["language"]),
+        intent=str(payload["intent"]),
+        done=bool(payload["done"]),
+        needs_human=bool(payload["needs_human"]),
+        confidence=float(payload["confidence"]),
+        reason=str(payload["reason"]),
+        actions=actions,
+    )
+
+
+class DecisionCache:
+    """SQLite-backed store of decisions keyed on (window title, perceptual hash).
+
+    A hit needs a hash within max_distance bits, an exact match by default:
+    a checkbox changes only a bit or two of the 256.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int = 5000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_distance: int = 0,
+        min_confidence: float = 0.8,
+    ) -> None:
+        self.path = Path(path).expanduser().resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.stats = CacheStats()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            " id INTEGER PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " phash TEXT NOT NULL,"
+            " confidence REAL NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " UNIQUE(title, phash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS decisions_title ON decisions(title)")
+        # Entries keyed on the older 64-bit hash can never match a 256-bit one.
+        self._conn.execute("DELETE FROM decisions WHERE length(phash) != ?", (CACHE_HASH_SIZE**2 // 4,))
+        self._conn.commit()
+        self._expire(time.time())
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def lookup(self, image_bytes: bytes, window_title: str) -> BrainDecision | None:
+        now = time.time()
+        phash = perceptual_hash(image_bytes, CACHE_HASH_SIZE)
+        rows = self._conn.execute(
+            "SELECT id, phash, confidence, payload FROM decisions WHERE title = ? AND created_at >= ?",
+            (_normalize_title(window_title), now - self.ttl_seconds),
+        ).fetchall()
+        best: tuple[int, int, str] | None = None
+        for row_id, stored_hash, confidence, payload in rows:
+            if confidence < self.min_confidence:
+                continue
+            distance = hamming_distance(phash, int(stored_hash, 16))
+            if distance > self.max_distance:
+                continue
+            if best is None or distance < best[0]:
+                best = (distance, row_id, payload)
+
+        if best is None:
+            self.stats.misses += 1
+            return None
+        self._conn.execute("UPDATE decisions SET last_used = ? WHERE id = ?", (now, best[1]))
+        self._conn.commit()
+        self.stats.hits += 1
+        return decision_from_dict(json.loads(best[2]))
+
+    def store(self, image_bytes: bytes, window_title: str, decision: BrainDecision) -> bool:
+        if decision.needs_human or decision.confidence < self.min_confidence or not cacheable(decision):
+            return False
+        now = time.time()
+        phash = perceptual_hash(image_bytes, CACHE_HASH_SIZE)
+        self._conn.execute(
+            "INSERT INTO decisions (title, phash, confidence, payload, created_at, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(title, phash) DO UPDATE SET"
+            " confidence = excluded.confidence, payload = excluded.payload,"
+            " created_at = excluded.created_at, last_used = excluded.last_used",
+            (
+                _normalize_title(window_title),
+                f"{phash:064x}",
+                decision.confidence,
+                json.dumps(decision_to_dict(decision), ensure_ascii=True),
+                now,
+                now,
+            ),
+        )
+        self._evict_lru()
+        self._conn.commit()
+        self.stats.stores += 1
+        return True
+
+    def _expire(self, now: float) -> None:
+        cursor = self._conn.execute("DELETE FROM decisions WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.stats.evictions += max(cursor.rowcount, 0)
+        self._conn.commit()
+
+    def _evict_lru(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM decisions").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM decisions WHERE id IN (SELECT id FROM decisions ORDER BY last_used ASC LIMIT ?)",
+            (overflow,),
+        )
+        self.stats.evictions += overflow
+
+
+class CachedBrain:
+    """Serves confident cached decisions and falls back to the wrapped brain."""
+
+    def __init__(self, brain: Brain, cache: DecisionCache) -> None:
+        self.brain = brain
+        self.cache = cache
+        self.last_hit = False
+        self.last_source = "model"
+
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision:
+        window_title = str(context.get("window_title", ""))
+        cached = self.cache.lookup(image_bytes, window_title)
+        if cached is not None:
+            self.last_hit = True
+            self.last_source = "cache"
+            return cached
+        self.last_hit = False
+        decision = self.brain.analyze_step(image_bytes=image_bytes, context=context, mime_type=mime_type)
+        self.last_source = getattr(self.brain, "last_source", "model")
+        self.cache.store(image_bytes, window_title, decision)
+        return decision
+
+
+def _normalize_title(title: str) -> str:
+    return " ".join(title.lower().split())
@@ -0,0 +1,305 @@
+"""Run-long events.jsonl journal with a background writer, flush policies and rotation."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+FLUSH_POLICIES = ("step", "interval", "exit")
+WRITE_BUFFER_BYTES = 1 << 16
+TAIL_SCAN_BYTES = 1 << 16
+FLUSH_POLL_SECONDS = 0.5
+
+
+@dataclass(slots=True)
+class JournalStats:
+    events: int = 0
+    batches: int = 0
+    bytes_written: int = 0
+    flushes: int = 0
+    fsyncs: int = 0
+    rotations: int = 0
+    recovered_bytes: int = 0
+    recovered_segments: int = 0
+    errors: int = 0
+
+
+@dataclass(slots=True)
+class _Flush:
+    done: threading.Event | None
+    fsync: bool
+
+
+_STOP = object()
+
+
+def recover_tail(path: Path) -> int:
+    """Truncate a torn last line left by a crash; returns the number of bytes dropped."""
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return 0
+    if size == 0:
+        return 0
+    with path.open("r+b") as handle:
+        start = max(0, size - TAIL_SCAN_BYTES)
+        while True:
+            handle.seek(start)
+            chunk = handle.read(size - start)
+            if chunk.endswith(b"\n"):
+                return 0
+            cut = chunk.rfind(b"\n")
+            if cut >= 0:
+                keep = start + cut + 1
+                break
+            if start == 0:
+                keep = 0
+                break
+            start = max(0, start - TAIL_SCAN_BYTES)
+        handle.truncate(keep)
+    return size - keep
+
+
+def _segment_number(path: Path, candidate: Path) -> int | None:
+    name = candidate.name.removesuffix(".gz")
+    number = name.removeprefix(f"{path.stem}.").removesuffix(path.suffix)
+    if name == number or not name.endswith(path.suffix) or not number.isdigit():
+        return None
+    return int(number)
+
+
+def segment_paths(path: Path) -> list[Path]:
+    """Rotated segments of a journal in write order.
+
+    Segments are gzip-compressed. A crash during rotation can leave a plain
+    one behind; it is complete (the rename comes before compression) and is
+    preferred over a .gz of the same number, which may be partial.
+    """
+    segments: dict[int, Path] = {}
+    for candidate in path.parent.glob(f"{path.stem}.*{path.suffix}*"):
+        number = _segment_number(path, candidate)
+        if number is None:
+            continue
+        if candidate.suffix != ".gz" or number not in segments:
+            segments[number] = candidate
+    return [segments[number] for number in sorted(segments)]
+
+
+def _compress(segment: Path) -> None:
+    # Written under a temporary name so a .gz segment is never partial.
+    partial = segment.with_name(f"{segment.name}.gz.tmp")
+    with segment.open("rb") as source, gzip.open(partial, "wb") as target:
+        shutil.copyfileobj(source, target)
+    os.replace(partial, segment.with_name(f"{segment.name}.gz"))
+    segment.unlink()
+
+
+def recover_segments(path: Path) -> int:
+    """Compress segments a crash left uncompressed mid-rotation; returns how many were recovered."""
+    recovered = 0
+    for segment in segment_paths(path):
+        if segment.suffix != ".gz":
+            _compress(segment)
+            recovered += 1
+    return recovered
+
+
+def read_events(path: Path) -> Iterator[dict[str, Any]]:
+    """Yield the events of a journal: rotated segments first, then the live file.
+
+    Lines that do not parse (a torn tail after a crash) are skipped.
+    """
+    for source in [*segment_paths(path), path]:
+        if not source.exists():
+            continue
+        opener = gzip.open if source.suffix == ".gz" else open
+        with opener(source, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(event, dict):
+                    yield event
+
+
+class EventJournal:
+    """Appends events to a JSONL file from a background thread for the lifetime of a run.
+
+    write() only enqueues the payload; serialisation and file writes happen on
+    the writer thread in batches through one open, buffered handle. Buffered
+    lines reach the OS at every step boundary (flush="step"), every
+    flush_interval seconds ("interval") or only at close ("exit"); with
+    fsync=True each of those flushes is also fsynced. When max_bytes is set
+    the live file is rotated to a gzip-compressed numbered segment once it
+    grows past that size. A torn last line from an earlier crash is truncated
+    and a segment left uncompressed by a crash mid-rotation is compressed on
+    open. The live file stays plain JSON lines.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        flush: str = "step",
+        flush_interval: float = 1.0,
+        fsync: bool = False,
+        max_bytes: int = 0,
+    ) -> None:
+        if flush not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy {flush!r}; expected one of {', '.join(FLUSH_POLICIES)}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_policy = flush
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.stats = JournalStats(
+            recovered_bytes=recover_tail(self.path),
+            recovered_segments=recover_segments(self.path),
+        )
+        self._segment = max((_segment_number(self.path, s) or 0 for s in segment_paths(self.path)), default=0)
+        self._handle = self.path.open("a", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+
+    def write(self, payload: dict[str, Any]) -> None:
+        if self._closed:
+            raise RuntimeError(f"Event journal {self.path} is closed")
+        self._queue.put(payload)
+
+    def mark_step(self) -> None:
+        """Step boundary: under the "step" policy, queued events are flushed without waiting."""
+        if self.flush_policy == "step":
+            self._queue.put(_Flush(None, self.fsync))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every event written so far is in the file (and fsynced when fsync=True).
+
+        Returns False when timeout seconds pass first or the writer thread is
+        no longer running, instead of waiting forever.
+        """
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(_Flush(done, self.fsync))
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not done.wait(FLUSH_POLL_SECONDS):
+            if not self._thread.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                return False
+        return True
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> EventJournal:
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        interval = self.flush_interval if self.flush_policy == "interval" else None
+        next_flush = time.monotonic() + interval if interval is not None else None
+        while True:
+            timeout = max(0.0, next_flush - time.monotonic()) if next_flush is not None else None
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines: list[str] = []
+            flushes: list[_Flush] = []
+            stop = False
+            for item in batch:
+                if isinstance(item, dict):
+                    line = self._serialize(item)
+                    if line is not None:
+                        lines.append(line)
+                elif isinstance(item, _Flush):
+                    flushes.append(item)
+                elif item is _STOP:
+                    stop = True
+            if lines:
+                self._write("\n".join(lines) + "\n", len(lines))
+            if next_flush is not None and time.monotonic() >= next_flush:
+                flushes.append(_Flush(None, self.fsync))
+                next_flush = time.monotonic() + interval
+            if stop:
+                self._sync(self.fsync)
+                self._handle.close()
+                for item in flushes:
+                    if item.done is not None:
+                        item.done.set()
+                return
+            if flushes:
+                self._sync(any(item.fsync for item in flushes))
+                for item in flushes:
+                    if item.done is not None:
+                        item.done.set()
+
+    def _serialize(self, payload: dict[str, Any]) -> str | None:
+        # One unserialisable event must not take the writer thread (and every later flush) down with it.
+        try:
+            return json.dumps(payload, ensure_ascii=True)
+        except (TypeError, ValueError) as exc:
+            self.stats.errors += 1
+            print(f"event journal dropped an event for {self.path}: {exc}", file=sys.stderr)
+            return None
+
+    def _write(self, text: str, events: int) -> None:
+        try:
+            self._handle.write(text)
+        except OSError as exc:
+            self.stats.errors += 1
+            print(f"event journal write failed for {self.path}: {exc}", file=sys.stderr)
+            return
+        self.stats.events += events
+        self.stats.batches += 1
+        self.stats.bytes_written += len(text)
+        if self.max_bytes and self._handle.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _sync(self, fsync: bool) -> None:
+        try:
+            self._handle.flush()
+            self.stats.flushes += 1
+            if fsync:
+                os.fsync(self._handle.fileno())
+                self.stats.fsyncs += 1
+        except OSError as exc:
+            self.stats.errors += 1
+            print(f"event journal flush failed for {self.path}: {exc}", file=sys.stderr)
+
+    def _rotate(self) -> None:
+        self._sync(self.fsync)
+        self._handle.close()
+        self._segment += 1
+        segment = self.path.with_name(f"{self.path.stem}.{self._segment:06d}{self.path.suffix}")
+        try:
+            os.replace(self.path, segment)
+            _compress(segment)
+            self.stats.rotations += 1
+        except OSError as exc:
+            self.stats.errors += 1
+            print(f"event journal rotation failed for {self.path}: {exc}", file=sys.stderr)
+        self._handle = self.path.open("a", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
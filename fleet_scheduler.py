@@ -0,0 +1,404 @@
+"""Fleet scheduler that fans installer jobs out across a pool of agent workers."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import random
+import shlex
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+from agent_daemon import DEFAULT_ADDRESS, TOKEN_ENV, submit_job
+from local_agent import SUPPORTED_INPUTS, RunResult
+
+AGENT_SCRIPT = Path(__file__).resolve().with_name("local_agent.py")
+
+
+@dataclass(slots=True)
+class Job:
+    job_id: int
+    file: str
+    zip_password: str | None = None
+    enqueued_at: float = 0.0
+    attempts: int = 0
+
+
+@dataclass(slots=True)
+class JobReport:
+    job_id: int
+    file: str
+    worker: str
+    attempts: int
+    queue_seconds: float
+    run_seconds: float
+    result: RunResult
+
+
+@dataclass(slots=True)
+class FleetReport:
+    jobs: list[JobReport] = field(default_factory=list)
+    wall_seconds: float = 0.0
+    jobs_per_minute: float = 0.0
+    queue_latency_p50: float = 0.0
+    queue_latency_p95: float = 0.0
+    status_counts: dict[str, int] = field(default_factory=dict)
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker fails to produce a RunResult (crash, timeout, bad output)."""
+
+
+class WorkerTimeout(WorkerError):
+    """The job outlived its timeout and may still be installing on the worker, so it is not retried."""
+
+
+class Worker(Protocol):
+    name: str
+
+    def run(self, job: Job, timeout: float) -> RunResult: ...
+
+
+class SubprocessWorker:
+    """Runs one agent process per job and parses the RunResult JSON it prints."""
+
+    def __init__(self, name: str, command: list[str]) -> None:
+        self.name = name
+        self.command = command
+
+    def run(self, job: Job, timeout: float) -> RunResult:
+        args = [part.replace("{file}", job.file) for part in self.command]
+        if job.zip_password:
+            args += ["--zip-password", job.zip_password]
+        try:
+            completed = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired as exc:
+            # Killing the agent does not stop the installer it launched.
+            raise WorkerTimeout(f"job timed out after {timeout:g}s") from exc
+        except OSError as exc:
+            raise WorkerError(f"failed to start worker process: {exc}") from exc
+        return parse_run_result(completed.stdout, completed.returncode)
+
+
+class DaemonWorker:
+    """Submits each job to a warm agent daemon (agent_daemon.py serve) instead of starting a process."""
+
+    def __init__(self, name: str, address: str, agent_args: list[str]) -> None:
+        self.name = name
+        self.address = address
+        self.agent_args = agent_args
+
+    def run(self, job: Job, timeout: float) -> RunResult:
+        argv = ["--file", job.file, *self.agent_args]
+        if job.zip_password:
+            argv += ["--zip-password", job.zip_password]
+        try:
+            _, result = submit_job(self.address, argv, token=os.environ.get(TOKEN_ENV), timeout=timeout)
+        except TimeoutError as exc:
+            # The daemon keeps running the job after the socket gives up; there is no cancel request.
+            raise WorkerTimeout(f"daemon job still running after {timeout:g}s") from exc
+        except (OSError, RuntimeError, ValueError) as exc:
+            raise WorkerError(f"daemon job failed: {exc}") from exc
+        return result
+
+
+def parse_run_result(stdout: str, returncode: int) -> RunResult:
+    start = stdout.find("{")
+    end = stdout.rfind("}")
+    if start < 0 or end < start:
+        raise WorkerError(f"worker exited with {returncode} without a RunResult")
+    try:
+        payload = json.loads(stdout[start : end + 1])
+        return RunResult(**payload)
+    except (json.JSONDecodeError, TypeError) as exc:
+        raise WorkerError(f"worker returned malformed RunResult: {exc}") from exc
+
+
+def build_worker(spec: str, index: int, agent_args: list[str]) -> Worker:
+    """Build a worker from an endpoint spec: local, daemon[:host:port], fake[:latency[:fail_rate]] or cmd:<template>.
+
+    A fake worker runs the real StepPipeline in a subprocess against
+    installer_sim's SimulatedWizard and FakeBrain, latency being the brain's
+    median seconds per call; agent_args reach it as they would local_agent.
+    """
+    name = f"{spec.split(':', 1)[0]}-{index}"
+    if spec == "local":
+        return SubprocessWorker(name, [sys.executable, str(AGENT_SCRIPT), "--file", "{file}", *agent_args])
+    if spec == "daemon" or spec.startswith("daemon:"):
+        return DaemonWorker(name, spec[len("daemon:") :] or DEFAULT_ADDRESS, agent_args)
+    if spec.startswith("fake"):
+        options = spec.split(":")[1:]
+        latency = options[0] if options else "0.2"
+        fail_rate = options[1] if len(options) > 1 else "0.0"
+        command = [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "fake-agent",
+            "--file",
+            "{file}",
+            "--latency",
+            latency,
+            "--fail-rate",
+            fail_rate,
+            *agent_args,
+        ]
+        return SubprocessWorker(name, command)
+    if spec.startswith("cmd:"):
+        return SubprocessWorker(name, shlex.split(spec[4:]))
+    raise ValueError(f"Unknown worker spec: {spec}")
+
+
+def load_jobs(source: str) -> list[Job]:
+    path = Path(source).expanduser().resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"Job source not found: {path}")
+    jobs: list[Job] = []
+    if path.is_dir():
+        files = sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in SUPPORTED_INPUTS)
+        return [Job(job_id=i, file=str(p)) for i, p in enumerate(files)]
+
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                jobs.append(Job(job_id=len(jobs), file=str(entry["file"]), zip_password=entry.get("zip_password")))
+            else:
+                jobs.append(Job(job_id=len(jobs), file=line))
+    return jobs
+
+
+class FleetScheduler:
+    """Dispatches one job at a time to each worker, retrying worker failures elsewhere."""
+
+    def __init__(
+        self,
+        workers: list[Worker],
+        job_timeout: float = 1800.0,
+        max_attempts: int = 3,
+        max_worker_failures: int = 3,
+    ) -> None:
+        if not workers:
+            raise ValueError("At least one worker is required")
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self.max_worker_failures = max_worker_failures
+        self._queue: queue.Queue[Job] = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self._reports: list[JobReport] = []
+        self._active_workers = len(workers)
+
+    def run(self, jobs: list[Job]) -> FleetReport:
+        started = time.monotonic()
+        self._pending = len(jobs)
+        for job in jobs:
+            job.enqueued_at = time.monotonic()
+            self._queue.put(job)
+
+        threads = [
+            threading.Thread(target=self._worker_loop, args=(worker,), name=f"fleet-{worker.name}", daemon=True)
+            for worker in self.workers
+        ]
+        for thread in threads:
+            thread.start()
+        with self._idle:
+            while self._pending > 0 and self._active_workers > 0:
+                self._idle.wait()
+        self._fail_remaining("no healthy workers left")
+        return self._build_report(time.monotonic() - started)
+
+    def _worker_loop(self, worker: Worker) -> None:
+        consecutive_failures = 0
+        while True:
+            with self._lock:
+                if self._pending <= 0:
+                    return
+            try:
+                job = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            job.attempts += 1
+            queue_seconds = time.monotonic() - job.enqueued_at
+            run_started = time.monotonic()
+            try:
+                result = worker.run(job, self.job_timeout)
+            except WorkerError as exc:
+                consecutive_failures += 1
+                # Retrying a timed-out job would run a second copy of the installer alongside the first.
+                timed_out = isinstance(exc, WorkerTimeout)
+                if job.attempts < self.max_attempts and not timed_out:
+                    job.enqueued_at = time.monotonic()
+                    self._queue.put(job)
+                else:
+                    result = RunResult(
+                        status="failed",
+                        reason=f"Worker failed after {job.attempts} attempts: {exc}",
+                        binary_paths=[],
+                        artifacts_dir="",
+                        steps=0,
+                        error_code="worker_timeout" if timed_out else "worker_failed",
+                    )
+                    self._complete(job, worker, queue_seconds, time.monotonic() - run_started, result)
+                if consecutive_failures >= self.max_worker_failures:
+                    with self._idle:
+                        self._active_workers -= 1
+                        self._idle.notify_all()
+                    return
+                continue
+
+            consecutive_failures = 0
+            self._complete(job, worker, queue_seconds, time.monotonic() - run_started, result)
+
+    def _complete(self, job: Job, worker: Worker, queue_seconds: float, run_seconds: float, result: RunResult) -> None:
+        report = JobReport(
+            job_id=job.job_id,
+            file=job.file,
+            worker=worker.name,
+            attempts=job.attempts,
+            queue_seconds=queue_seconds,
+            run_seconds=run_seconds,
+            result=result,
+        )
+        with self._idle:
+            self._reports.append(report)
+            self._pending -= 1
+            self._idle.notify_all()
+
+    def _fail_remaining(self, reason: str) -> None:
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            result = RunResult(
+                status="failed",
+                reason=reason,
+                binary_paths=[],
+                artifacts_dir="",
+                steps=0,
+                error_code="worker_failed",
+            )
+            self._reports.append(JobReport(job.job_id, job.file, "", job.attempts, 0.0, 0.0, result))
+
+    def _build_report(self, wall_seconds: float) -> FleetReport:
+        reports = sorted(self._reports, key=lambda r: r.job_id)
+        latencies = sorted(r.queue_seconds for r in reports)
+        counts: dict[str, int] = {}
+        for report in reports:
+            counts[report.result.status] = counts.get(report.result.status, 0) + 1
+        return FleetReport(
+            jobs=reports,
+            wall_seconds=wall_seconds,
+            jobs_per_minute=len(reports) / wall_seconds * 60 if wall_seconds > 0 else 0.0,
+            queue_latency_p50=statistics.median(latencies) if latencies else 0.0,
+            queue_latency_p95=latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+            status_counts=counts,
+        )
+
+
+def fake_agent_main(argv: list[str]) -> int:
+    """local_agent's step loop against a simulated wizard and brain; prints a RunResult like the real agent.
+
+    Flags it does not know are parsed as local_agent's. --fail-rate makes the
+    process exit before running, as a crashed worker would.
+    """
+    import dataclasses
+    import tempfile
+
+    from installer_sim import DEFAULT_PAGES, FakeBrain, SimulatedWizard, run_simulated_install
+    from model_client import lognormal_latency
+
+    parser = argparse.ArgumentParser(description="Fake installer agent")
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--zip-password", default=None)
+    parser.add_argument("--latency", type=float, default=0.2, help="Median fake brain latency per call in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--progress-seconds", type=float, default=1.0, help="Time the install progress page takes")
+    parser.add_argument("--artifacts-dir", default=".agent_runs")
+    args, agent_args = parser.parse_known_args(argv)
+    if random.random() < args.fail_rate:
+        return 3
+    pages = tuple(
+        dataclasses.replace(page, progress_seconds=args.progress_seconds) if page.progress_seconds else page
+        for page in DEFAULT_PAGES
+    )
+    wizard = SimulatedWizard(pages)
+    brain = FakeBrain(wizard, lognormal_latency(args.latency * 1000, sigma=0.25))
+    Path(args.artifacts_dir).mkdir(parents=True, exist_ok=True)
+    # Concurrent fake workers share --artifacts-dir; a per-second run stamp would collide.
+    root = Path(tempfile.mkdtemp(prefix="run-", dir=args.artifacts_dir)).resolve()
+    run = run_simulated_install(wizard, brain, root, agent_args)
+    result = RunResult(
+        status=run.status,
+        reason=run.reason,
+        binary_paths=[],
+        artifacts_dir=str(root),
+        steps=run.steps,
+        error_code=None if run.status == "success" else run.status,
+    )
+    print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
+    return 0 if run.status == "success" else 1
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run many installers concurrently across agent workers")
+    parser.add_argument("--jobs", required=True, help="Directory of installers or manifest (paths or JSON lines)")
+    parser.add_argument(
+        "--worker",
+        action="append",
+        required=True,
+        help="Worker endpoint: local, daemon[:host:port], fake[:latency[:fail_rate]] or cmd:<command with {file}>; "
+        "repeatable",
+    )
+    parser.add_argument("--job-timeout", type=float, default=1800.0, help="Per-job timeout in seconds")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per job on worker failure")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this path")
+    parser.add_argument(
+        "agent_args",
+        nargs=argparse.REMAINDER,
+        help="local_agent flags after -- for local, daemon and fake workers",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "fake-agent":
+        return fake_agent_main(argv[1:])
+
+    args = parse_args(argv)
+    agent_args = [a for a in args.agent_args if a != "--"]
+    workers = [build_worker(spec, i, agent_args) for i, spec in enumerate(args.worker)]
+    jobs = load_jobs(args.jobs)
+    scheduler = FleetScheduler(workers, job_timeout=args.job_timeout, max_attempts=args.max_attempts)
+    report = scheduler.run(jobs)
+
+    payload: dict[str, Any] = asdict(report)
+    text = json.dumps(payload, ensure_ascii=True, indent=2)
+    if args.report:
+        Path(args.report).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    print(
+        f"{len(report.jobs)} jobs in {report.wall_seconds:.1f}s: {report.jobs_per_minute:.1f} jobs/min, "
+        f"queue latency p50 {report.queue_latency_p50:.2f}s p95 {report.queue_latency_p95:.2f}s",
+        file=sys.stderr,
+    )
+    return 0 if all(r.result.status == "success" for r in report.jobs) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
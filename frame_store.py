@@ -0,0 +1,315 @@
+"""Content-addressed screenshot store with exact deduplication and dirty-rectangle deltas."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import queue
+import struct
+import sys
+import threading
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageChops
+
+INDEX_NAME = "index.jsonl"
+OBJECTS_DIR = "objects"
+DELTA_MAGIC = b"FDL1"
+DELTA_EXTENSION = "delta"
+TILE_SIZE = 32
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+@dataclass(slots=True)
+class FrameStats:
+    frames: int = 0
+    keyframes: int = 0
+    duplicates: int = 0
+    deltas: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+    errors: int = 0
+
+    @property
+    def saved_fraction(self) -> float:
+        return 1 - self.stored_bytes / self.raw_bytes if self.raw_bytes else 0.0
+
+    def report(self) -> dict[str, Any]:
+        return {**asdict(self), "saved_fraction": round(self.saved_fraction, 4)}
+
+
+@dataclass(slots=True)
+class FrameEntry:
+    name: str
+    kind: str
+    object: str
+    mime_type: str
+    bytes: int
+    base: str | None = None
+
+
+def _working(image: Image.Image) -> Image.Image:
+    return image if image.mode in ("L", "RGB") else image.convert("RGB")
+
+
+def dirty_rects(base: Image.Image, frame: Image.Image, tile: int = TILE_SIZE) -> list[tuple[int, int, int, int]]:
+    """Changed tiles as (left, top, right, bottom) boxes, merged along rows and then down columns."""
+    mask = ImageChops.difference(base, frame)
+    if mask.mode != "L":
+        mask = mask.convert("L")
+    columns = -(-mask.width // tile)
+    rows = -(-mask.height // tile)
+    # Any changed pixel leaves a non-zero box average; point() first so a one-level change cannot round away.
+    grid = mask.point(lambda value: 255 if value else 0).resize((columns, rows), Image.Resampling.BOX)
+    cells = grid.tobytes()
+    spans: dict[tuple[int, int], tuple[int, int]] = {}
+    rects: list[tuple[int, int, int, int]] = []
+    for row in range(rows):
+        current: dict[tuple[int, int], tuple[int, int]] = {}
+        column = 0
+        while column < columns:
+            if not cells[row * columns + column]:
+                column += 1
+                continue
+            start = column
+            while column < columns and cells[row * columns + column]:
+                column += 1
+            key = (start, column)
+            current[key] = (spans.pop(key)[0], row + 1) if key in spans else (row, row + 1)
+        for (start, end), (top, bottom) in spans.items():
+            rects.append((start * tile, top * tile, min(end * tile, mask.width), min(bottom * tile, mask.height)))
+        spans = current
+    for (start, end), (top, bottom) in spans.items():
+        rects.append((start * tile, top * tile, min(end * tile, mask.width), min(bottom * tile, mask.height)))
+    return rects
+
+
+def encode_delta(base_object: str, frame: Image.Image, rects: list[tuple[int, int, int, int]]) -> bytes:
+    patches: list[bytes] = []
+    for box in rects:
+        buffer = io.BytesIO()
+        frame.crop(box).save(buffer, format="PNG", compress_level=6)
+        patches.append(buffer.getvalue())
+    header = json.dumps(
+        {
+            "base": base_object,
+            "size": frame.size,
+            "mode": frame.mode,
+            "rects": rects,
+            "lengths": [len(patch) for patch in patches],
+        },
+        separators=(",", ":"),
+    ).encode("ascii")
+    return DELTA_MAGIC + struct.pack(">I", len(header)) + header + b"".join(patches)
+
+
+def _decode_delta(data: bytes) -> tuple[dict[str, Any], list[bytes]]:
+    if not data.startswith(DELTA_MAGIC):
+        raise ValueError("Not a frame delta")
+    (length,) = struct.unpack(">I", data[4:8])
+    header = json.loads(data[8 : 8 + length])
+    offset = 8 + length
+    patches = []
+    for size in header["lengths"]:
+        patches.append(data[offset : offset + size])
+        offset += size
+    return header, patches
+
+
+class FrameStore:
+    """Stores each run's screenshots once per distinct content, off the step loop's critical path.
+
+    submit() returns a reference (<root>/<name>) immediately; the background
+    thread then stores the frame as one of:
+    - dup: byte-identical to an earlier frame, or pixel-identical to the
+      latest keyframe, so it points at that frame's object;
+    - delta: changed tiles against the latest keyframe cover at most
+      max_delta_fraction of the frame and the PNG patches are smaller than
+      the encoded frame;
+    - key: the encoded frame itself, content-addressed by SHA-256.
+    Entries are appended to index.jsonl; FrameReader resolves references.
+    """
+
+    def __init__(self, root: str | Path, max_delta_fraction: float = 0.3) -> None:
+        self.root = Path(root)
+        (self.root / OBJECTS_DIR).mkdir(parents=True, exist_ok=True)
+        self.max_delta_fraction = max_delta_fraction
+        self.stats = FrameStats()
+        self._known: set[str] = set()
+        self._seen: dict[str, FrameEntry] = {}
+        self._keyframe: tuple[str, Image.Image] | None = None
+        self._index = (self.root / INDEX_NAME).open("a", encoding="utf-8")
+        self._queue: queue.Queue[tuple[str, bytes, str] | None] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="frame-store", daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, data: bytes, mime_type: str) -> str:
+        self._queue.put((name, data, mime_type))
+        return str(self.root / name)
+
+    def close(self) -> FrameStats:
+        self._queue.put(None)
+        self._thread.join()
+        self._index.close()
+        return self.stats
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            name, data, mime_type = item
+            try:
+                entry = self._store(name, data, mime_type)
+            except (OSError, ValueError) as exc:
+                self.stats.errors += 1
+                print(f"frame store failed for {name}: {exc}", file=sys.stderr)
+                continue
+            self.stats.frames += 1
+            self.stats.raw_bytes += len(data)
+            self._index.write(json.dumps(asdict(entry), ensure_ascii=True) + "\n")
+            self._index.flush()
+
+    def _store(self, name: str, data: bytes, mime_type: str) -> FrameEntry:
+        digest = hashlib.sha256(data).hexdigest()
+        seen = self._seen.get(digest)
+        if seen is not None:
+            self.stats.duplicates += 1
+            return FrameEntry(name, "dup", seen.object, mime_type, len(data), base=seen.base)
+        entry = self._encode(name, digest, data, mime_type)
+        self._seen[digest] = entry
+        return entry
+
+    def _encode(self, name: str, digest: str, data: bytes, mime_type: str) -> FrameEntry:
+        key_object = f"{digest[:2]}/{digest}.{EXTENSIONS.get(mime_type, 'bin')}"
+
+        with Image.open(io.BytesIO(data)) as decoded:
+            frame = _working(decoded)
+            frame.load()
+        if self._keyframe is not None and self.max_delta_fraction > 0:
+            base_object, base = self._keyframe
+            if base.size == frame.size and base.mode == frame.mode:
+                rects = dirty_rects(base, frame)
+                if not rects:
+                    self.stats.duplicates += 1
+                    return FrameEntry(name, "dup", base_object, mime_type, len(data))
+                area = sum((right - left) * (bottom - top) for left, top, right, bottom in rects)
+                if area <= self.max_delta_fraction * frame.width * frame.height:
+                    delta = encode_delta(base_object, frame, rects)
+                    if len(delta) < len(data):
+                        delta_digest = hashlib.sha256(delta).hexdigest()
+                        delta_object = f"{delta_digest[:2]}/{delta_digest}.{DELTA_EXTENSION}"
+                        self._write(delta_object, delta)
+                        self.stats.deltas += 1
+                        return FrameEntry(name, "delta", delta_object, mime_type, len(data), base=base_object)
+
+        self._write(key_object, data)
+        self._keyframe = (key_object, frame)
+        self.stats.keyframes += 1
+        return FrameEntry(name, "key", key_object, mime_type, len(data))
+
+    def _write(self, object_name: str, data: bytes) -> None:
+        path = self.root / OBJECTS_DIR / object_name
+        if object_name not in self._known and not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+            self.stats.stored_bytes += len(data)
+        self._known.add(object_name)
+
+
+class FrameReader:
+    """Reconstructs stored frames by name (e.g. "step-004") from a FrameStore directory."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.entries: dict[str, FrameEntry] = {}
+        with (self.root / INDEX_NAME).open("r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = FrameEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                self.entries[entry.name] = entry
+
+    def names(self) -> list[str]:
+        return sorted(self.entries)
+
+    def read(self, name: str) -> tuple[bytes, str]:
+        """Encoded image bytes and MIME type; deltas come back as lossless PNG of the reconstructed frame."""
+        entry = self._entry(name)
+        if entry.base is None:
+            return (self.root / OBJECTS_DIR / entry.object).read_bytes(), entry.mime_type
+        buffer = io.BytesIO()
+        self.load(name).save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png"
+
+    def load(self, name: str) -> Image.Image:
+        entry = self._entry(name)
+        if entry.base is None:
+            with Image.open(self.root / OBJECTS_DIR / entry.object) as image:
+                image.load()
+                return image
+        header, patches = _decode_delta((self.root / OBJECTS_DIR / entry.object).read_bytes())
+        with Image.open(self.root / OBJECTS_DIR / header["base"]) as base:
+            frame = _working(base).copy()
+        for (left, top, _, _), patch in zip(header["rects"], patches):
+            with Image.open(io.BytesIO(patch)) as image:
+                frame.paste(image, (left, top))
+        return frame
+
+    def _entry(self, name: str) -> FrameEntry:
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise FileNotFoundError(f"No frame {name!r} in {self.root}") from None
+
+
+@lru_cache(maxsize=16)
+def _reader(root: str, index_mtime_ns: int, index_size: int) -> FrameReader:
+    return FrameReader(root)
+
+
+def _resolve(ref: str | Path) -> tuple[FrameReader | None, Path]:
+    path = Path(ref)
+    index = path.parent / INDEX_NAME
+    if path.is_file() or not index.is_file():
+        return None, path
+    # Size as well as mtime: an append within one timestamp tick must not hit a stale reader.
+    stat = index.stat()
+    return _reader(str(path.parent), stat.st_mtime_ns, stat.st_size), path
+
+
+def frame_exists(ref: str | Path) -> bool:
+    reader, path = _resolve(ref)
+    return path.is_file() if reader is None else path.name in reader.entries
+
+
+def frame_refs(run_dir: Path) -> list[Path]:
+    """References to every screenshot of a run, from its frame store or a legacy screenshots/ directory."""
+    frames = run_dir / "frames"
+    if (frames / INDEX_NAME).is_file():
+        return [frames / name for name in FrameReader(frames).names()]
+    return sorted((run_dir / "screenshots").glob("step-*.*"))
+
+
+def read_frame(ref: str | Path) -> bytes:
+    """Encoded bytes for an Observation.screenshot_path, whether a store reference or a plain file."""
+    reader, path = _resolve(ref)
+    if reader is None:
+        return path.read_bytes()
+    return reader.read(path.name)[0]
+
+
+def load_frame(ref: str | Path) -> Image.Image:
+    reader, path = _resolve(ref)
+    if reader is None:
+        with Image.open(path) as image:
+            image.load()
+            return image
+    return reader.load(path.name)
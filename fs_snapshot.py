@@ -0,0 +1,163 @@
+"""Persistent filesystem snapshot index for finding binaries an install created."""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+SNAPSHOT_FORMAT_VERSION = 1
+BINARY_SUFFIXES = (".exe",)
+
+
+@dataclass(slots=True)
+class DirState:
+    mtime_ns: int
+    subdirs: list[str] = field(default_factory=list)
+    binaries: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class RefreshStats:
+    dirs_statted: int = 0
+    dirs_listed: int = 0
+
+
+def default_roots() -> list[str]:
+    roots = [os.environ.get(name) for name in ("ProgramFiles", "ProgramFiles(x86)", "LocalAppData")]
+    return sorted({root for root in roots if root and Path(root).is_dir()})
+
+
+class FsSnapshot:
+    """Directory-mtime index of executables under a set of roots.
+
+    refresh() stats every known directory but only lists those whose mtime
+    changed, plus any newly created subtrees, and returns the executables that
+    are new or whose size/mtime changed since the previous state.
+    """
+
+    def __init__(self, roots: list[str], dirs: dict[str, DirState] | None = None) -> None:
+        self.roots = roots
+        self.dirs: dict[str, DirState] = dirs if dirs is not None else {}
+        self.last_stats = RefreshStats()
+
+    @classmethod
+    def build(cls, roots: list[str]) -> FsSnapshot:
+        snapshot = cls(roots)
+        for root in roots:
+            snapshot._walk(root, [])
+        return snapshot
+
+    @classmethod
+    def load(cls, path: Path, roots: list[str]) -> FsSnapshot | None:
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if payload.get("version") != SNAPSHOT_FORMAT_VERSION or payload.get("roots") != roots:
+            return None
+        dirs = {
+            key: DirState(
+                mtime_ns=value[0],
+                subdirs=value[1],
+                binaries={name: (entry[0], entry[1]) for name, entry in value[2].items()},
+            )
+            for key, value in payload["dirs"].items()
+        }
+        return cls(roots, dirs)
+
+    @classmethod
+    def load_or_build(cls, path: Path, roots: list[str]) -> FsSnapshot:
+        snapshot = cls.load(path, roots)
+        if snapshot is None:
+            return cls.build(roots)
+        snapshot.refresh()
+        return snapshot
+
+    def save(self, path: Path) -> None:
+        payload = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "roots": self.roots,
+            "dirs": {
+                key: [state.mtime_ns, state.subdirs, {name: list(entry) for name, entry in state.binaries.items()}]
+                for key, state in self.dirs.items()
+            },
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def refresh(self) -> list[str]:
+        stats = RefreshStats()
+        changed: list[str] = []
+        for root in self.roots:
+            if root not in self.dirs:
+                self._walk(root, changed)
+        for directory in list(self.dirs):
+            state = self.dirs.get(directory)
+            if state is None:
+                continue
+            stats.dirs_statted += 1
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._drop(directory)
+                continue
+            if mtime_ns == state.mtime_ns:
+                continue
+            stats.dirs_listed += 1
+            self._rescan(directory, state, changed)
+        self.last_stats = stats
+        return sorted(changed)
+
+    def _rescan(self, directory: str, state: DirState, changed: list[str]) -> None:
+        fresh = self._scan(directory)
+        if fresh is None:
+            self._drop(directory)
+            return
+        for name, entry in fresh.binaries.items():
+            if state.binaries.get(name) != entry:
+                changed.append(os.path.join(directory, name))
+        for name in set(state.subdirs) - set(fresh.subdirs):
+            self._drop(os.path.join(directory, name))
+        for name in set(fresh.subdirs) - set(state.subdirs):
+            self._walk(os.path.join(directory, name), changed)
+        self.dirs[directory] = fresh
+
+    def _walk(self, top: str, changed: list[str]) -> None:
+        pending = [top]
+        while pending:
+            directory = pending.pop()
+            state = self._scan(directory)
+            if state is None:
+                continue
+            self.dirs[directory] = state
+            changed.extend(os.path.join(directory, name) for name in state.binaries)
+            pending.extend(os.path.join(directory, name) for name in state.subdirs)
+
+    def _scan(self, directory: str) -> DirState | None:
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            state = DirState(mtime_ns=mtime_ns)
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            state.subdirs.append(entry.name)
+                        elif entry.name.lower().endswith(BINARY_SUFFIXES):
+                            info = entry.stat(follow_symlinks=False)
+                            state.binaries[entry.name] = (info.st_size, info.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        return state
+
+    def _drop(self, directory: str) -> None:
+        state = self.dirs.pop(directory, None)
+        if state is None:
+            return
+        for name in state.subdirs:
+            self._drop(os.path.join(directory, name))
@@ -0,0 +1,109 @@
+"""Screenshot preprocessing applied before images are uploaded to the model."""
+
+from __future__ import annotations
+
+import io
+import time
+from dataclasses import dataclass, replace
+
+from PIL import Image
+
+FORMATS = {"png": ("PNG", "image/png"), "jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+COLOR_MODES = ("rgb", "grayscale", "palette")
+
+
+@dataclass(slots=True, frozen=True)
+class PreprocessConfig:
+    crop_to_window: bool = True
+    max_side: int | None = None
+    color: str = "rgb"
+    format: str = "png"
+    quality: int = 85
+
+
+@dataclass(slots=True)
+class EncodedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    encode_seconds: float
+
+    @property
+    def extension(self) -> str:
+        return self.mime_type.split("/", 1)[1].replace("jpeg", "jpg")
+
+
+PRESETS: dict[str, PreprocessConfig] = {
+    "full": PreprocessConfig(crop_to_window=False),
+    "window": PreprocessConfig(),
+    "balanced": PreprocessConfig(max_side=1280, format="webp", quality=80),
+    "compact": PreprocessConfig(max_side=1024, color="grayscale", format="jpeg", quality=70),
+    "palette": PreprocessConfig(max_side=1280, color="palette", format="png"),
+}
+
+
+def resolve_config(
+    preset: str,
+    max_side: int | None = None,
+    color: str | None = None,
+    image_format: str | None = None,
+    quality: int | None = None,
+) -> PreprocessConfig:
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown image preset: {preset}")
+    config = PRESETS[preset]
+    if max_side is not None:
+        config = replace(config, max_side=max_side if max_side > 0 else None)
+    if color is not None:
+        config = replace(config, color=color)
+    if image_format is not None:
+        config = replace(config, format=image_format)
+    if quality is not None:
+        config = replace(config, quality=quality)
+    if config.color not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode: {config.color}")
+    if config.format not in FORMATS:
+        raise ValueError(f"Unknown image format: {config.format}")
+    return config
+
+
+def preprocess(
+    image: Image.Image,
+    config: PreprocessConfig,
+    crop_box: tuple[int, int, int, int] | None = None,
+) -> EncodedImage:
+    """Crop, downscale, recolor and encode a screenshot; crop_box is (left, top, right, bottom)."""
+    started = time.perf_counter()
+    if config.crop_to_window and crop_box is not None:
+        left, top, right, bottom = crop_box
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, image.width), min(bottom, image.height)
+        if right > left and bottom > top:
+            image = image.crop((left, top, right, bottom))
+
+    if config.max_side is not None and max(image.size) > config.max_side:
+        scale = config.max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    pil_format, mime_type = FORMATS[config.format]
+    if config.color == "grayscale":
+        image = image.convert("L")
+    elif config.color == "palette" and pil_format != "JPEG":
+        image = image.convert("RGB").quantize(colors=256)
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format=pil_format, compress_level=6)
+    else:
+        image.save(buffer, format=pil_format, quality=config.quality)
+    return EncodedImage(
+        data=buffer.getvalue(),
+        mime_type=mime_type,
+        width=image.width,
+        height=image.height,
+        encode_seconds=time.perf_counter() - started,
+    )
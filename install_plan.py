@@ -0,0 +1,155 @@
+"""Plan-ahead mode: one model call maps out the next wizard pages, each verified locally before it is acted on."""
+
+from __future__ import annotations
+
+import io
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from PIL import Image
+
+from brain_agent import BrainAction, BrainDecision, PlanPage
+from decision_cache import Brain, hamming_distance
+
+LAYOUT_GRID = (32, 24)
+LAYOUT_INK_THRESHOLD = 6
+
+
+def layout_fingerprint(image_bytes: bytes) -> int:
+    """One bit per cell of a 32x24 grid, set where the cell's mean brightness stands off the page background.
+
+    Unlike the difference hash used for caching, text lines and controls set
+    bits of their own, so two pages of one wizard differ even when only their
+    wording changed; the grid is resolution-independent, so presets that
+    resize the screenshot do not matter.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = image.convert("L").resize(LAYOUT_GRID, Image.Resampling.BOX).tobytes()
+    background = sorted(pixels)[len(pixels) // 2]
+    value = 0
+    for pixel in pixels:
+        value = (value << 1) | int(abs(pixel - background) > LAYOUT_INK_THRESHOLD)
+    return value
+
+
+def normalize_label(label: str) -> str:
+    """'&Next >' and 'next' compare equal: mnemonics, arrows, ellipses, punctuation and case are ignored."""
+    return " ".join(re.sub(r"[^\w]+", " ", label.replace("&", "")).lower().split())
+
+
+@dataclass(slots=True)
+class PlanStats:
+    plans: int = 0
+    planned_pages: int = 0
+    verified: int = 0
+    repeated: int = 0
+    mismatches: dict[str, int] = field(default_factory=dict)
+
+
+class PlanningBrain:
+    """Asks the wrapped brain for a plan of the coming pages and answers from it while they verify locally.
+
+    A planned page verifies when its title substring is in the window title,
+    each of its labels is a caption of one of the installer window's controls
+    and the layout fingerprint has moved more than same_layout_bits from the
+    page before, so a Next press that did not take leaves the plan. A page
+    without labels never verifies, and nothing does when the window backend
+    cannot list control captions (context["window_labels"] is None), so the
+    loop degrades to one model call per screen. A planned page without
+    actions (a progress screen) keeps answering while its labels still match.
+    Any mismatch goes to the wrapped brain, whose reply brings a fresh plan.
+    """
+
+    def __init__(self, brain: Brain, same_layout_bits: int = 2) -> None:
+        self.brain = brain
+        self.same_layout_bits = same_layout_bits
+        self.stats = PlanStats()
+        self.planned_steps = 0
+        self.inferred_steps = 0
+        self.last_source = "model"
+        self._pages: list[PlanPage] = []
+        self._current: PlanPage | None = None
+        self._layout: int | None = None
+        self._confidence = 0.0
+
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision:
+        layout = layout_fingerprint(image_bytes)
+        labels = context.get("window_labels")
+        if labels is not None:
+            planned = self._from_plan(str(context.get("window_title", "")), labels, layout)
+            if planned is not None:
+                self.planned_steps += 1
+                self.last_source = "plan"
+                return planned
+
+        self.inferred_steps += 1
+        context = {**context, "plan": True}
+        decision = self.brain.analyze_step(image_bytes=image_bytes, context=context, mime_type=mime_type)
+        self.last_source = getattr(self.brain, "last_source", "model")
+        self._pages = list(decision.plan)
+        self._current = None
+        self._layout = layout
+        self._confidence = decision.confidence
+        if decision.plan:
+            self.stats.plans += 1
+            self.stats.planned_pages += len(decision.plan)
+        return decision
+
+    def report(self) -> dict[str, Any]:
+        return {"planned_steps": self.planned_steps, "inferred_steps": self.inferred_steps, **asdict(self.stats)}
+
+    def _from_plan(self, title: str, labels: list[str], layout: int) -> BrainDecision | None:
+        captions = [f" {normalize_label(label)} " for label in labels]
+        if self._pages:
+            page = self._pages[0]
+            reason = self._mismatch(page, title, captions, layout)
+            if reason is None:
+                self._pages.pop(0)
+                self._current = page
+                self._layout = layout
+                self.stats.verified += 1
+                return self._decision(page, labels)
+            self.stats.mismatches[reason] = self.stats.mismatches.get(reason, 0) + 1
+        current = self._current
+        if current is not None and not current.actions and self._identifies(current, title, captions):
+            self.stats.repeated += 1
+            return self._decision(current, labels)
+        return None
+
+    def _mismatch(self, page: PlanPage, title: str, captions: list[str], layout: int) -> str | None:
+        if not page.labels:
+            return "no_labels"
+        if not self._identifies(page, title, captions):
+            return "title" if page.title and page.title.lower() not in title.lower() else "labels"
+        if self._layout is not None and hamming_distance(layout, self._layout) <= self.same_layout_bits:
+            return "unchanged_layout"
+        return None
+
+    def _identifies(self, page: PlanPage, title: str, captions: list[str]) -> bool:
+        if page.title and page.title.lower() not in title.lower():
+            return False
+        for label in page.labels:
+            # Whole words only: "Install" must not match "Please wait while it is installed".
+            expected = f" {normalize_label(label)} "
+            if expected.isspace() or not any(expected in caption for caption in captions):
+                return False
+        return bool(page.labels)
+
+    def _decision(self, page: PlanPage, labels: list[str]) -> BrainDecision:
+        return BrainDecision(
+            ocr_text="\n".join(labels),
+            language="unknown",
+            intent=page.intent,
+            done=page.done,
+            needs_human=False,
+            confidence=self._confidence,
+            reason=f"Planned page {page.name or '?'} verified locally",
+            actions=[BrainAction(keys=list(action.keys), reason=action.reason) for action in page.actions],
+        )
+
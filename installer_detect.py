@@ -0,0 +1,238 @@
+"""Installer framework fingerprinting and unattended (silent) install fast path."""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import struct
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+SCAN_WINDOW = 4 << 20
+SUCCESS_EXIT_CODES = {0, 1641, 3010}
+
+# Byte signatures per framework, searched in the named region of the PE file.
+SECTION_SIGNATURES = {
+    ".ndata": "nsis",
+    ".wixburn": "wix_burn",
+}
+OVERLAY_SIGNATURES = (
+    (b"\xef\xbe\xad\xdeNullsoftInst", "nsis"),
+    (b"Inno Setup Setup Data", "inno"),
+    (b"InstallShield", "installshield"),
+    (b"ISSetupStream", "installshield"),
+)
+RESOURCE_SIGNATURES = (
+    ("Nullsoft Install System", "nsis"),
+    ("Inno Setup", "inno"),
+    ("InstallShield", "installshield"),
+    ("WiX Toolset", "wix_burn"),
+)
+BODY_SIGNATURES = (
+    (b"Nullsoft.NSIS.exehead", "nsis"),
+    (b"InnoSetupLdrWindow", "inno"),
+    (b"rDlPtS02\x87eVx", "inno"),
+)
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while chunk := handle.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(slots=True)
+class PeSection:
+    name: str
+    raw_offset: int
+    raw_size: int
+
+
+@dataclass(slots=True)
+class InstallerFingerprint:
+    framework: str
+    evidence: list[str] = field(default_factory=list)
+    sections: list[str] = field(default_factory=list)
+    overlay_offset: int | None = None
+
+
+@dataclass(slots=True)
+class SilentInstallResult:
+    framework: str
+    command: str
+    returncode: int | None
+    seconds: float
+    succeeded: bool
+    reason: str
+
+
+def parse_pe_sections(view: mmap.mmap | bytes) -> list[PeSection] | None:
+    if len(view) < 0x40 or view[:2] != b"MZ":
+        return None
+    (pe_offset,) = struct.unpack_from("<I", view, 0x3C)
+    if pe_offset + 24 > len(view) or view[pe_offset : pe_offset + 4] != b"PE\0\0":
+        return None
+    (number_of_sections,) = struct.unpack_from("<H", view, pe_offset + 6)
+    (optional_header_size,) = struct.unpack_from("<H", view, pe_offset + 20)
+    table = pe_offset + 24 + optional_header_size
+    sections: list[PeSection] = []
+    for index in range(number_of_sections):
+        entry = table + index * 40
+        if entry + 40 > len(view):
+            break
+        raw_name = bytes(view[entry : entry + 8]).rstrip(b"\0")
+        raw_size, raw_offset = struct.unpack_from("<II", view, entry + 16)
+        sections.append(PeSection(raw_name.decode("ascii", "replace"), raw_offset, raw_size))
+    return sections
+
+
+def _find(view: mmap.mmap | bytes, needle: bytes, start: int, end: int) -> bool:
+    return view.find(needle, start, min(end, len(view))) >= 0
+
+
+def fingerprint_installer(path: Path) -> InstallerFingerprint:
+    """Classify an installer by framework without reading the whole file into memory."""
+    if path.suffix.lower() == ".msi":
+        return InstallerFingerprint(framework="msi", evidence=["extension:.msi"])
+    with path.open("rb") as handle:
+        if path.stat().st_size == 0:
+            return InstallerFingerprint(framework="unknown")
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            return fingerprint_view(view)
+
+
+def fingerprint_view(view: mmap.mmap | bytes) -> InstallerFingerprint:
+    if view[:8] == OLE_SIGNATURE:
+        return InstallerFingerprint(framework="msi", evidence=["ole_compound_file"])
+    sections = parse_pe_sections(view)
+    if sections is None:
+        return InstallerFingerprint(framework="unknown", evidence=["not_pe"])
+
+    result = InstallerFingerprint(framework="unknown", sections=[s.name for s in sections])
+    votes: dict[str, int] = {}
+
+    def vote(framework: str, evidence: str, weight: int) -> None:
+        votes[framework] = votes.get(framework, 0) + weight
+        result.evidence.append(evidence)
+
+    for section in sections:
+        framework = SECTION_SIGNATURES.get(section.name.lower())
+        if framework:
+            vote(framework, f"section:{section.name}", 3)
+
+    image_end = max((s.raw_offset + s.raw_size for s in sections), default=0)
+    if 0 < image_end < len(view):
+        result.overlay_offset = image_end
+        for needle, framework in OVERLAY_SIGNATURES:
+            if _find(view, needle, image_end, image_end + SCAN_WINDOW):
+                vote(framework, f"overlay:{needle[:24]!r}", 3)
+
+    for section in sections:
+        if section.name.lower() != ".rsrc":
+            continue
+        start, end = section.raw_offset, section.raw_offset + section.raw_size
+        for text, framework in RESOURCE_SIGNATURES:
+            if _find(view, text.encode("utf-16-le"), start, end):
+                vote(framework, f"version_resource:{text}", 2)
+
+    for needle, framework in BODY_SIGNATURES:
+        if _find(view, needle, 0, min(image_end or len(view), SCAN_WINDOW)):
+            vote(framework, f"body:{needle[:24]!r}", 2)
+
+    if votes:
+        result.framework = max(votes.items(), key=lambda item: item[1])[0]
+    # A Basic MSI InstallShield setup.exe carries its .msi in the overlay and installs it silently through /v;
+    # an InstallScript one has no .msi and needs a recorded response file, so it stays "installshield".
+    if result.framework == "installshield" and result.overlay_offset is not None:
+        if _find(view, OLE_SIGNATURE, result.overlay_offset, result.overlay_offset + SCAN_WINDOW):
+            result.framework = "installshield_msi"
+            result.evidence.append("overlay:embedded_msi")
+    return result
+
+
+def silent_command(framework: str, installer_path: Path) -> tuple[str, str] | None:
+    """(program, arguments) for an unattended install that needs no further input, or None.
+
+    arguments is a raw Windows command-line tail passed through unchanged:
+    InstallShield forwards everything after /v to msiexec and only accepts
+    /v"/qn /norestart" as written, which list2cmdline would quote again.
+    InstallScript installers ("installshield") are left to the wizard, since
+    /s without a recorded setup.iss waits for input that never comes.
+    """
+    target = str(installer_path)
+    if framework == "msi":
+        return "msiexec", subprocess.list2cmdline(["/i", target, "/qn", "/norestart"])
+    if framework == "nsis":
+        return target, "/S"
+    if framework == "inno":
+        return target, "/VERYSILENT /SUPPRESSMSGBOXES /NORESTART /SP-"
+    if framework == "installshield_msi":
+        return target, '/s /v"/qn /norestart"'
+    if framework == "wix_burn":
+        return target, "/quiet /norestart"
+    return None
+
+
+def run_silent_install(
+    fingerprint: InstallerFingerprint,
+    installer_path: Path,
+    timeout: float,
+    run_as_admin: bool = False,
+) -> SilentInstallResult:
+    silent = silent_command(fingerprint.framework, installer_path)
+    if silent is None:
+        return SilentInstallResult(fingerprint.framework, "", None, 0.0, False, "no silent command for framework")
+
+    program, arguments = silent
+    command = f"{subprocess.list2cmdline([program])} {arguments}"
+    args = _elevated(program, arguments) if run_as_admin else command
+    started = time.monotonic()
+    try:
+        # A string goes to CreateProcess verbatim, keeping the argument quoting above intact.
+        process = subprocess.Popen(args)
+    except OSError as exc:
+        return SilentInstallResult(fingerprint.framework, command, None, 0.0, False, f"failed to start: {exc}")
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_tree(process)
+        return SilentInstallResult(
+            fingerprint.framework, command, None, time.monotonic() - started, False, "silent install timed out"
+        )
+    succeeded = returncode in SUCCESS_EXIT_CODES
+    return SilentInstallResult(
+        framework=fingerprint.framework,
+        command=command,
+        returncode=returncode,
+        seconds=time.monotonic() - started,
+        succeeded=succeeded,
+        reason="silent install completed" if succeeded else f"silent install exited with {returncode}",
+    )
+
+
+def _elevated(program: str, arguments: str) -> list[str]:
+    # A single -ArgumentList string reaches the process as its command-line tail unchanged.
+    program, arguments = (value.replace("'", "''") for value in (program, arguments))
+    script = (
+        f"$p = Start-Process -FilePath '{program}' -ArgumentList '{arguments}' "
+        "-Verb RunAs -Wait -PassThru; exit $p.ExitCode"
+    )
+    return ["powershell", "-NoProfile", "-Command", script]
+
+
+def _kill_tree(process: subprocess.Popen[bytes]) -> None:
+    try:
+        subprocess.run(
+            ["taskkill", "/T", "/F", "/PID", str(process.pid)],
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        pass
+    process.kill()
+    process.wait()
@@ -0,0 +1,407 @@
+"""Simulated installer wizard, screen backend and brain for driving the agent loop off Windows."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageDraw
+
+from brain_agent import BrainAction, BrainDecision, PlanPage
+from event_journal import EventJournal
+from frame_store import FrameStats, FrameStore
+from image_pipeline import resolve_config
+from install_plan import PlanningBrain
+from local_agent import StepPipeline, parse_args, set_screen_backend, set_window_backend
+from model_client import LatencySampler
+from window_tracker import FakeWindowSystem
+
+SIMULATED_PID = 4242
+DESKTOP_SIZE = (1024, 768)
+PROGRESS_INCREMENTS = 10
+BUTTON_LABELS = ("< Back", "Next >", "Cancel")
+ACCEPT_LABEL = "I accept the agreement"
+
+
+@dataclass(slots=True, frozen=True)
+class WizardPage:
+    name: str
+    intent: str
+    lines: tuple[str, ...]
+    next_keys: tuple[str, ...] = ()
+    accept_keys: tuple[str, ...] = ()
+    progress_seconds: float = 0.0
+    closes: bool = False
+    banner: bool = False
+
+
+DEFAULT_PAGES = (
+    WizardPage(
+        "welcome",
+        "confirm",
+        ("Welcome to the Example App Setup Wizard.", "Click Next to continue."),
+        ("alt+n",),
+        banner=True,
+    ),
+    WizardPage(
+        "license",
+        "license",
+        ("License Agreement", "Please read the following license agreement carefully."),
+        ("alt+n",),
+        accept_keys=("alt+a",),
+    ),
+    WizardPage("path", "path_select", ("Select Destination Location", r"C:\Program Files\Example App"), ("alt+n",)),
+    WizardPage("ready", "confirm", ("Ready to Install", "Click Install to begin."), ("alt+i",)),
+    WizardPage(
+        "progress",
+        "progress",
+        ("Installing", "Please wait while Example App is installed."),
+        progress_seconds=6.0,
+    ),
+    WizardPage(
+        "finish",
+        "finish",
+        ("Completing the Example App Setup Wizard",),
+        ("enter",),
+        closes=True,
+        banner=True,
+    ),
+)
+
+
+def _combo(keys: tuple[str, ...] | list[str]) -> str:
+    return "+".join(key.lower() for key in keys)
+
+
+class SimulatedWizard:
+    """Scripted installer implementing ScreenBackend and the bits of Popen the loop uses.
+
+    Pages render with Pillow at the window rect size. A key combination in a
+    page's next_keys advances it (once accept_keys has been pressed, if any);
+    the new page appears after transition_seconds, so settle detection sees a
+    real change. The window's control captions (page text, checkbox, buttons)
+    follow the page, as a Win32 dialog's child windows do. Progress pages animate a bar and advance on their own. The
+    window is destroyed and poll() returns 0 once a closing page is dismissed.
+    """
+
+    def __init__(
+        self,
+        pages: tuple[WizardPage, ...] = DEFAULT_PAGES,
+        title: str = "Example App Setup",
+        transition_seconds: float = 0.1,
+        pid: int = SIMULATED_PID,
+    ) -> None:
+        if not pages:
+            raise ValueError("Simulated wizard needs at least one page")
+        self.pages = pages
+        self.title = title
+        self.transition_seconds = transition_seconds
+        self.pid = pid
+        self.windows = FakeWindowSystem()
+        self.windows.spawn(pid)
+        self.hwnd: int | None = None
+        self.returncode: int | None = None
+        self.keys: list[str] = []
+        self.ignored_keys = 0
+        self.frames = 0
+        self._index = 0
+        self._accepted = False
+        self._entered_at = 0.0
+        self._pending: tuple[int, float] | None = None
+        self._closing_at: float | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self.hwnd = self.windows.create_window(self.pid, self.title)
+            self.windows.foreground = self.hwnd
+            self.windows.set_labels(self.hwnd, self._labels(self.pages[self._index]))
+            self._entered_at = time.monotonic()
+
+    def page(self) -> WizardPage | None:
+        """Page currently on screen, or None once the wizard has closed."""
+        with self._lock:
+            self._advance(time.monotonic())
+            return None if self.returncode is not None else self.pages[self._index]
+
+    def poll(self) -> int | None:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self.returncode
+
+    def press(self, key: str) -> None:
+        self._key(_combo([key]))
+
+    def hotkey(self, *keys: str) -> None:
+        self._key(_combo(keys))
+
+    def screenshot(self, region: tuple[int, int, int, int] | None = None) -> Image.Image:
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            self.frames += 1
+            if self.returncode is not None or self._pending is not None:
+                page = None
+            else:
+                page = self.pages[self._index]
+            accepted = self._accepted
+            elapsed = now - self._entered_at
+        size = (region[2], region[3]) if region is not None else DESKTOP_SIZE
+        return self._render(page, size, accepted, elapsed)
+
+    def _key(self, combo: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            self.keys.append(combo)
+            if self.returncode is not None or self._pending is not None:
+                self.ignored_keys += 1
+                return
+            page = self.pages[self._index]
+            if combo in page.accept_keys:
+                self._accepted = not self._accepted
+            elif combo in page.next_keys and (self._accepted or not page.accept_keys):
+                if page.closes:
+                    self._closing_at = now + self.transition_seconds
+                    self._pending = (self._index, now + self.transition_seconds)
+                else:
+                    self._pending = (self._index + 1, now + self.transition_seconds)
+            else:
+                self.ignored_keys += 1
+
+    def _advance(self, now: float) -> None:
+        if self.returncode is not None:
+            return
+        page = self.pages[self._index]
+        if self._pending is None and page.progress_seconds and now - self._entered_at >= page.progress_seconds:
+            self._pending = (self._index + 1, self._entered_at + page.progress_seconds)
+        if self._pending is None or now < self._pending[1]:
+            return
+        if self._closing_at is not None:
+            self.returncode = 0
+            if self.hwnd is not None:
+                self.windows.destroy_window(self.hwnd)
+                self.hwnd = None
+            return
+        self._index = min(self._pending[0], len(self.pages) - 1)
+        self._entered_at = self._pending[1]
+        self._pending = None
+        self._accepted = False
+        if self.hwnd is not None:
+            self.windows.set_labels(self.hwnd, self._labels(self.pages[self._index]))
+
+    def _labels(self, page: WizardPage) -> tuple[str, ...]:
+        return (*page.lines, *((ACCEPT_LABEL,) if page.accept_keys else ()), *BUTTON_LABELS)
+
+    def _render(self, page: WizardPage | None, size: tuple[int, int], accepted: bool, elapsed: float) -> Image.Image:
+        width, height = size
+        if self.returncode is not None:
+            return Image.new("RGB", size, (0, 90, 160))
+        image = Image.new("RGB", size, (240, 240, 240))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, width, 28), fill=(255, 255, 255))
+        draw.text((10, 8), self.title, fill="black")
+        if page is None:
+            return image
+        left = 24
+        if page.banner:
+            # Welcome and finish pages carry a side banner, as in Inno Setup and NSIS wizards.
+            draw.rectangle((0, 28, width // 3, height - 50), fill=(30, 70, 140))
+            left += width // 3
+        else:
+            draw.rectangle((0, 28, width, 90), fill=(255, 255, 255))
+        for row, line in enumerate(page.lines):
+            draw.text((left, 40 + row * 20), line, fill="black")
+        if page.accept_keys:
+            draw.rectangle((24, 200, 36, 212), outline="black", fill="black" if accepted else "white")
+            draw.text((44, 200), ACCEPT_LABEL, fill="black")
+        if page.progress_seconds:
+            # Real installers move the bar in increments rather than continuously.
+            done = min(1.0, int(elapsed / page.progress_seconds * PROGRESS_INCREMENTS) / PROGRESS_INCREMENTS)
+            draw.rectangle((24, 240, width - 24, 256), outline="black")
+            draw.rectangle((25, 241, 25 + int((width - 50) * done), 255), fill=(0, 160, 60))
+            draw.text((24, 264), f"Extracting files... {int(done * 100)}%", fill="black")
+        for column, label in enumerate(BUTTON_LABELS):
+            left = width - 270 + column * 85
+            draw.rectangle((left, height - 40, left + 75, height - 16), outline="black", fill=(225, 225, 225))
+            draw.text((left + 12, height - 34), label, fill="black")
+        return image
+
+
+class FakeBrain:
+    """Deterministic brain that answers from the wizard's current page after a configurable latency.
+
+    Actions are the page's accept_keys followed by the first of its next_keys.
+    When the pipeline passes an on_stream_action callback, actions are
+    reported halfway through the latency, as a streaming model would. When it
+    asks for a plan (context["plan"]), the following pages are returned with
+    their heading as the label, except that pages named in unplanned are left
+    out, as if the model had not anticipated them.
+    """
+
+    def __init__(
+        self,
+        wizard: SimulatedWizard,
+        latency: LatencySampler | None = None,
+        confidence: float = 0.95,
+        seed: int | None = None,
+        unplanned: tuple[str, ...] = (),
+    ) -> None:
+        self.wizard = wizard
+        self.latency = latency
+        self.confidence = confidence
+        self.unplanned = unplanned
+        self.calls = 0
+        self.last_source = "simulated"
+        self._random = random.Random(seed)
+
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision:
+        self.calls += 1
+        delay = self.latency(self._random) / 1000 if self.latency is not None else 0.0
+        page = self.wizard.page()
+        decision = self._decide(page)
+        if context.get("plan") and page is not None:
+            following = self.wizard.pages[self.wizard.pages.index(page) + 1 :]
+            decision.plan = [self._plan_page(item) for item in following if item.name not in self.unplanned]
+        callback = context.get("on_stream_action")
+        if callback is not None and decision.actions:
+            time.sleep(delay / 2)
+            gate = {
+                "intent": decision.intent,
+                "done": decision.done,
+                "needs_human": decision.needs_human,
+                "confidence": decision.confidence,
+            }
+            for index, action in enumerate(decision.actions):
+                callback(index, action, gate)
+            time.sleep(delay / 2)
+        else:
+            time.sleep(delay)
+        return decision
+
+    def _actions(self, page: WizardPage) -> list[BrainAction]:
+        combos = list(page.accept_keys) + list(page.next_keys[:1])
+        return [BrainAction(keys=combo.split("+"), reason=page.name) for combo in combos]
+
+    def _plan_page(self, page: WizardPage) -> PlanPage:
+        return PlanPage(
+            name=page.name,
+            intent=page.intent,
+            title=self.wizard.title,
+            labels=[page.lines[0]],
+            actions=self._actions(page),
+        )
+
+    def _decide(self, page: WizardPage | None) -> BrainDecision:
+        if page is None:
+            return BrainDecision(
+                ocr_text="",
+                language="en",
+                intent="finish",
+                done=True,
+                needs_human=False,
+                confidence=self.confidence,
+                reason="Installer window closed",
+                actions=[],
+            )
+        return BrainDecision(
+            ocr_text="\n".join((self.wizard.title, *page.lines)),
+            language="en",
+            intent=page.intent,
+            done=False,
+            needs_human=False,
+            confidence=self.confidence,
+            reason=f"{page.name} page",
+            actions=self._actions(page),
+        )
+
+
+@dataclass(slots=True)
+class SimulatedRun:
+    status: str
+    reason: str
+    steps: int
+    brain_calls: int
+    wall_s: float
+    keys: list[str] = field(default_factory=list)
+    ignored_keys: int = 0
+    frames: int = 0
+    frame_store: FrameStats | None = None
+    plan: dict[str, Any] | None = None
+
+
+def run_simulated_install(
+    wizard: SimulatedWizard,
+    brain: Any,
+    artifacts_dir: Path,
+    agent_args: list[str] | None = None,
+) -> SimulatedRun:
+    """Run StepPipeline against the simulated wizard with local_agent's argument defaults.
+
+    agent_args are parsed by local_agent.parse_args, so any agent flag can be
+    exercised; --plan wraps brain in a PlanningBrain as run_install does. The
+    screen and window backends are restored afterwards.
+    """
+    args = parse_args(["--file", "simulated-setup.exe", "--artifacts-dir", str(artifacts_dir), *(agent_args or [])])
+    preprocess_config = resolve_config(
+        args.image_preset,
+        max_side=args.image_max_side,
+        color=args.image_color,
+        image_format=args.image_format,
+        quality=args.image_quality,
+    )
+    planner = PlanningBrain(brain) if args.plan else None
+    set_window_backend(wizard.windows)
+    set_screen_backend(wizard)
+    frames = FrameStore(artifacts_dir / "frames", max_delta_fraction=args.frame_delta_max)
+    journal = EventJournal(
+        artifacts_dir / "events.jsonl",
+        flush=args.events_flush,
+        flush_interval=args.events_flush_interval,
+        fsync=args.events_fsync,
+        max_bytes=args.events_max_bytes,
+    )
+    started = time.perf_counter()
+    try:
+        wizard.start()
+        pipeline = StepPipeline(
+            args=args,
+            brain=planner or brain,
+            journal=journal,
+            screenshots_dir=artifacts_dir / "screenshots",
+            frames=frames,
+            preprocess_config=preprocess_config,
+            installer_pid=wizard.pid,
+            process=wizard,  # type: ignore[arg-type]
+        )
+        asyncio.run(pipeline.run())
+    finally:
+        frame_stats = frames.close()
+        journal.write({"kind": "frame_store", **frame_stats.report()})
+        if planner is not None:
+            journal.write({"kind": "plan", **planner.report()})
+        journal.close()
+        set_screen_backend(None)
+        set_window_backend(None)
+    return SimulatedRun(
+        status=pipeline.final_status,
+        reason=pipeline.final_reason,
+        steps=pipeline.step_count,
+        brain_calls=pipeline.brain_calls,
+        wall_s=time.perf_counter() - started,
+        keys=list(wizard.keys),
+        ignored_keys=wizard.ignored_keys,
+        frames=wizard.frames,
+        frame_store=frame_stats,
+        plan=planner.report() if planner is not None else None,
+    )
@@ -3,35 +3,67 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import contextlib
 import ctypes
+import functools
 import hashlib
+import io
 import json
 import os
 import platform
 import shutil
+import statistics
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import zipfile
-from dataclasses import asdict, dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Protocol
 
 from ctypes import wintypes
 
-from brain_agent import BrainAction, GeminiBrain
-
-try:
-    import pyautogui
-except Exception as exc:  # pragma: no cover - runtime environment dependent
-    pyautogui = None
-    _PYAUTOGUI_IMPORT_ERROR = exc
-else:
-    _PYAUTOGUI_IMPORT_ERROR = None
+from PIL import Image, ImageChops
+
+from event_journal import FLUSH_POLICIES, EventJournal
+from frame_store import FrameStore
+from fs_snapshot import FsSnapshot, default_roots
+from image_pipeline import COLOR_MODES, FORMATS, PRESETS, PreprocessConfig, preprocess, resolve_config
+from installer_detect import file_sha256, fingerprint_installer, run_silent_install
+from tracing import TRACER, format_summary, span
+from window_tracker import (
+    EVENT_CREATE,
+    EVENT_DESTROY,
+    EVENT_HIDE,
+    EVENT_NAME,
+    EVENT_SHOW,
+    WindowBackend,
+    WindowEventCallback,
+    WindowTracker,
+    descendant_pids,
+)
+
+# google-genai, httpx and pyautogui take most of a cold start; they are imported on first use
+# (build_model_clients, _screen) so --help, argument validation and silent installs never load them.
+if TYPE_CHECKING:
+    from brain_agent import BrainAction, GeminiBrain
+    from decision_cache import CachedBrain, DecisionCache
+    from install_plan import PlanningBrain
+    from local_classifier import ScreenClassifier, TieredBrain
+    from model_router import RoutedBrain
+    from replay_store import ReplayBrain, ReplayScript, ReplayStore
+    from request_executor import ResilientClient
 
 SUPPORTED_INPUTS = {".zip", ".exe", ".msi"}
 INSTALLER_HINTS = ("setup", "install", "installer", "msi")
+SETTLE_FRAME_SIZE = (160, 120)
+EXTRACT_CHUNK_SIZE = 1 << 20
+EXTRACT_MARKER = ".auto-installer-extracted"
+STREAM_DISPATCH_INTENTS = {"license", "path_select", "confirm", "finish", "progress"}
 
 
 @dataclass(slots=True)
@@ -43,6 +75,28 @@ class Observation:
     timestamp: float
     ocr_text: str = ""
     intent: str = "unknown"
+    image_mime_type: str = "image/png"
+    encode_seconds: float = 0.0
+    window_labels: list[str] | None = None
+    image_bytes: bytes = field(default=b"", repr=False)
+
+    def event_fields(self) -> dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "image_bytes"}
+
+
+@dataclass(slots=True)
+class SettleResult:
+    waited: float
+    changed: bool
+    settled: bool
+
+
+@dataclass(slots=True)
+class ProgressWatch:
+    waited: float
+    reason: str
+    polls: int
+    changed_fraction: float
 
 
 @dataclass(slots=True)
@@ -53,35 +107,259 @@ class RunResult:
     artifacts_dir: str
     steps: int
     error_code: str | None = None
+    replayed_steps: int = 0
+    inferred_steps: int = 0
+    extract_seconds: float = 0.0
+    extract_bytes: int = 0
+    install_mode: str = "gui"
+    framework: str = "unknown"
 
 
 if platform.system() == "Windows":
     _windll_loader = getattr(ctypes, "WinDLL", ctypes.CDLL)
     _USER32: Any = _windll_loader("user32", use_last_error=True)
+    _KERNEL32: Any = _windll_loader("kernel32", use_last_error=True)
     _SW_RESTORE = 9
 else:  # pragma: no cover - non-Windows runtime
     _USER32 = None
+    _KERNEL32 = None
     _SW_RESTORE = 9
 
 _WINFUNCTYPE = getattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)
+_WINEVENTPROC = _WINFUNCTYPE(
+    None,
+    wintypes.HANDLE,
+    wintypes.DWORD,
+    wintypes.HWND,
+    wintypes.LONG,
+    wintypes.LONG,
+    wintypes.DWORD,
+    wintypes.DWORD,
+)
+_WIN_EVENTS = {0x8000: EVENT_CREATE, 0x8001: EVENT_DESTROY, 0x8002: EVENT_SHOW, 0x8003: EVENT_HIDE, 0x800C: EVENT_NAME}
+_TH32CS_SNAPPROCESS = 0x2
+_WM_QUIT = 0x0012
+
+
+class _PROCESSENTRY32W(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", wintypes.DWORD),
+        ("cntUsage", wintypes.DWORD),
+        ("th32ProcessID", wintypes.DWORD),
+        ("th32DefaultHeapID", ctypes.c_size_t),
+        ("th32ModuleID", wintypes.DWORD),
+        ("cntThreads", wintypes.DWORD),
+        ("th32ParentProcessID", wintypes.DWORD),
+        ("pcPriClassBase", wintypes.LONG),
+        ("dwFlags", wintypes.DWORD),
+        ("szExeFile", wintypes.WCHAR * 260),
+    ]
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Windows local installer automation agent")
     parser.add_argument("--file", required=True, help="Path to .exe/.msi/.zip")
     parser.add_argument("--zip-password", default=None, help="Optional zip password")
+    parser.add_argument(
+        "--extract-cache",
+        default=None,
+        help="Directory caching extracted zip subtrees by archive SHA-256 (temporary extraction if omitted)",
+    )
     parser.add_argument("--gemini-api-key", default=None, help="Gemini API key override")
     parser.add_argument("--model", default="gemini-3-flash-preview", help="Gemini model")
+    parser.add_argument(
+        "--routing",
+        choices=("adaptive", "fixed"),
+        default="adaptive",
+        help="Pick model/thinking level per step (adaptive) or always use --model with HIGH thinking (fixed)",
+    )
+    parser.add_argument(
+        "--route-ladder",
+        default=None,
+        help="Cheapest-first model:LEVEL list for adaptive routing (default: <model>:LOW,<model>:HIGH)",
+    )
+    parser.add_argument(
+        "--route-escalate-below",
+        type=float,
+        default=0.6,
+        help="Escalate to the next route when decision confidence is below this",
+    )
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="Keep a multi-turn model session: instructions sent once, each step adds only the screenshot and a delta",
+    )
+    parser.add_argument(
+        "--session-history",
+        type=int,
+        default=4,
+        help="Session turns kept verbatim before older ones are folded into a summary",
+    )
+    parser.add_argument(
+        "--record-model",
+        default=None,
+        help="Append every raw model reply to this JSONL file (replayable offline with RecordedClient)",
+    )
+    parser.add_argument(
+        "--model-deadline",
+        type=float,
+        default=120.0,
+        help="Deadline per model decision, retries included",
+    )
+    parser.add_argument("--model-attempt-timeout", type=float, default=60.0, help="Timeout per model request")
+    parser.add_argument("--model-attempts", type=int, default=3, help="Attempts per decision on retryable errors")
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Send a second request when one runs past the model's observed p95 latency",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream model replies and send keys as soon as each action is complete",
+    )
+    parser.add_argument("--trace", action="store_true", help="Record per-stage tracing spans and print a summary")
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Write span duration summaries to this Prometheus textfile (implies --trace)",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=("prometheus", "openmetrics"),
+        default="prometheus",
+        help="Exposition format for --metrics-file",
+    )
     parser.add_argument("--max-steps", type=int, default=80, help="Maximum UI steps")
     parser.add_argument("--step-delay", type=float, default=1.4, help="Delay between steps")
+    parser.add_argument("--action-delay", type=float, default=0.3, help="Delay between keys within a step")
+    parser.add_argument(
+        "--fixed-delay",
+        action="store_true",
+        help="Sleep --step-delay after actions instead of waiting for the screen to settle",
+    )
+    parser.add_argument("--settle-timeout", type=float, default=4.0, help="Hard cap on the settle wait")
+    parser.add_argument(
+        "--settle-stable",
+        type=float,
+        default=0.25,
+        help="Seconds the frame must stay unchanged to count as settled",
+    )
+    parser.add_argument("--settle-poll", type=float, default=0.05, help="Settle polling interval")
+    parser.add_argument(
+        "--no-progress-watch",
+        action="store_true",
+        help="Keep asking the model every --step-delay on progress screens instead of watching locally",
+    )
+    parser.add_argument(
+        "--progress-watchdog",
+        type=float,
+        default=20.0,
+        help="Seconds a progress screen may stay unchanged before the model is asked again",
+    )
+    parser.add_argument("--progress-poll", type=float, default=0.5, help="Progress watch polling interval")
+    parser.add_argument(
+        "--progress-layout-change",
+        type=float,
+        default=0.08,
+        help="Fraction of changed pixels that counts as a new screen rather than progress motion",
+    )
+    parser.add_argument(
+        "--snapshot-index",
+        default=None,
+        help="Filesystem snapshot index reused across jobs (default: <artifacts-dir>/fs-snapshot.json)",
+    )
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="Find binaries by walking the installer-named folder instead of diffing a snapshot",
+    )
+    parser.add_argument(
+        "--tier0-model",
+        default=None,
+        help="Trained local screen classifier consulted before Gemini (disabled if omitted)",
+    )
+    parser.add_argument(
+        "--tier0-threshold",
+        type=float,
+        default=0.9,
+        help="Minimum calibrated tier-0 confidence before skipping the Gemini call",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Ask the model for a plan of the next wizard pages and follow it while each page verifies locally",
+    )
+    parser.add_argument(
+        "--replay-store",
+        default=None,
+        help="Directory of replay scripts recorded from successful runs (disabled if omitted)",
+    )
+    parser.add_argument("--replay-max-scripts", type=int, default=500, help="Replay store size cap")
+    parser.add_argument("--replay-max-age-days", type=float, default=90.0, help="Replay script expiry")
+    parser.add_argument(
+        "--image-preset",
+        choices=sorted(PRESETS),
+        default="full",
+        help="Screenshot preprocessing preset applied before upload",
+    )
+    parser.add_argument("--image-max-side", type=int, default=None, help="Cap the longest image side (0 = no cap)")
+    parser.add_argument("--image-color", choices=COLOR_MODES, default=None, help="Override preset color mode")
+    parser.add_argument("--image-format", choices=sorted(FORMATS), default=None, help="Override preset encoding")
+    parser.add_argument("--image-quality", type=int, default=None, help="JPEG/WebP quality override")
     parser.add_argument("--run-as-admin", action="store_true", help="Run installer elevated")
     parser.add_argument("--dry-run", action="store_true", help="Do not send keys")
+    parser.add_argument(
+        "--no-silent",
+        action="store_true",
+        help="Skip the unattended install attempt for recognised installer frameworks",
+    )
+    parser.add_argument(
+        "--silent-timeout",
+        type=float,
+        default=180.0,
+        help="Seconds a silent install may run before it is killed and the wizard is driven instead",
+    )
     parser.add_argument(
         "--artifacts-dir",
         default=".agent_runs",
         help="Directory where screenshots and logs are saved",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--events-flush",
+        choices=FLUSH_POLICIES,
+        default="step",
+        help="When buffered events reach events.jsonl: every step, every --events-flush-interval, or at exit",
+    )
+    parser.add_argument("--events-flush-interval", type=float, default=1.0, help="Seconds between interval flushes")
+    parser.add_argument("--events-fsync", action="store_true", help="fsync events.jsonl at every flush")
+    parser.add_argument(
+        "--events-max-bytes",
+        type=int,
+        default=0,
+        help="Rotate events.jsonl into gzip-compressed segments past this size (0 disables rotation)",
+    )
+    parser.add_argument(
+        "--frame-delta-max",
+        type=float,
+        default=0.3,
+        help="Store a screenshot as changed tiles against the last keyframe when they cover at most this "
+        "fraction of the frame (0 stores only keyframes and exact duplicates)",
+    )
+    parser.add_argument(
+        "--decision-cache",
+        default=None,
+        help="SQLite file for the persistent screen decision cache (disabled if omitted)",
+    )
+    parser.add_argument("--cache-ttl", type=float, default=7 * 24 * 3600, help="Cache entry TTL in seconds")
+    parser.add_argument("--cache-max-entries", type=int, default=5000, help="Cache size cap (LRU eviction)")
+    parser.add_argument(
+        "--cache-min-confidence",
+        type=float,
+        default=0.8,
+        help="Minimum decision confidence stored in and served from the cache",
+    )
+    return parser.parse_args(argv)
 
 
 def ensure_windows_native() -> tuple[bool, str | None]:
@@ -95,38 +373,104 @@ def ensure_windows_native() -> tuple[bool, str | None]:
 def setup_artifacts(base_dir: str) -> Path:
     run_stamp = time.strftime("%Y%m%d-%H%M%S")
     root = Path(base_dir).resolve() / f"run-{run_stamp}"
-    (root / "screenshots").mkdir(parents=True, exist_ok=True)
+    root.mkdir(parents=True, exist_ok=True)
     return root
 
 
-def prepare_input(input_path: str, zip_password: str | None) -> tuple[Path, Path | None]:
+@dataclass(slots=True)
+class ExtractionStats:
+    seconds: float = 0.0
+    bytes_written: int = 0
+    members: int = 0
+    cache_hit: bool = False
+
+
+def prepare_input(
+    input_path: str,
+    zip_password: str | None,
+    extract_cache: str | None = None,
+) -> tuple[Path, Path | None, ExtractionStats]:
     source = Path(input_path).expanduser().resolve()
     if not source.exists():
         raise FileNotFoundError(f"Input file not found: {source}")
     if source.suffix.lower() not in SUPPORTED_INPUTS:
         raise ValueError("Unsupported file type; expected .zip/.exe/.msi")
 
+    stats = ExtractionStats()
     if source.suffix.lower() in {".exe", ".msi"}:
-        return source, None
+        return source, None, stats
+
+    started = time.perf_counter()
+    cache_dir: Path | None = None
+    if extract_cache:
+        cache_dir = Path(extract_cache).expanduser().resolve() / file_sha256(source)
+        marker = cache_dir / EXTRACT_MARKER
+        if marker.exists():
+            installer = cache_dir / marker.read_text(encoding="utf-8").strip()
+            if installer.is_file():
+                stats.cache_hit = True
+                stats.seconds = time.perf_counter() - started
+                return installer, None, stats
 
-    extract_root = Path(tempfile.mkdtemp(prefix="auto-installer-"))
     pwd = zip_password.encode("utf-8") if zip_password else None
-    try:
-        with zipfile.ZipFile(source, "r") as zf:
-            zf.extractall(path=extract_root, pwd=pwd)
-    except RuntimeError as exc:
-        shutil.rmtree(extract_root, ignore_errors=True)
-        raise RuntimeError("Failed to extract zip archive (wrong password?)") from exc
-
-    candidates = sorted(
-        [p for p in extract_root.rglob("*") if p.is_file() and p.suffix.lower() in {".exe", ".msi"}],
-        key=score_installer_candidate,
-        reverse=True,
-    )
-    if not candidates:
-        shutil.rmtree(extract_root, ignore_errors=True)
-        raise RuntimeError("No installer executable found in zip archive")
-    return candidates[0], extract_root
+    with zipfile.ZipFile(source, "r") as zf:
+        members: list[tuple[Path, zipfile.ZipInfo]] = []
+        for info in zf.infolist():
+            relative = _safe_member_path(info.filename)
+            if relative is not None and not info.is_dir():
+                members.append((relative, info))
+        candidates = sorted(
+            (relative for relative, _ in members if relative.suffix.lower() in {".exe", ".msi"}),
+            key=score_installer_candidate,
+            reverse=True,
+        )
+        if not candidates:
+            raise RuntimeError("No installer executable found in zip archive")
+        chosen = candidates[0]
+        subtree = chosen.parent.parts
+
+        if cache_dir is not None:
+            extract_root = cache_dir.with_name(f"{cache_dir.name}.partial-{os.getpid()}")
+            shutil.rmtree(extract_root, ignore_errors=True)
+            extract_root.mkdir(parents=True)
+        else:
+            extract_root = Path(tempfile.mkdtemp(prefix="auto-installer-"))
+        try:
+            for relative, info in members:
+                if relative.parts[: len(subtree)] != subtree:
+                    continue
+                target = extract_root / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with zf.open(info, pwd=pwd) as src, target.open("wb") as dst:
+                    shutil.copyfileobj(src, dst, EXTRACT_CHUNK_SIZE)
+                stats.bytes_written += info.file_size
+                stats.members += 1
+        except RuntimeError as exc:
+            shutil.rmtree(extract_root, ignore_errors=True)
+            raise RuntimeError("Failed to extract zip archive (wrong password?)") from exc
+        except BaseException:
+            shutil.rmtree(extract_root, ignore_errors=True)
+            raise
+
+    installer = extract_root / chosen
+    if cache_dir is not None:
+        (extract_root / EXTRACT_MARKER).write_text(str(chosen), encoding="utf-8")
+        try:
+            os.replace(extract_root, cache_dir)
+        except OSError:
+            shutil.rmtree(extract_root, ignore_errors=True)
+        installer = cache_dir / chosen
+        stats.seconds = time.perf_counter() - started
+        return installer, None, stats
+    stats.seconds = time.perf_counter() - started
+    return installer, extract_root, stats
+
+
+def _safe_member_path(name: str) -> Path | None:
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or ":" in parts[0]:
+        return None
+    return Path(*parts)
 
 
 def score_installer_candidate(path: Path) -> int:
@@ -196,47 +540,211 @@ def _window_rect(hwnd: int) -> tuple[int, int, int, int] | None:
     return rect.left, rect.top, rect.right, rect.bottom
 
 
-def _find_visible_window_for_pid(pid: int) -> int | None:
-    user32 = _USER32
-    if user32 is None:
-        return None
+class Win32WindowBackend:
+    """WindowBackend over user32/kernel32 with a SetWinEventHook event thread."""
 
-    matches: list[int] = []
+    def __init__(self) -> None:
+        self._callback: WindowEventCallback | None = None
+        self._proc: Any = None
+        self._thread: threading.Thread | None = None
+        self._thread_id = 0
 
-    @_WINFUNCTYPE(ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p)
-    def _enum(hwnd: int, _lparam: int) -> bool:
-        if user32.IsWindowVisible(hwnd) == 0:
+    def enum_windows(self) -> list[int]:
+        hwnds: list[int] = []
+
+        @_WINFUNCTYPE(ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p)
+        def _enum(hwnd: int, _lparam: int) -> bool:
+            hwnds.append(hwnd)
             return True
+
+        _USER32.EnumWindows(_enum, 0)
+        return hwnds
+
+    def is_window(self, hwnd: int) -> bool:
+        return bool(_USER32.IsWindow(hwnd))
+
+    def is_visible(self, hwnd: int) -> bool:
+        return bool(_USER32.IsWindowVisible(hwnd))
+
+    def window_pid(self, hwnd: int) -> int:
         proc_id = ctypes.c_ulong(0)
-        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(proc_id))
-        if int(proc_id.value) != pid:
+        _USER32.GetWindowThreadProcessId(hwnd, ctypes.byref(proc_id))
+        return int(proc_id.value)
+
+    def window_title(self, hwnd: int) -> str:
+        return _window_title(hwnd)
+
+    def window_rect(self, hwnd: int) -> tuple[int, int, int, int] | None:
+        return _window_rect(hwnd)
+
+    def window_labels(self, hwnd: int) -> list[str]:
+        """Captions of the visible controls in a dialog: buttons, headings, checkbox texts."""
+        labels: list[str] = []
+
+        @_WINFUNCTYPE(ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p)
+        def _enum(child: int, _lparam: int) -> bool:
+            if _USER32.IsWindowVisible(child):
+                text = _window_title(child)
+                if text:
+                    labels.append(text)
             return True
-        title = _window_title(hwnd)
-        if title.strip():
-            matches.append(hwnd)
-        return True
 
-    user32.EnumWindows(_enum, 0)
-    if matches:
-        return matches[0]
-    return None
+        _USER32.EnumChildWindows(hwnd, _enum, 0)
+        return labels
+
+    def foreground_window(self) -> int:
+        return int(_USER32.GetForegroundWindow() or 0)
+
+    def focus(self, hwnd: int) -> None:
+        if _USER32.IsIconic(hwnd):
+            _USER32.ShowWindow(hwnd, _SW_RESTORE)
+        _USER32.SetForegroundWindow(hwnd)
+
+    def parent_pids(self) -> dict[int, int]:
+        _KERNEL32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+        snapshot = _KERNEL32.CreateToolhelp32Snapshot(_TH32CS_SNAPPROCESS, 0)
+        if snapshot in (None, wintypes.HANDLE(-1).value):
+            return {}
+        parents: dict[int, int] = {}
+        entry = _PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(_PROCESSENTRY32W)
+        try:
+            ok = _KERNEL32.Process32FirstW(snapshot, ctypes.byref(entry))
+            while ok:
+                parents[int(entry.th32ProcessID)] = int(entry.th32ParentProcessID)
+                ok = _KERNEL32.Process32NextW(snapshot, ctypes.byref(entry))
+        finally:
+            _KERNEL32.CloseHandle(snapshot)
+        return parents
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        if self._thread is not None:
+            return False
+        self._callback = callback
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._hook_loop, args=(ready,), name="win-event-hook", daemon=True)
+        self._thread.start()
+        ready.wait(timeout=2.0)
+        return self._thread_id != 0
+
+    def unsubscribe(self) -> None:
+        if self._thread is None:
+            return
+        if self._thread_id:
+            _USER32.PostThreadMessageW(self._thread_id, _WM_QUIT, 0, 0)
+        self._thread.join(timeout=2.0)
+        self._thread = None
+        self._thread_id = 0
+        self._callback = None
+
+    def _hook_loop(self, ready: threading.Event) -> None:
+        def _handle(_hook: int, event: int, hwnd: int, id_object: int, id_child: int, _thread: int, _time: int) -> None:
+            name = _WIN_EVENTS.get(event)
+            callback = self._callback
+            if name is None or id_object != 0 or id_child != 0 or callback is None:
+                return
+            callback(name, int(hwnd or 0))
+
+        self._proc = _WINEVENTPROC(_handle)
+        _USER32.SetWinEventHook.restype = wintypes.HANDLE
+        hook = _USER32.SetWinEventHook(0x8000, 0x800C, None, self._proc, 0, 0, 0)
+        if hook:
+            self._thread_id = int(_KERNEL32.GetCurrentThreadId())
+        ready.set()
+        if not hook:
+            return
+        msg = wintypes.MSG()
+        while _USER32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            _USER32.TranslateMessage(ctypes.byref(msg))
+            _USER32.DispatchMessageW(ctypes.byref(msg))
+        _USER32.UnhookWinEvent(hook)
+
+
+class ScreenBackend(Protocol):
+    """Screen capture and key injection; pyautogui by default."""
+
+    def screenshot(self, region: tuple[int, int, int, int] | None = None) -> Image.Image: ...
+
+    def press(self, key: str) -> None: ...
+
+    def hotkey(self, *keys: str) -> None: ...
+
+
+_WINDOW_BACKEND: WindowBackend | None = None
+_WINDOW_TRACKERS: dict[int, WindowTracker] = {}
+_SCREEN_BACKEND: ScreenBackend | None = None
+_PYAUTOGUI: Any = None
+
+
+def set_window_backend(backend: WindowBackend | None) -> None:
+    close_window_trackers()
+    global _WINDOW_BACKEND
+    _WINDOW_BACKEND = backend
+
+
+def set_screen_backend(backend: ScreenBackend | None) -> None:
+    """Route captures and key presses to backend; None restores pyautogui."""
+    global _SCREEN_BACKEND
+    _SCREEN_BACKEND = backend
+
+
+def _screen() -> ScreenBackend:
+    global _PYAUTOGUI
+    if _SCREEN_BACKEND is not None:
+        return _SCREEN_BACKEND
+    if _PYAUTOGUI is None:
+        try:
+            import pyautogui
+        except Exception as exc:  # pragma: no cover - runtime environment dependent
+            raise RuntimeError(f"pyautogui is required: {exc}") from exc
+        _PYAUTOGUI = pyautogui
+    return _PYAUTOGUI
+
+
+def warm_capture_backend() -> ScreenBackend:
+    """Import and initialise the capture backend now instead of on the first screenshot."""
+    return _screen()
+
+
+def window_tracker_for(pid: int | None) -> WindowTracker | None:
+    global _WINDOW_BACKEND
+    if pid is None:
+        return None
+    tracker = _WINDOW_TRACKERS.get(pid)
+    if tracker is not None:
+        return tracker
+    if _WINDOW_BACKEND is None:
+        if _USER32 is None:
+            return None
+        _WINDOW_BACKEND = Win32WindowBackend()
+    tracker = WindowTracker(_WINDOW_BACKEND, pid)
+    _WINDOW_TRACKERS[pid] = tracker
+    return tracker
+
+
+def close_window_trackers() -> None:
+    for tracker in _WINDOW_TRACKERS.values():
+        tracker.close()
+    _WINDOW_TRACKERS.clear()
 
 
 def focus_installer_window(installer_pid: int | None) -> bool:
-    user32 = _USER32
-    if installer_pid is None or user32 is None:
+    """Bring the installer's window forward through the window backend, if it can focus windows."""
+    tracker = window_tracker_for(installer_pid)
+    focus = getattr(_WINDOW_BACKEND, "focus", None)
+    if tracker is None or focus is None:
         return False
-    hwnd = _find_visible_window_for_pid(installer_pid)
+    hwnd = tracker.target()
     if hwnd is None:
         return False
-    if user32.IsIconic(hwnd):
-        user32.ShowWindow(hwnd, _SW_RESTORE)
-    user32.SetForegroundWindow(hwnd)
+    focus(hwnd)
     time.sleep(0.15)
     return True
 
 
 def active_window_title() -> str:
+    if _WINDOW_BACKEND is not None:
+        return _WINDOW_BACKEND.window_title(_WINDOW_BACKEND.foreground_window())
     user32 = _USER32
     if user32 is None:
         return ""
@@ -244,57 +752,224 @@ def active_window_title() -> str:
     return _window_title(hwnd)
 
 
-def capture_observation(step_index: int, screenshots_dir: Path, installer_pid: int | None) -> Observation:
-    if pyautogui is None:
-        raise RuntimeError(f"pyautogui is required: {_PYAUTOGUI_IMPORT_ERROR}")
-
-    path = screenshots_dir / f"step-{step_index:03d}.png"
-    region = None
-    window_title = active_window_title()
-
-    if installer_pid is not None:
-        hwnd = _find_visible_window_for_pid(installer_pid)
-        if hwnd is not None:
-            rect = _window_rect(hwnd)
-            if rect is not None:
-                left, top, right, bottom = rect
-                width = right - left
-                height = bottom - top
-                if width > 0 and height > 0:
-                    region = (left, top, width, height)
-                    window_title = _window_title(hwnd)
-
-    if region is None and installer_pid is not None:
-        focused = focus_installer_window(installer_pid)
-        if focused:
-            window_title = active_window_title()
-
-    image = pyautogui.screenshot(region=region) if region is not None else pyautogui.screenshot()
-    image.save(path)
-    image_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+def active_window_rect() -> tuple[int, int, int, int] | None:
+    if _WINDOW_BACKEND is not None:
+        return _WINDOW_BACKEND.window_rect(_WINDOW_BACKEND.foreground_window())
+    user32 = _USER32
+    if user32 is None:
+        return None
+    return _window_rect(user32.GetForegroundWindow())
+
+
+def installer_window_labels(installer_pid: int | None) -> list[str] | None:
+    """Control captions of the installer's window, or None when the window backend cannot list them."""
+    tracker = window_tracker_for(installer_pid)
+    labels = getattr(_WINDOW_BACKEND, "window_labels", None)
+    if tracker is None or labels is None:
+        return None
+    hwnd = tracker.target()
+    return labels(hwnd) if hwnd is not None else []
+
+
+def _installer_region(installer_pid: int | None) -> tuple[tuple[int, int, int, int] | None, str | None]:
+    tracker = window_tracker_for(installer_pid)
+    window = tracker.window() if tracker is not None else None
+    if window is None or window.rect is None:
+        return None, None
+    left, top, right, bottom = window.rect
+    width = right - left
+    height = bottom - top
+    if width <= 0 or height <= 0:
+        return None, None
+    return (left, top, width, height), window.title
+
+
+def capture_observation(
+    step_index: int,
+    screenshots_dir: Path,
+    installer_pid: int | None,
+    frames: FrameStore | None = None,
+    preprocess_config: PreprocessConfig | None = None,
+    labels: bool = False,
+    store: bool = True,
+) -> Observation:
+    """Grab, hash and encode one frame of the installer window, then store it.
+
+    With store=False the frame is left out of frames and screenshots_dir and
+    screenshot_path stays empty; the caller submits image_bytes under
+    frame_name(step_index) if it ends up using the observation.
+    """
+    screen = _screen()
+    with span("capture.window", step=step_index):
+        window_title = active_window_title()
+        region, region_title = _installer_region(installer_pid)
+        if region_title is not None:
+            window_title = region_title
+
+        if region is None and installer_pid is not None:
+            focused = focus_installer_window(installer_pid)
+            if focused:
+                window_title = active_window_title()
+        window_labels = installer_window_labels(installer_pid) if labels else None
+
+    with span("capture.grab", step=step_index):
+        image = screen.screenshot(region=region) if region is not None else screen.screenshot()
+    with span("capture.hash", step=step_index):
+        digest = hashlib.blake2b(digest_size=32)
+        digest.update(f"{image.mode}:{image.width}x{image.height}:".encode("ascii"))
+        digest.update(image.tobytes())
+    with span("capture.encode", step=step_index) as encode_span:
+        encoded = preprocess(
+            image,
+            preprocess_config or PRESETS["full"],
+            crop_box=active_window_rect() if region is None else None,
+        )
+        encode_span.set(bytes=len(encoded.data), mime_type=encoded.mime_type)
+    name = frame_name(step_index)
+    with span("capture.write", step=step_index, queued=frames is not None):
+        if not store:
+            screenshot_path = ""
+        elif frames is not None:
+            screenshot_path = frames.submit(name, encoded.data, encoded.mime_type)
+        else:
+            screenshots_dir.mkdir(parents=True, exist_ok=True)
+            path = screenshots_dir / f"{name}.{encoded.extension}"
+            path.write_bytes(encoded.data)
+            screenshot_path = str(path)
     return Observation(
         step_index=step_index,
-        screenshot_path=str(path),
-        state_hash=image_hash,
+        screenshot_path=screenshot_path,
+        state_hash=digest.hexdigest(),
         window_title=window_title,
         timestamp=time.time(),
+        image_mime_type=encoded.mime_type,
+        encode_seconds=encoded.encode_seconds,
+        window_labels=window_labels,
+        image_bytes=encoded.data,
     )
 
 
+def frame_name(step_index: int) -> str:
+    return f"step-{step_index:03d}"
+
+
+def grab_settle_frame(installer_pid: int | None) -> Any:
+    """Cheap downscaled grayscale grab of the installer window used for settle polling."""
+    return _grab_titled_frame(installer_pid)[0]
+
+
+def _grab_titled_frame(installer_pid: int | None) -> tuple[Any, str | None]:
+    screen = _screen()
+    region, title = _installer_region(installer_pid)
+    image = screen.screenshot(region=region) if region is not None else screen.screenshot()
+    return image.convert("L").resize(SETTLE_FRAME_SIZE), title
+
+
+def frames_differ(left: Any, right: Any, tolerance: int = 16) -> bool:
+    if left.size != right.size:
+        return True
+    diff = ImageChops.difference(left, right).point(lambda v: 255 if v > tolerance else 0)
+    return diff.getbbox() is not None
+
+
+def changed_fraction(left: Any, right: Any, tolerance: int = 16) -> float:
+    if left.size != right.size:
+        return 1.0
+    diff = ImageChops.difference(left, right).point(lambda v: 255 if v > tolerance else 0)
+    return diff.histogram()[255] / (diff.width * diff.height)
+
+
+def _process_tree(installer_pid: int | None) -> frozenset[int]:
+    tracker = window_tracker_for(installer_pid)
+    if tracker is None or installer_pid is None:
+        return frozenset()
+    return frozenset(descendant_pids(installer_pid, tracker.backend.parent_pids()))
+
+
+def watch_progress(
+    installer_pid: int | None,
+    process: subprocess.Popen[bytes] | None,
+    watchdog: float,
+    poll_interval: float,
+    layout_fraction: float,
+) -> ProgressWatch:
+    """Watch a progress screen locally until it needs the model again.
+
+    Progress-bar and status-line motion is ignored; the watch ends when more
+    than layout_fraction of the frame differs from the frame at entry, the
+    window title or installer process tree changes, the installer exits, or
+    the watchdog expires.
+    """
+    started = time.monotonic()
+    baseline, title = _grab_titled_frame(installer_pid)
+    tree = _process_tree(installer_pid)
+    polls = 0
+    fraction = 0.0
+    while True:
+        time.sleep(poll_interval)
+        polls += 1
+        waited = time.monotonic() - started
+        if process is not None and process.poll() is not None:
+            return ProgressWatch(waited, "exited", polls, fraction)
+        frame, current_title = _grab_titled_frame(installer_pid)
+        fraction = changed_fraction(baseline, frame)
+        if fraction > layout_fraction:
+            return ProgressWatch(waited, "layout", polls, fraction)
+        if current_title != title:
+            return ProgressWatch(waited, "title", polls, fraction)
+        if _process_tree(installer_pid) != tree:
+            return ProgressWatch(waited, "process", polls, fraction)
+        if waited >= watchdog:
+            return ProgressWatch(waited, "watchdog", polls, fraction)
+
+
+def wait_for_screen_settle(
+    installer_pid: int | None,
+    baseline: Any,
+    timeout: float,
+    stable_for: float,
+    poll_interval: float,
+) -> SettleResult:
+    """Return once the frame has changed from baseline and held still for stable_for seconds."""
+    started = time.monotonic()
+    deadline = started + timeout
+    changed = False
+    previous = baseline
+    stable_since: float | None = None
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            return SettleResult(waited=now - started, changed=changed, settled=False)
+        time.sleep(poll_interval)
+        frame = grab_settle_frame(installer_pid)
+        now = time.monotonic()
+        if not changed:
+            if frames_differ(baseline, frame):
+                changed = True
+                stable_since = now
+            previous = frame
+            continue
+        if frames_differ(previous, frame):
+            stable_since = now
+        elif stable_since is not None and now - stable_since >= stable_for:
+            return SettleResult(waited=now - started, changed=True, settled=True)
+        previous = frame
+
+
 def send_action(action: BrainAction, dry_run: bool) -> None:
     if dry_run:
         return
-    if pyautogui is None:
-        raise RuntimeError(f"pyautogui is required: {_PYAUTOGUI_IMPORT_ERROR}")
-    if len(action.keys) == 1:
-        pyautogui.press(action.keys[0])
-        return
-    pyautogui.hotkey(*action.keys)
+    screen = _screen()
+    with span("action", keys="+".join(action.keys)):
+        if len(action.keys) == 1:
+            screen.press(action.keys[0])
+            return
+        screen.hotkey(*action.keys)
 
 
-def write_jsonl(path: Path, payload: dict[str, Any]) -> None:
-    with path.open("a", encoding="utf-8") as handle:
-        handle.write(json.dumps(payload, ensure_ascii=True) + "\n")
+def record_result(journal: EventJournal, result: RunResult, installer_sha256: str) -> None:
+    """Append the final RunResult to events.jsonl so run history can be indexed."""
+    journal.write({"kind": "result", "installer_sha256": installer_sha256, **asdict(result)})
 
 
 def detect_not_installer(ocr_text: str, intent: str, window_title: str) -> bool:
@@ -333,8 +1008,631 @@ def discover_binary_candidates(installer: Path) -> list[str]:
     return candidates
 
 
+@dataclass(slots=True)
+class StageTimings:
+    capture: float = 0.0
+    inference: float = 0.0
+    actions: float = 0.0
+    wait: float = 0.0
+    logging: float = 0.0
+
+
+class EarlyActions:
+    """Sends streamed actions on the actions pool while the model is still answering.
+
+    Only installer intents that are not done, need no human and are confident
+    enough not to be rejected or escalated afterwards qualify. Indices already
+    sent are skipped when an escalated retry streams the same step again.
+    """
+
+    def __init__(
+        self,
+        pool: ThreadPoolExecutor,
+        installer_pid: int | None,
+        args: argparse.Namespace,
+        min_confidence: float,
+    ) -> None:
+        self.pool = pool
+        self.installer_pid = installer_pid
+        self.args = args
+        self.min_confidence = min_confidence
+        self.sent: list[BrainAction] = []
+        self.futures: list[Future[None]] = []
+        self.baseline: Any = None
+        self.first_sent_at: float | None = None
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, index: int, action: BrainAction, gate: dict[str, Any]) -> None:
+        if not self._allowed(gate):
+            return
+        with self._lock:
+            if index != len(self.sent):
+                return
+            self.sent.append(action)
+            self.futures.append(self.pool.submit(self._send, index, action))
+
+    def _allowed(self, gate: dict[str, Any]) -> bool:
+        try:
+            confidence = float(gate["confidence"])
+        except (TypeError, ValueError):
+            return False
+        return (
+            gate["intent"] in STREAM_DISPATCH_INTENTS
+            and gate["done"] is False
+            and gate["needs_human"] is False
+            and confidence >= self.min_confidence
+        )
+
+    def _send(self, index: int, action: BrainAction) -> None:
+        started = time.perf_counter()
+        if index == 0:
+            if not self.args.fixed_delay:
+                self.baseline = grab_settle_frame(self.installer_pid)
+        else:
+            time.sleep(self.args.action_delay)
+        send_action(action, self.args.dry_run)
+        if index == 0:
+            self.first_sent_at = time.perf_counter()
+        self.busy += time.perf_counter() - started
+
+
+class StepPipeline:
+    """Asyncio step loop overlapping capture, inference, input and event logging.
+
+    Each stage runs on its own single-thread executor so a slow model call never
+    queues behind (or in front of) key injection. While a decision is in flight
+    the next frame is captured speculatively once --step-delay has elapsed; it is
+    used when the decision has no actions and discarded otherwise. Speculative
+    frames reach the frame store only when used.
+    """
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        brain: Any,
+        journal: EventJournal,
+        screenshots_dir: Path,
+        frames: FrameStore,
+        preprocess_config: PreprocessConfig,
+        installer_pid: int | None,
+        process: subprocess.Popen[bytes] | None,
+        router: RoutedBrain | None = None,
+        gemini: GeminiBrain | None = None,
+    ) -> None:
+        self.args = args
+        self.brain = brain
+        self.router = router
+        self.gemini = gemini
+        self.journal = journal
+        self.screenshots_dir = screenshots_dir
+        self.frames = frames
+        self.preprocess_config = preprocess_config
+        self.installer_pid = installer_pid
+        self.process = process
+        self.final_status = "failed"
+        self.final_reason = "Max steps reached"
+        self.step_count = 0
+        self.brain_calls = 0
+        # Steps the model itself decided, as opposed to the cache, tier 0, a plan or a replay script.
+        self.model_steps = 0
+        self.busy = StageTimings()
+        self.speculative_used = 0
+        self.speculative_discarded = 0
+        self.progress_watches = 0
+        self.progress_seconds = 0.0
+        self.progress_calls_avoided = 0
+        self.early_actions = 0
+        self.ttfa_ms: list[float] = []
+        # Streamed actions must clear both the manual-review bar and the routing escalation bar.
+        escalate = args.route_escalate_below if args.routing == "adaptive" else 0.0
+        self.stream_min_confidence = max(0.35, escalate)
+        self._pools = {
+            name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+            for name in ("capture", "inference", "actions", "wait")
+        }
+
+    async def run(self) -> None:
+        started = time.perf_counter()
+        try:
+            await self._loop()
+        finally:
+            self._emit_spans()
+            for pool in self._pools.values():
+                pool.shutdown(wait=True)
+        wall = time.perf_counter() - started
+        busy = asdict(self.busy)
+        self.journal.write(
+            {
+                "kind": "pipeline",
+                "wall_s": round(wall, 3),
+                "busy_s": {name: round(value, 3) for name, value in busy.items()},
+                "overlap": round(sum(busy.values()) / wall, 3) if wall > 0 else 0.0,
+                "speculative_used": self.speculative_used,
+                "speculative_discarded": self.speculative_discarded,
+                "progress_watches": self.progress_watches,
+                "progress_s": round(self.progress_seconds, 3),
+                "progress_calls_avoided": self.progress_calls_avoided,
+                "early_actions": self.early_actions,
+                "ttfa_ms_p50": round(statistics.median(self.ttfa_ms), 2) if self.ttfa_ms else None,
+                "ttfa_ms_max": round(max(self.ttfa_ms), 2) if self.ttfa_ms else None,
+            },
+        )
+
+    async def _stage(self, name: str, func: Any, *args: Any, **kwargs: Any) -> tuple[Any, float]:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        result = await loop.run_in_executor(self._pools[name], functools.partial(func, *args, **kwargs))
+        elapsed = time.perf_counter() - started
+        setattr(self.busy, name, getattr(self.busy, name) + elapsed)
+        return result, elapsed
+
+    def _emit(self, payload: dict[str, Any]) -> None:
+        # Serialisation and file I/O happen on the journal's writer thread.
+        started = time.perf_counter()
+        self.journal.write(payload)
+        self.busy.logging += time.perf_counter() - started
+
+    def _emit_spans(self) -> None:
+        if TRACER.enabled:
+            spans = TRACER.drain()
+            if spans:
+                self._emit({"kind": "spans", "spans": [asdict(record) for record in spans]})
+
+    def _capture(self, step: int, store: bool = True) -> Observation:
+        return capture_observation(
+            step,
+            self.screenshots_dir,
+            self.installer_pid,
+            frames=self.frames,
+            preprocess_config=self.preprocess_config,
+            labels=self.args.plan,
+            store=store,
+        )
+
+    async def _speculative_capture(self, step: int, delay: float) -> tuple[Observation, float]:
+        await asyncio.sleep(delay)
+        # task.cancel() cannot stop the capture once it is in the executor, so a discarded
+        # frame is never submitted; the step that uses it stores it (see _loop).
+        return await self._stage("capture", self._capture, step, False)
+
+    async def _discard(self, task: asyncio.Task[Any] | None) -> None:
+        if task is None:
+            return
+        self.speculative_discarded += 1
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
+
+    async def _loop(self) -> None:
+        args = self.args
+        repeated_hash_count = 0
+        previous_hash = ""
+        previous_ocr = ""
+        previous_intent = ""
+        recent_actions: list[list[str]] = []
+        speculative: asyncio.Task[tuple[Observation, float]] | None = None
+
+        for step in range(1, args.max_steps + 1):
+            self.step_count = step
+            TRACER.step = step
+            self.journal.mark_step()
+            self._emit_spans()
+            if speculative is not None:
+                obs, capture_seconds = await speculative
+                speculative = None
+                self.speculative_used += 1
+                obs.screenshot_path = self.frames.submit(frame_name(step), obs.image_bytes, obs.image_mime_type)
+            else:
+                obs, capture_seconds = await self._stage("capture", self._capture, step)
+            if obs.state_hash == previous_hash:
+                repeated_hash_count += 1
+            else:
+                repeated_hash_count = 0
+            previous_hash = obs.state_hash
+
+            if repeated_hash_count >= 8:
+                self.final_status = "manual_required"
+                self.final_reason = "UI appears stalled on the same screen"
+                break
+
+            context = {
+                "step_index": step,
+                "window_title": obs.window_title,
+                "previous_ocr": previous_ocr,
+                "previous_intent": previous_intent,
+                "recent_actions": recent_actions[-6:],
+                "window_labels": obs.window_labels,
+            }
+            early: EarlyActions | None = None
+            if args.stream:
+                early = EarlyActions(self._pools["actions"], self.installer_pid, args, self.stream_min_confidence)
+                context["on_stream_action"] = early
+            speculative = asyncio.create_task(self._speculative_capture(step + 1, args.step_delay))
+            self.brain_calls += 1
+            inference_started = time.perf_counter()
+            try:
+                with span("inference", step=step) as inference_span:
+                    decision, model_seconds = await self._stage(
+                        "inference",
+                        self.brain.analyze_step,
+                        image_bytes=obs.image_bytes,
+                        context=context,
+                        mime_type=obs.image_mime_type,
+                    )
+                    inference_span.set(source=getattr(self.brain, "last_source", "model"))
+            except Exception as exc:
+                await self._discard(speculative)
+                await self._finish_early(early)
+                self.final_status = "failed"
+                self.final_reason = f"Gemini decision failed: {exc}"
+                self._emit({"step": step, "error": str(exc), "kind": "brain_error"})
+                break
+            early_error = await self._finish_early(early)
+            pre_sent = early.sent if early is not None else []
+            if early_error is not None:
+                await self._discard(speculative)
+                self.final_status = "failed"
+                self.final_reason = f"Action execution failed: {early_error}"
+                break
+
+            obs.ocr_text = decision.ocr_text
+            obs.intent = decision.intent
+            previous_ocr = decision.ocr_text
+            previous_intent = decision.intent
+            source = getattr(self.brain, "last_source", "model")
+            gemini = self.gemini if source == "model" else None
+            if source == "model":
+                self.model_steps += 1
+
+            self._emit(
+                {
+                    "step": step,
+                    "observation": obs.event_fields(),
+                    "decision": {
+                        "intent": decision.intent,
+                        "confidence": decision.confidence,
+                        "done": decision.done,
+                        "needs_human": decision.needs_human,
+                        "reason": decision.reason,
+                        "actions": [asdict(a) for a in decision.actions],
+                    },
+                    "source": source,
+                    "upload": {
+                        "bytes": len(obs.image_bytes),
+                        "mime_type": obs.image_mime_type,
+                        "encode_ms": round(obs.encode_seconds * 1000, 2),
+                        "model_ms": round(model_seconds * 1000, 2),
+                    },
+                    "routing": self.router.last_routing if self.router is not None and source == "model" else None,
+                    "usage": asdict(gemini.last_usage) if gemini is not None else None,
+                    "request": getattr(gemini.client, "last_call", None) if gemini is not None else None,
+                }
+            )
+
+            if detect_not_installer(decision.ocr_text, decision.intent, obs.window_title):
+                self.final_status = "not_installer"
+                self.final_reason = "Input appears to launch an app, not an installer wizard"
+                break
+
+            if decision.done:
+                self.final_status = "success"
+                self.final_reason = "Installer flow indicates completion"
+                break
+
+            if decision.needs_human or decision.confidence < 0.35:
+                self.final_status = "manual_required"
+                self.final_reason = "Model confidence too low for safe automation"
+                break
+
+            if not decision.actions and decision.intent == "progress" and not args.no_progress_watch:
+                await self._discard(speculative)
+                speculative = None
+                with span("wait.progress", step=step) as progress_span:
+                    watch, wait_seconds = await self._stage(
+                        "wait",
+                        watch_progress,
+                        self.installer_pid,
+                        self.process,
+                        watchdog=args.progress_watchdog,
+                        poll_interval=args.progress_poll,
+                        layout_fraction=args.progress_layout_change,
+                    )
+                    progress_span.set(reason=watch.reason)
+                # The plain loop would have asked the model once per step delay.
+                avoided = int(watch.waited // args.step_delay) if args.step_delay > 0 else 0
+                self.progress_watches += 1
+                self.progress_seconds += watch.waited
+                self.progress_calls_avoided += avoided
+                self._emit({"step": step, "kind": "progress_watch", "calls_avoided": avoided, **asdict(watch)})
+                self._emit_timings(step, capture_seconds, model_seconds, 0.0, wait_seconds)
+                if watch.reason == "exited" and step > 2:
+                    self.final_status = "success"
+                    self.final_reason = "Installer process exited"
+                    break
+                continue
+
+            if not decision.actions and not pre_sent:
+                self._emit_timings(step, capture_seconds, model_seconds, 0.0, 0.0)
+                continue
+
+            await self._discard(speculative)
+            speculative = None
+            actions_started = time.perf_counter()
+            recent_actions.extend(action.keys for action in pre_sent)
+            self.early_actions += len(pre_sent)
+            baseline = early.baseline if early is not None and pre_sent else None
+            first_action_at = early.first_sent_at if early is not None and pre_sent else None
+            if baseline is None and not args.fixed_delay:
+                with span("capture.baseline", step=step):
+                    baseline, _ = await self._stage("capture", grab_settle_frame, self.installer_pid)
+            action_failed = False
+            for action in decision.actions[len(pre_sent) :]:
+                if first_action_at is not None:
+                    with span("wait.action_delay", step=step):
+                        await asyncio.sleep(args.action_delay)
+                try:
+                    await self._stage("actions", send_action, action, args.dry_run)
+                except Exception as exc:
+                    self.final_status = "failed"
+                    self.final_reason = f"Action execution failed: {exc}"
+                    action_failed = True
+                    break
+                if first_action_at is None:
+                    first_action_at = time.perf_counter()
+                recent_actions.append(action.keys)
+            actions_seconds = time.perf_counter() - actions_started
+            ttfa = first_action_at - inference_started if first_action_at is not None else None
+            if ttfa is not None:
+                self.ttfa_ms.append(ttfa * 1000)
+
+            if action_failed:
+                break
+            wait_started = time.perf_counter()
+            if baseline is None:
+                with span("wait.fixed", step=step):
+                    await asyncio.sleep(args.step_delay)
+                self.busy.wait += args.step_delay
+                settle = SettleResult(waited=args.step_delay, changed=False, settled=False)
+            else:
+                with span("wait.settle", step=step) as settle_span:
+                    settle, _ = await self._stage(
+                        "wait",
+                        wait_for_screen_settle,
+                        self.installer_pid,
+                        baseline,
+                        timeout=args.settle_timeout,
+                        stable_for=args.settle_stable,
+                        poll_interval=args.settle_poll,
+                    )
+                    settle_span.set(settled=settle.settled)
+            wait_seconds = time.perf_counter() - wait_started
+            self._emit({"step": step, "kind": "settle", **asdict(settle)})
+            self._emit_timings(step, capture_seconds, model_seconds, actions_seconds, wait_seconds, ttfa)
+
+            if self.process is not None and self.process.poll() is not None and step > 2:
+                self.final_status = "success"
+                self.final_reason = "Installer process exited"
+                break
+
+        await self._discard(speculative)
+
+    async def _finish_early(self, early: EarlyActions | None) -> BaseException | None:
+        if early is None:
+            return None
+        error: BaseException | None = None
+        for future in early.futures:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception as exc:
+                error = error or exc
+        self.busy.actions += early.busy
+        return error
+
+    def _emit_timings(
+        self,
+        step: int,
+        capture: float,
+        inference: float,
+        actions: float,
+        wait: float,
+        ttfa: float | None = None,
+    ) -> None:
+        self._emit(
+            {
+                "step": step,
+                "kind": "timings",
+                "capture_ms": round(capture * 1000, 2),
+                "inference_ms": round(inference * 1000, 2),
+                "actions_ms": round(actions * 1000, 2),
+                "wait_ms": round(wait * 1000, 2),
+                "ttfa_ms": round(ttfa * 1000, 2) if ttfa is not None else None,
+            }
+        )
+
+
+def collect_binary_paths(
+    installer: Path,
+    snapshot: FsSnapshot | None,
+    snapshot_path: Path | None,
+    journal: EventJournal,
+) -> list[str]:
+    if snapshot is None or snapshot_path is None:
+        return discover_binary_candidates(installer)
+    changed = snapshot.refresh()
+    journal.write({"kind": "fs_snapshot", "changed": len(changed), **asdict(snapshot.last_stats)})
+    try:
+        snapshot.save(snapshot_path)
+    except OSError as exc:
+        print(f"snapshot index save failed: {exc}", file=sys.stderr)
+    return changed
+
+
+MODEL_CLIENT_ARGS = (
+    "gemini_api_key",
+    "model",
+    "record_model",
+    "model_deadline",
+    "model_attempt_timeout",
+    "model_attempts",
+    "hedge",
+    "session",
+    "session_history",
+    "stream",
+    "decision_cache",
+    "cache_max_entries",
+    "cache_ttl",
+    "cache_min_confidence",
+    "tier0_model",
+)
+
+
+@dataclass(slots=True)
+class ModelClients:
+    """Model-side objects built from the MODEL_CLIENT_ARGS flags; a daemon keeps them warm across jobs."""
+
+    gemini: GeminiBrain
+    resilient: ResilientClient
+    decision_cache: DecisionCache | None = None
+    classifier: ScreenClassifier | None = None
+
+    def begin_job(self) -> None:
+        """Reset session history and per-run counters; HTTP pools, caches and latency histograms stay warm."""
+        from decision_cache import CacheStats
+        from model_client import TokenUsage
+        from request_executor import ExecutorStats
+
+        self.gemini.reset_session()
+        self.gemini.calls = 0
+        self.gemini.usage = TokenUsage()
+        self.resilient.stats = ExecutorStats()
+        if self.decision_cache is not None:
+            self.decision_cache.stats = CacheStats()
+
+    def close(self) -> None:
+        self.resilient.close()
+        if self.decision_cache is not None:
+            self.decision_cache.close()
+
+
+def build_model_clients(args: argparse.Namespace) -> ModelClients:
+    from brain_agent import GeminiBrain
+    from decision_cache import DecisionCache
+    from local_classifier import ScreenClassifier
+    from model_client import GenaiClient, ModelClient, RecordingClient
+    from request_executor import RequestPolicy, ResilientClient
+
+    key = args.gemini_api_key or os.environ.get("GEMINI_API_KEY")
+    if not key:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+    client: ModelClient = GenaiClient(api_key=key, timeout=args.model_attempt_timeout)
+    if args.record_model:
+        client = RecordingClient(client, args.record_model)
+    resilient = ResilientClient(
+        client,
+        RequestPolicy(
+            deadline=args.model_deadline,
+            attempt_timeout=args.model_attempt_timeout,
+            max_attempts=args.model_attempts,
+            hedge=args.hedge,
+        ),
+    )
+    gemini = GeminiBrain(
+        api_key=args.gemini_api_key,
+        model=args.model,
+        client=resilient,
+        session=args.session,
+        history_turns=args.session_history,
+        stream=args.stream,
+    )
+    decision_cache: DecisionCache | None = None
+    if args.decision_cache:
+        decision_cache = DecisionCache(
+            args.decision_cache,
+            max_entries=args.cache_max_entries,
+            ttl_seconds=args.cache_ttl,
+            min_confidence=args.cache_min_confidence,
+        )
+    classifier = ScreenClassifier.load(args.tier0_model) if args.tier0_model else None
+    return ModelClients(gemini, resilient, decision_cache, classifier)
+
+
+@dataclass(slots=True)
+class BrainChain:
+    """One job's brain and the wrapper layers that report on it after the run."""
+
+    brain: GeminiBrain | RoutedBrain | CachedBrain | TieredBrain | PlanningBrain | ReplayBrain
+    clients: ModelClients
+    router: RoutedBrain | None = None
+    tiered: TieredBrain | None = None
+    planner: PlanningBrain | None = None
+    replay: ReplayBrain | None = None
+    replay_store: ReplayStore | None = None
+    replay_script: ReplayScript | None = None
+
+    def write_reports(self, journal: EventJournal, session: str) -> None:
+        clients = self.clients
+        if clients.decision_cache is not None:
+            journal.write({"kind": "decision_cache", **asdict(clients.decision_cache.stats)})
+        if self.tiered is not None:
+            journal.write({"kind": "tiers", **self.tiered.report()})
+        if self.planner is not None:
+            journal.write({"kind": "plan", **self.planner.report()})
+        if self.router is not None:
+            journal.write({"kind": "routing", "routes": self.router.report()})
+        journal.write({"kind": "model_latency", **clients.resilient.report()})
+        gemini = clients.gemini
+        journal.write({"kind": "model_usage", "session": session, "calls": gemini.calls, **asdict(gemini.usage)})
+
+
+def build_brain_chain(args: argparse.Namespace, clients: ModelClients, installer_sha256: str = "") -> BrainChain:
+    """Wrap clients.gemini as the flags ask: Gemini, Routed, Cached, Tiered, Planning, then Replay outermost.
+
+    --replay-store looks the script up by installer_sha256, so callers that
+    pass it must know the installer's hash.
+    """
+    from decision_cache import CachedBrain
+    from install_plan import PlanningBrain
+    from local_classifier import TieredBrain
+    from model_router import RoutedBrain, RoutingPolicy, parse_route_ladder
+    from replay_store import ReplayBrain, ReplayStore
+
+    chain = BrainChain(clients.gemini, clients)
+    if args.routing == "adaptive":
+        ladder = parse_route_ladder(args.route_ladder or f"{args.model}:LOW,{args.model}:HIGH", args.model)
+        chain.router = RoutedBrain(clients.gemini, RoutingPolicy(ladder, escalate_below=args.route_escalate_below))
+        chain.brain = chain.router
+    if clients.decision_cache is not None:
+        chain.brain = CachedBrain(chain.brain, clients.decision_cache)
+    if clients.classifier is not None:
+        chain.tiered = TieredBrain(chain.brain, clients.classifier, threshold=args.tier0_threshold)
+        chain.brain = chain.tiered
+    if args.plan:
+        chain.planner = PlanningBrain(chain.brain)
+        chain.brain = chain.planner
+    if args.replay_store:
+        if not installer_sha256:
+            raise ValueError("--replay-store needs the installer's sha256")
+        chain.replay_store = ReplayStore(
+            args.replay_store,
+            max_scripts=args.replay_max_scripts,
+            max_age_seconds=args.replay_max_age_days * 24 * 3600,
+        )
+        chain.replay_script = chain.replay_store.load(installer_sha256)
+        chain.replay = ReplayBrain(chain.brain, chain.replay_script)
+        chain.brain = chain.replay
+    return chain
+
+
 def main() -> int:
     args = parse_args()
+    exit_code, result = run_job(args)
+    print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
+    return exit_code
+
+
+def run_job(args: argparse.Namespace, clients: ModelClients | None = None) -> tuple[int, RunResult]:
+    """Run one install; clients are built on demand (and closed afterwards) unless warm ones are passed."""
     ok, error = ensure_windows_native()
     if not ok:
         result = RunResult(
@@ -345,16 +1643,80 @@ def main() -> int:
             steps=0,
             error_code=error,
         )
-        print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
-        return 2
+        return 2, result
+
+    try:
+        preprocess_config = resolve_config(
+            args.image_preset,
+            max_side=args.image_max_side,
+            color=args.image_color,
+            image_format=args.image_format,
+            quality=args.image_quality,
+        )
+    except ValueError as exc:
+        result = RunResult(
+            status="failed",
+            reason=str(exc),
+            binary_paths=[],
+            artifacts_dir="",
+            steps=0,
+            error_code="invalid_arguments",
+        )
+        return 2, result
 
+    TRACER.reset(enabled=bool(args.trace or args.metrics_file))
+    run_started = time.perf_counter()
     artifacts_dir = setup_artifacts(args.artifacts_dir)
-    events_file = artifacts_dir / "events.jsonl"
+    journal = EventJournal(
+        artifacts_dir / "events.jsonl",
+        flush=args.events_flush,
+        flush_interval=args.events_flush_interval,
+        fsync=args.events_fsync,
+        max_bytes=args.events_max_bytes,
+    )
+    try:
+        return run_install(args, artifacts_dir, journal, preprocess_config, run_started, clients)
+    finally:
+        journal.close()
+
+
+def run_install(
+    args: argparse.Namespace,
+    artifacts_dir: Path,
+    journal: EventJournal,
+    preprocess_config: PreprocessConfig,
+    run_started: float,
+    clients: ModelClients | None = None,
+) -> tuple[int, RunResult]:
+    """Run one install, releasing everything it acquired on every return and exception path.
+
+    Clients built here, window trackers, the frame store and the extraction
+    directory are registered on an exit stack as they are acquired; passed-in
+    clients stay open for the caller (the warm daemon reuses them).
+    """
+    with contextlib.ExitStack() as cleanup:
+        return _run_install(args, artifacts_dir, journal, preprocess_config, run_started, clients, cleanup)
+
+
+def _run_install(
+    args: argparse.Namespace,
+    artifacts_dir: Path,
+    journal: EventJournal,
+    preprocess_config: PreprocessConfig,
+    run_started: float,
+    clients: ModelClients | None,
+    cleanup: contextlib.ExitStack,
+) -> tuple[int, RunResult]:
     screenshots_dir = artifacts_dir / "screenshots"
     temp_extract_dir: Path | None = None
 
     try:
-        installer_path, temp_extract_dir = prepare_input(args.file, args.zip_password)
+        with span("prepare_input", step=0):
+            installer_path, temp_extract_dir, extraction = prepare_input(
+                args.file,
+                args.zip_password,
+                extract_cache=args.extract_cache,
+            )
     except Exception as exc:
         result = RunResult(
             status="failed",
@@ -364,11 +1726,46 @@ def main() -> int:
             steps=0,
             error_code="input_prepare_failed",
         )
-        print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
-        return 2
-
+        return 2, result
+    if temp_extract_dir is not None:
+        cleanup.callback(shutil.rmtree, temp_extract_dir, ignore_errors=True)
+
+    snapshot: FsSnapshot | None = None
+    snapshot_path: Path | None = None
+    if not args.no_snapshot:
+        snapshot_path = Path(args.snapshot_index or Path(args.artifacts_dir) / "fs-snapshot.json").resolve()
+        with span("fs_snapshot", step=0):
+            snapshot = FsSnapshot.load_or_build(snapshot_path, default_roots())
+
+    with span("fingerprint", step=0):
+        fingerprint = fingerprint_installer(installer_path)
+    journal.write({"kind": "fingerprint", **asdict(fingerprint)})
+    if not args.dry_run and not args.no_silent and fingerprint.framework != "unknown":
+        with span("silent_install", step=0, framework=fingerprint.framework):
+            silent = run_silent_install(fingerprint, installer_path, args.silent_timeout, args.run_as_admin)
+        journal.write({"kind": "silent_install", **asdict(silent)})
+        if silent.succeeded:
+            result = RunResult(
+                status="success",
+                reason=f"Silent {silent.framework} install completed in {silent.seconds:.1f}s",
+                binary_paths=collect_binary_paths(installer_path, snapshot, snapshot_path, journal),
+                artifacts_dir=str(artifacts_dir),
+                steps=0,
+                extract_seconds=round(extraction.seconds, 3),
+                extract_bytes=extraction.bytes_written,
+                install_mode="silent",
+                framework=fingerprint.framework,
+            )
+            record_result(journal, result, file_sha256(installer_path))
+            return 0, result
+
+    installer_sha256 = file_sha256(installer_path) if args.replay_store else ""
     try:
-        brain = GeminiBrain(api_key=args.gemini_api_key, model=args.model)
+        if clients is None:
+            clients = build_model_clients(args)
+            cleanup.callback(clients.close)
+        clients.begin_job()
+        chain = build_brain_chain(args, clients, installer_sha256)
     except Exception as exc:
         result = RunResult(
             status="failed",
@@ -378,8 +1775,10 @@ def main() -> int:
             steps=0,
             error_code="gemini_unavailable",
         )
-        print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
-        return 2
+        record_result(journal, result, installer_sha256 or file_sha256(installer_path))
+        return 2, result
+    brain = chain.brain
+    gemini = clients.gemini
 
     try:
         process, installer_pid = launch_installer(installer_path, args.run_as_admin)
@@ -392,109 +1791,73 @@ def main() -> int:
             steps=0,
             error_code="installer_launch_failed",
         )
-        print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
-        return 2
+        record_result(journal, result, installer_sha256 or file_sha256(installer_path))
+        return 2, result
+    cleanup.callback(close_window_trackers)
 
     time.sleep(2.0)
     focus_installer_window(installer_pid)
-    repeated_hash_count = 0
-    previous_hash = ""
-    previous_ocr = ""
-    recent_actions: list[list[str]] = []
-    final_status = "failed"
-    final_reason = "Max steps reached"
-    step_count = 0
-
-    for step in range(1, args.max_steps + 1):
-        step_count = step
-        obs = capture_observation(step, screenshots_dir, installer_pid)
-        if obs.state_hash == previous_hash:
-            repeated_hash_count += 1
-        else:
-            repeated_hash_count = 0
-        previous_hash = obs.state_hash
-
-        if repeated_hash_count >= 8:
-            final_status = "manual_required"
-            final_reason = "UI appears stalled on the same screen"
-            break
-
-        with open(obs.screenshot_path, "rb") as handle:
-            image_bytes = handle.read()
-
-        context = {
-            "step_index": step,
-            "window_title": obs.window_title,
-            "previous_ocr": previous_ocr,
-            "recent_actions": recent_actions[-6:],
-        }
-        try:
-            decision = brain.analyze_step(image_bytes=image_bytes, context=context)
-        except Exception as exc:
-            final_status = "failed"
-            final_reason = f"Gemini decision failed: {exc}"
-            write_jsonl(events_file, {"step": step, "error": str(exc), "kind": "brain_error"})
-            break
-
-        obs.ocr_text = decision.ocr_text
-        obs.intent = decision.intent
-        previous_ocr = decision.ocr_text
-
-        write_jsonl(
-            events_file,
+    frames = FrameStore(artifacts_dir / "frames", max_delta_fraction=args.frame_delta_max)
+    # Closing twice is harmless; this only matters when the run below raises.
+    cleanup.callback(frames.close)
+    pipeline = StepPipeline(
+        args=args,
+        brain=brain,
+        journal=journal,
+        screenshots_dir=screenshots_dir,
+        frames=frames,
+        preprocess_config=preprocess_config,
+        installer_pid=installer_pid,
+        process=process,
+        router=chain.router,
+        gemini=gemini,
+    )
+    asyncio.run(pipeline.run())
+    tracker = window_tracker_for(installer_pid)
+    if tracker is not None:
+        journal.write({"kind": "window_tracker", **asdict(tracker.stats)})
+    close_window_trackers()
+    final_status = pipeline.final_status
+    final_reason = pipeline.final_reason
+    step_count = pipeline.step_count
+
+    journal.write({"kind": "frame_store", **frames.close().report()})
+    chain.write_reports(journal, args.session)
+
+    replayed_steps = 0
+    replay = chain.replay
+    if replay is not None and chain.replay_store is not None:
+        replay_script = chain.replay_script
+        replayed_steps = replay.replayed_steps
+        journal.write(
             {
-                "step": step,
-                "observation": asdict(obs),
-                "decision": {
-                    "intent": decision.intent,
-                    "confidence": decision.confidence,
-                    "done": decision.done,
-                    "needs_human": decision.needs_human,
-                    "reason": decision.reason,
-                    "actions": [asdict(a) for a in decision.actions],
-                },
-            },
+                "kind": "replay",
+                "installer_sha256": installer_sha256,
+                "script_revision": replay_script.revision if replay_script is not None else None,
+                "replayed_steps": replayed_steps,
+                "inferred_steps": pipeline.model_steps,
+                "local_steps": pipeline.brain_calls - replayed_steps - pipeline.model_steps,
+                "model_calls": gemini.calls,
+            }
         )
-
-        if detect_not_installer(decision.ocr_text, decision.intent, obs.window_title):
-            final_status = "not_installer"
-            final_reason = "Input appears to launch an app, not an installer wizard"
-            break
-
-        if decision.done:
-            final_status = "success"
-            final_reason = "Installer flow indicates completion"
-            break
-
-        if decision.needs_human or decision.confidence < 0.35:
-            final_status = "manual_required"
-            final_reason = "Model confidence too low for safe automation"
-            break
-
-        if not decision.actions:
-            time.sleep(args.step_delay)
-            continue
-
-        for action in decision.actions:
+        if final_status == "success" and not replay.fully_replayed:
             try:
-                send_action(action, args.dry_run)
-            except Exception as exc:
-                final_status = "failed"
-                final_reason = f"Action execution failed: {exc}"
-                break
-            recent_actions.append(action.keys)
-            time.sleep(0.3)
-
-        if final_status == "failed":
-            break
-        time.sleep(args.step_delay)
-
-        if process is not None and process.poll() is not None and step > 2:
-            final_status = "success"
-            final_reason = "Installer process exited"
-            break
-
-    binary_paths = discover_binary_candidates(installer_path)
+                if not journal.flush(timeout=30.0):
+                    raise OSError(f"event journal {journal.path} did not flush")
+                chain.replay_store.record(journal.path, installer_sha256, replay_script)
+            except (OSError, ValueError, KeyError) as exc:
+                print(f"replay recording failed: {exc}", file=sys.stderr)
+
+    with span("collect_binaries"):
+        binary_paths = collect_binary_paths(installer_path, snapshot, snapshot_path, journal)
+    if TRACER.enabled:
+        wall_seconds = time.perf_counter() - run_started
+        report = TRACER.summary(wall_seconds)
+        journal.write({"kind": "trace_summary", "wall_s": round(wall_seconds, 3), "spans": report})
+        if args.trace:
+            print(format_summary(report, wall_seconds), file=sys.stderr)
+        if args.metrics_file:
+            TRACER.write_metrics(Path(args.metrics_file), openmetrics=args.metrics_format == "openmetrics")
     result = RunResult(
         status=final_status,
         reason=final_reason,
@@ -502,12 +1865,14 @@ def main() -> int:
         artifacts_dir=str(artifacts_dir),
         steps=step_count,
         error_code=None if final_status == "success" else final_status,
+        replayed_steps=replayed_steps,
+        inferred_steps=pipeline.model_steps,
+        extract_seconds=round(extraction.seconds, 3),
+        extract_bytes=extraction.bytes_written,
+        framework=fingerprint.framework,
     )
-    print(json.dumps(asdict(result), ensure_ascii=True, indent=2))
-
-    if temp_extract_dir is not None:
-        shutil.rmtree(temp_extract_dir, ignore_errors=True)
-    return 0 if final_status == "success" else 1
+    record_result(journal, result, installer_sha256 or file_sha256(installer_path))
+    return (0 if final_status == "success" else 1), result
 
 
 if __name__ == "__main__":
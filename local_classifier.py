@@ -0,0 +1,313 @@
+"""Tier-0 local screen classifier and the tiered brain that escalates to Gemini.
+
+Train from past runs (decisions the model made with high confidence):
+
+    python local_classifier.py train --artifacts-dir .agent_runs --output tier0.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import io
+import json
+import math
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageFilter
+
+from brain_agent import BrainAction, BrainDecision
+from decision_cache import Brain, cacheable
+from event_journal import read_events
+from frame_store import frame_exists, load_frame
+
+MODEL_FORMAT_VERSION = 1
+THUMB_SIZE = (16, 12)
+STRIP_COLUMNS = 32
+STRIP_HEIGHT_RATIO = 0.2
+CALIBRATION_BINS = 10
+
+
+@dataclass(slots=True)
+class Sample:
+    features: tuple[float, ...]
+    label: int
+    run: str = ""
+
+
+@dataclass(slots=True)
+class TierStats:
+    calls: int = 0
+    served: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+        return {
+            "calls": self.calls,
+            "served": self.served,
+            "hit_rate": round(self.served / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(statistics.median(ordered), 2) if ordered else 0.0,
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2) if ordered else 0.0,
+        }
+
+
+def screen_features(image: Image.Image) -> tuple[float, ...]:
+    """Coarse layout thumbnail plus an edge profile of the bottom button strip."""
+    gray = image.convert("L")
+    thumb = gray.resize(THUMB_SIZE, Image.Resampling.BILINEAR)
+    strip_top = int(gray.height * (1 - STRIP_HEIGHT_RATIO))
+    strip = gray.crop((0, strip_top, gray.width, gray.height)).filter(ImageFilter.FIND_EDGES)
+    profile = strip.resize((STRIP_COLUMNS, 1), Image.Resampling.BOX)
+    values = [v / 255.0 for v in thumb.getdata()]
+    values.extend(2.0 * v / 255.0 for v in profile.getdata())
+    return tuple(values)
+
+
+def servable(decision: BrainDecision) -> bool:
+    """Whether tier-0 may answer with the decision on a screen that only looks like the one it was made on.
+
+    On top of decision_cache.cacheable() (no toggles, no multi-action
+    decisions), a done decision is never served: a look-alike of the finish
+    page would end the run early.
+    """
+    return not decision.done and cacheable(decision)
+
+
+def journal_decision(decision: dict[str, Any]) -> BrainDecision:
+    """The BrainDecision behind a journal "decision" field, which omits ocr_text and language."""
+    return BrainDecision(
+        ocr_text="",
+        language="unknown",
+        intent=str(decision["intent"]),
+        done=bool(decision["done"]),
+        needs_human=bool(decision.get("needs_human")),
+        confidence=float(decision.get("confidence", 0.0)),
+        reason=str(decision.get("reason", "")),
+        actions=[BrainAction(keys=list(action["keys"]), reason="") for action in decision.get("actions", [])],
+    )
+
+
+def label_key(decision: dict[str, Any]) -> str:
+    actions = [list(action["keys"]) for action in decision.get("actions", [])]
+    return json.dumps([decision["intent"], bool(decision["done"]), actions], separators=(",", ":"))
+
+
+class ScreenClassifier:
+    """k-nearest-neighbour matcher over screen layout features with calibrated confidence."""
+
+    def __init__(
+        self,
+        samples: list[Sample],
+        labels: list[str],
+        bin_edges: list[float],
+        bin_accuracy: list[float],
+        k: int = 5,
+    ) -> None:
+        self.samples = samples
+        self.labels = labels
+        self.bin_edges = bin_edges
+        self.bin_accuracy = bin_accuracy
+        self.k = k
+
+    @classmethod
+    def load(cls, path: str | Path) -> ScreenClassifier:
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        if payload.get("version") != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported tier-0 model version: {payload.get('version')}")
+        samples = [Sample(tuple(features), label) for features, label in payload["samples"]]
+        return cls(samples, payload["labels"], payload["bin_edges"], payload["bin_accuracy"], payload["k"])
+
+    def save(self, path: str | Path) -> None:
+        payload = {
+            "version": MODEL_FORMAT_VERSION,
+            "k": self.k,
+            "labels": self.labels,
+            "bin_edges": self.bin_edges,
+            "bin_accuracy": self.bin_accuracy,
+            "samples": [[list(s.features), s.label] for s in self.samples],
+        }
+        Path(path).write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+
+    def predict(self, features: tuple[float, ...], exclude_run: str | None = None) -> tuple[int, float, float]:
+        """Return (label index, calibrated confidence, nearest distance), ignoring samples from exclude_run."""
+        scored = sorted(
+            (math.dist(features, sample.features), sample.label)
+            for sample in self.samples
+            if exclude_run is None or sample.run != exclude_run
+        )[: self.k]
+        if not scored:
+            return -1, 0.0, math.inf
+        votes: dict[int, float] = {}
+        for distance, label in scored:
+            votes[label] = votes.get(label, 0.0) + 1.0 / (1.0 + distance)
+        label = max(votes, key=votes.__getitem__)
+        agreement = votes[label] / sum(votes.values())
+        nearest = scored[0][0]
+        return label, self._calibrate(nearest) * agreement, nearest
+
+    def _calibrate(self, distance: float) -> float:
+        if not self.bin_accuracy:
+            return 0.0
+        index = bisect.bisect_left(self.bin_edges, distance)
+        if index >= len(self.bin_accuracy):
+            return 0.0
+        return self.bin_accuracy[index]
+
+    def decision_for(self, label: int, confidence: float) -> BrainDecision:
+        intent, done, actions = json.loads(self.labels[label])
+        return BrainDecision(
+            ocr_text="",
+            language="unknown",
+            intent=intent,
+            done=done,
+            needs_human=False,
+            confidence=confidence,
+            reason="tier-0 local screen match",
+            actions=[BrainAction(keys=keys, reason="tier-0") for keys in actions],
+        )
+
+
+def load_training_samples(artifacts_dir: Path, min_confidence: float, limit: int) -> tuple[list[Sample], list[str]]:
+    labels: list[str] = []
+    label_index: dict[str, int] = {}
+    samples: list[Sample] = []
+    # Runs are directories with a live events.jsonl; read_events also walks its rotated .gz segments.
+    for events in sorted(artifacts_dir.glob("run-*/events.jsonl")):
+        for event in read_events(events):
+            decision = event.get("decision")
+            observation = event.get("observation")
+            if not isinstance(decision, dict) or not isinstance(observation, dict):
+                continue
+            if event.get("source", "model") != "model" or decision.get("needs_human"):
+                continue
+            if float(decision.get("confidence", 0.0)) < min_confidence:
+                continue
+            if not servable(journal_decision(decision)):
+                continue
+            screenshot = observation.get("screenshot_path", "")
+            if not screenshot or not frame_exists(screenshot):
+                continue
+            with load_frame(screenshot) as image:
+                features = screen_features(image)
+            key = label_key(decision)
+            if key not in label_index:
+                label_index[key] = len(labels)
+                labels.append(key)
+            samples.append(Sample(features, label_index[key], events.parent.name))
+            if len(samples) >= limit:
+                return samples, labels
+    return samples, labels
+
+
+def train(samples: list[Sample], labels: list[str], k: int = 5) -> ScreenClassifier:
+    """Fit the matcher and calibrate confidence from leave-one-run-out accuracy per distance bin.
+
+    Frames of one run (a stalled progress page captured ten times) are near
+    duplicates that would vouch for each other under plain leave-one-out and
+    push every bin toward 1.0, so each sample is scored only against other
+    runs. A sample with no other run to match counts as a miss at infinite
+    distance, which keeps a single-run model from ever answering on its own.
+    """
+    classifier = ScreenClassifier(samples, labels, [], [], k=k)
+    outcomes: list[tuple[float, bool]] = []
+    for sample in samples:
+        label, _, distance = classifier.predict(sample.features, exclude_run=sample.run)
+        outcomes.append((distance, label == sample.label))
+    outcomes.sort()
+    if not outcomes:
+        return classifier
+    per_bin = max(1, math.ceil(len(outcomes) / CALIBRATION_BINS))
+    for start in range(0, len(outcomes), per_bin):
+        chunk = outcomes[start : start + per_bin]
+        classifier.bin_edges.append(chunk[-1][0])
+        classifier.bin_accuracy.append(sum(correct for _, correct in chunk) / len(chunk))
+    for index in range(len(classifier.bin_accuracy) - 2, -1, -1):
+        classifier.bin_accuracy[index] = max(classifier.bin_accuracy[index], classifier.bin_accuracy[index + 1])
+    return classifier
+
+
+class TieredBrain:
+    """Answers from the local tier-0 classifier when confident and the label is servable(), otherwise escalates."""
+
+    def __init__(self, brain: Brain, classifier: ScreenClassifier, threshold: float = 0.9) -> None:
+        self.brain = brain
+        self.classifier = classifier
+        self.threshold = threshold
+        self.tiers = {"tier0": TierStats(), "tier1": TierStats()}
+        self.last_source = "model"
+
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision:
+        started = time.perf_counter()
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            features = screen_features(image)
+        label, confidence, _ = self.classifier.predict(features)
+        tier0 = self.tiers["tier0"]
+        tier0.calls += 1
+        tier0.latencies_ms.append((time.perf_counter() - started) * 1000)
+        if label >= 0 and confidence >= self.threshold:
+            decision = self.classifier.decision_for(label, confidence)
+            # Models trained before servable() was applied at training time may still hold such labels.
+            if servable(decision):
+                tier0.served += 1
+                self.last_source = "tier0"
+                return decision
+
+        tier1 = self.tiers["tier1"]
+        started = time.perf_counter()
+        tier1.calls += 1
+        decision = self.brain.analyze_step(image_bytes=image_bytes, context=context, mime_type=mime_type)
+        tier1.served += 1
+        tier1.latencies_ms.append((time.perf_counter() - started) * 1000)
+        self.last_source = getattr(self.brain, "last_source", "model")
+        return decision
+
+    def report(self) -> dict[str, Any]:
+        return {name: stats.summary() for name, stats in self.tiers.items()}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Train or evaluate the tier-0 local screen classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="Train from labeled screenshots in .agent_runs")
+    train_cmd.add_argument("--artifacts-dir", default=".agent_runs")
+    train_cmd.add_argument("--output", default="tier0.json")
+    train_cmd.add_argument("--min-confidence", type=float, default=0.8, help="Minimum label confidence")
+    train_cmd.add_argument("--limit", type=int, default=4000, help="Maximum training samples")
+    train_cmd.add_argument("--k", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    samples, labels = load_training_samples(Path(args.artifacts_dir), args.min_confidence, args.limit)
+    if not samples:
+        print(f"No labeled screenshots found under {args.artifacts_dir}", file=sys.stderr)
+        return 1
+    classifier = train(samples, labels, k=args.k)
+    classifier.save(args.output)
+    summary = {
+        "samples": len(samples),
+        "labels": len(labels),
+        "calibration": [
+            {"max_distance": round(edge, 4), "accuracy": round(accuracy, 3)}
+            for edge, accuracy in zip(classifier.bin_edges, classifier.bin_accuracy)
+        ],
+        "output": str(Path(args.output).resolve()),
+    }
+    print(json.dumps(summary, ensure_ascii=True, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,478 @@
+"""Model client abstraction for GeminiBrain, with recording, recorded and simulated clients."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+from google import genai
+from google.genai import errors, types
+
+# Gemini bills a single image at a flat token count; used only by the offline estimator.
+IMAGE_TOKEN_ESTIMATE = 258
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 32
+# Recreate a context cache this long before the server expires it, so no request races the deletion.
+CACHE_REFRESH_MARGIN_SECONDS = 120
+
+LatencySampler = Callable[[random.Random], float]
+TextCallback = Callable[[str], None]
+
+
+@dataclass(slots=True)
+class TokenUsage:
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    thinking_tokens: int = 0
+
+    def add(self, other: TokenUsage) -> None:
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.thinking_tokens += other.thinking_tokens
+
+
+class RecordingMismatch(LookupError):
+    """A strict RecordedClient was asked for a call its recording does not hold."""
+
+
+@dataclass(slots=True)
+class ModelReply:
+    text: str
+    usage: TokenUsage
+    latency_ms: float
+
+
+class ModelClient(Protocol):
+    def generate(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        """Run one generation; system_instruction is sent once via context caching when possible."""
+        ...
+
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        """Like generate, but passes each chunk of reply text to on_text as it arrives."""
+        ...
+
+
+class GenaiClient:
+    """ModelClient backed by google-genai, caching system instructions per model.
+
+    The server deletes a cached content cache_ttl_seconds after creating it;
+    entries are recreated shortly before that, and a request that still finds
+    its cache gone is retried once against a fresh one. timeout (seconds) is
+    the HTTP timeout, so a hung request fails instead of holding its thread.
+    """
+
+    def __init__(self, api_key: str, cache_ttl_seconds: int = 3600, timeout: float | None = None) -> None:
+        http_options = types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        self.cache_ttl_seconds = cache_ttl_seconds
+        # (model, instruction sha256) -> (cache name or None when caching is refused, monotonic expiry)
+        self._caches: dict[tuple[str, str], tuple[str | None, float]] = {}
+        self._lock = threading.Lock()
+
+    def generate(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        started = time.perf_counter()
+        try:
+            response = self.client.models.generate_content(
+                model=model, contents=contents, config=self._with_instruction(model, config, system_instruction)
+            )
+        except errors.ClientError as exc:
+            if not self._drop_missing_cache(exc, model, system_instruction):
+                raise
+            response = self.client.models.generate_content(
+                model=model, contents=contents, config=self._with_instruction(model, config, system_instruction)
+            )
+        latency_ms = (time.perf_counter() - started) * 1000
+        return ModelReply(text=response.text or "", usage=_usage(response.usage_metadata), latency_ms=latency_ms)
+
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        started = time.perf_counter()
+        parts: list[str] = []
+        metadata = None
+        for attempt in range(2):
+            chunks = self.client.models.generate_content_stream(
+                model=model, contents=contents, config=self._with_instruction(model, config, system_instruction)
+            )
+            try:
+                for chunk in chunks:
+                    if chunk.usage_metadata is not None:
+                        metadata = chunk.usage_metadata
+                    text = chunk.text or ""
+                    if text:
+                        parts.append(text)
+                        on_text(text)
+            except errors.ClientError as exc:
+                # A lapsed cache fails before the first chunk; retry only if nothing reached on_text yet.
+                if attempt or parts or not self._drop_missing_cache(exc, model, system_instruction):
+                    raise
+                continue
+            break
+        latency_ms = (time.perf_counter() - started) * 1000
+        return ModelReply(text="".join(parts), usage=_usage(metadata), latency_ms=latency_ms)
+
+    def _with_instruction(
+        self,
+        model: str,
+        config: types.GenerateContentConfig,
+        system_instruction: str | None,
+    ) -> types.GenerateContentConfig:
+        if not system_instruction:
+            return config
+        cache_name = self._cached_content(model, system_instruction)
+        if cache_name is not None:
+            return config.model_copy(update={"cached_content": cache_name})
+        return config.model_copy(update={"system_instruction": system_instruction})
+
+    def _cached_content(self, model: str, system_instruction: str) -> str | None:
+        key = _cache_key(model, system_instruction)
+        with self._lock:
+            entry = self._caches.get(key)
+        if entry is not None and time.monotonic() < entry[1] - CACHE_REFRESH_MARGIN_SECONDS:
+            return entry[0]
+
+        # Created outside the lock so one slow call does not stall every other model's requests;
+        # two threads racing here both create a cache and the later one wins, which only costs storage.
+        expires_at = time.monotonic() + self.cache_ttl_seconds
+        try:
+            cache = self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    ttl=f"{self.cache_ttl_seconds}s",
+                ),
+            )
+            name = cache.name
+        except errors.ClientError as exc:
+            # The API rejects caches below a minimum token count (400); fall back to sending
+            # the instruction inline with every request. Auth, quota and other errors propagate.
+            if exc.code != 400:
+                raise
+            name = None
+        with self._lock:
+            self._caches[key] = (name, expires_at)
+        return name
+
+    def _drop_missing_cache(self, exc: errors.ClientError, model: str, system_instruction: str | None) -> bool:
+        """Forget a cache the server no longer has; True when the request should be retried."""
+        # Depending on the endpoint a deleted cache comes back as 404 or as 403 "CachedContent not found".
+        missing = exc.code == 404 or exc.status == "NOT_FOUND" or "cachedcontent" in (exc.message or "").lower()
+        if not system_instruction or not missing:
+            return False
+        with self._lock:
+            entry = self._caches.pop(_cache_key(model, system_instruction), None)
+        return entry is not None and entry[0] is not None
+
+
+def _cache_key(model: str, system_instruction: str) -> tuple[str, str]:
+    return model, hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+
+
+def _usage(metadata: types.GenerateContentResponseUsageMetadata | None) -> TokenUsage:
+    if metadata is None:
+        return TokenUsage()
+    return TokenUsage(
+        input_tokens=metadata.prompt_token_count or 0,
+        cached_tokens=metadata.cached_content_token_count or 0,
+        output_tokens=metadata.candidates_token_count or 0,
+        thinking_tokens=metadata.thoughts_token_count or 0,
+    )
+
+
+def _chunks(text: str, size: int = STREAM_CHUNK_CHARS) -> list[str]:
+    return [text[index : index + size] for index in range(0, len(text), size)]
+
+
+def request_digest(
+    model: str,
+    contents: list[types.Content],
+    config: types.GenerateContentConfig,
+    system_instruction: str | None = None,
+) -> str:
+    """sha256 of everything a request sends, images included; recordings use it to spot diverging replays."""
+    digest = hashlib.sha256()
+    for part in (model, system_instruction or "", config.model_dump_json(exclude_none=True)):
+        digest.update(part.encode("utf-8") + b"\0")
+    for content in contents:
+        digest.update(content.model_dump_json(exclude_none=True).encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def estimate_input_tokens(contents: list[types.Content], system_instruction: str | None = None) -> int:
+    chars = len(system_instruction or "")
+    images = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.inline_data is not None:
+                images += 1
+            elif part.text:
+                chars += len(part.text)
+    return images * IMAGE_TOKEN_ESTIMATE + chars // CHARS_PER_TOKEN
+
+
+class RecordingClient:
+    """Wraps a client and appends every reply, with the digest of its request, to a JSONL recording."""
+
+    def __init__(self, client: ModelClient, path: str | Path) -> None:
+        self.client = client
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def generate(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        reply = self.client.generate(model, contents, config, system_instruction=system_instruction)
+        self._record(model, request_digest(model, contents, config, system_instruction), reply)
+        return reply
+
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        reply = self.client.stream(model, contents, config, on_text, system_instruction=system_instruction)
+        self._record(model, request_digest(model, contents, config, system_instruction), reply)
+        return reply
+
+    def _record(self, model: str, request: str, reply: ModelReply) -> None:
+        record = {
+            "model": model,
+            "request": request,
+            "text": reply.text,
+            "latency_ms": round(reply.latency_ms, 2),
+            "usage": asdict(reply.usage),
+        }
+        with self._lock, self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record, ensure_ascii=True) + "\n")
+
+
+class RecordedClient:
+    """Offline ModelClient replaying recorded replies in order.
+
+    Input tokens are estimated from the request actually sent, so prompt-shape
+    changes are measurable offline; latency is the recorded latency plus
+    prefill_ms_per_1k for each thousand estimated uncached input tokens.
+    Cached system instructions count as cached tokens.
+
+    By default replies cycle, so a short recording can drive any prompt
+    variant. strict replays a session exactly: it raises RecordingMismatch
+    when the recording runs out or a request's model or digest differs from
+    what was recorded.
+    """
+
+    def __init__(
+        self,
+        replies: list[dict[str, Any]],
+        prefill_ms_per_1k: float = 0.0,
+        sleep: bool = False,
+        strict: bool = False,
+    ) -> None:
+        if not replies:
+            raise ValueError("Recorded client needs at least one reply")
+        self.replies = replies
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.sleep = sleep
+        self.strict = strict
+        self.calls = 0
+
+    @classmethod
+    def load(cls, path: str | Path, **kwargs: Any) -> RecordedClient:
+        with Path(path).open("r", encoding="utf-8") as handle:
+            replies = [json.loads(line) for line in handle if line.strip()]
+        return cls(replies, **kwargs)
+
+    def generate(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        record = self._next(model, contents, config, system_instruction)
+        cached = len(system_instruction or "") // CHARS_PER_TOKEN
+        total = estimate_input_tokens(contents, system_instruction)
+        latency_ms = float(record.get("latency_ms", 0.0)) + (total - cached) / 1000 * self.prefill_ms_per_1k
+        if self.sleep:
+            time.sleep(latency_ms / 1000)
+        text = str(record["text"])
+        usage = TokenUsage(input_tokens=total, cached_tokens=cached, output_tokens=len(text) // CHARS_PER_TOKEN)
+        return ModelReply(text=text, usage=usage, latency_ms=latency_ms)
+
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        sleep, self.sleep = self.sleep, False
+        try:
+            reply = self.generate(model, contents, config, system_instruction=system_instruction)
+        finally:
+            self.sleep = sleep
+        chunks = _chunks(reply.text)
+        for chunk in chunks:
+            if self.sleep:
+                time.sleep(reply.latency_ms / 1000 / len(chunks))
+            on_text(chunk)
+        return reply
+
+    def _next(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None,
+    ) -> dict[str, Any]:
+        call = self.calls
+        self.calls += 1
+        if not self.strict:
+            return self.replies[call % len(self.replies)]
+        if call >= len(self.replies):
+            raise RecordingMismatch(f"recording holds {len(self.replies)} replies; call {call + 1} has none")
+        record = self.replies[call]
+        if record.get("model", model) != model:
+            raise RecordingMismatch(f"call {call + 1} asked {model}, the recording answered {record['model']}")
+        # Recordings made before request digests were written carry none and are not checked.
+        recorded = record.get("request")
+        if recorded is not None and recorded != request_digest(model, contents, config, system_instruction):
+            raise RecordingMismatch(f"call {call + 1} sent a different request than the recording")
+        return record
+
+
+def lognormal_latency(
+    median_ms: float,
+    sigma: float = 0.35,
+    tail_prob: float = 0.0,
+    tail_factor: float = 1.0,
+) -> LatencySampler:
+    """Latency sampler (ms): log-normal body plus an optional slow tail mode."""
+
+    def sample(rng: random.Random) -> float:
+        latency = rng.lognormvariate(math.log(median_ms), sigma)
+        if tail_prob and rng.random() < tail_prob:
+            latency *= tail_factor
+        return latency
+
+    return sample
+
+
+class SimulatedClient:
+    """Offline ModelClient with an injectable latency distribution and failure rate.
+
+    The sampled latency is the time to the first output; when chars_per_second
+    is set, the reply text then takes len(text) / chars_per_second to arrive.
+    """
+
+    def __init__(
+        self,
+        replies: list[str],
+        latency: LatencySampler,
+        failure_rate: float = 0.0,
+        seed: int | None = None,
+        chars_per_second: float | None = None,
+    ) -> None:
+        if not replies:
+            raise ValueError("Simulated client needs at least one reply")
+        self.replies = replies
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.chars_per_second = chars_per_second
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        text, first_ms = self._next()
+        output_ms = len(text) / self.chars_per_second * 1000 if self.chars_per_second else 0.0
+        time.sleep((first_ms + output_ms) / 1000)
+        return self._reply(text, first_ms + output_ms, contents, system_instruction)
+
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        text, first_ms = self._next()
+        started = time.perf_counter()
+        time.sleep(first_ms / 1000)
+        for chunk in _chunks(text):
+            if self.chars_per_second:
+                time.sleep(len(chunk) / self.chars_per_second)
+            on_text(chunk)
+        return self._reply(text, (time.perf_counter() - started) * 1000, contents, system_instruction)
+
+    def _next(self) -> tuple[str, float]:
+        with self._lock:
+            text = self.replies[self.calls % len(self.replies)]
+            self.calls += 1
+            latency_ms = self.latency(self._random)
+            failed = self._random.random() < self.failure_rate
+        if failed:
+            time.sleep(latency_ms / 1000)
+            raise ConnectionError("simulated transient model failure")
+        return text, latency_ms
+
+    def _reply(
+        self,
+        text: str,
+        latency_ms: float,
+        contents: list[types.Content],
+        system_instruction: str | None,
+    ) -> ModelReply:
+        usage = TokenUsage(
+            input_tokens=estimate_input_tokens(contents, system_instruction),
+            output_tokens=len(text) // CHARS_PER_TOKEN,
+        )
+        return ModelReply(text=text, usage=usage, latency_ms=latency_ms)
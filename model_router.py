@@ -0,0 +1,158 @@
+"""Per-step model and thinking-level routing with automatic escalation."""
+
+from __future__ import annotations
+
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from brain_agent import BrainDecision, GeminiBrain, Route
+from decision_cache import hamming_distance, perceptual_hash
+
+THINKING_LEVELS = ("MINIMAL", "LOW", "MEDIUM", "HIGH")
+UNCERTAIN_INTENTS = {"unknown", "not_installer"}
+
+
+@dataclass(slots=True)
+class RouteStats:
+    calls: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    failures: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+        return {
+            "calls": self.calls,
+            "accepted": self.accepted,
+            "escalated": self.escalated,
+            "failures": self.failures,
+            "p50_ms": round(statistics.median(ordered), 2) if ordered else 0.0,
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2) if ordered else 0.0,
+        }
+
+
+def parse_route_ladder(spec: str, default_model: str) -> list[Route]:
+    """Parse "model:LEVEL,model:LEVEL" (cheapest first); a bare LEVEL uses default_model."""
+    routes: list[Route] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, level = item.rpartition(":")
+        if not model and level.upper() not in THINKING_LEVELS:
+            model, level = level, "HIGH"
+        level = level.upper()
+        if level not in THINKING_LEVELS:
+            raise ValueError(f"Unknown thinking level in route {item!r}; expected one of {', '.join(THINKING_LEVELS)}")
+        routes.append(Route(model=model or default_model, thinking_level=level))
+    if not routes:
+        raise ValueError("Route ladder is empty")
+    return routes
+
+
+@dataclass(slots=True)
+class RoutingPolicy:
+    """Chooses the starting rung of a cheapest-first route ladder.
+
+    Steps start on the cheapest route unless the previous screen was not
+    understood, recent decisions were unsure, or the screen changed a lot while
+    confidence was only moderate; those start one rung up. A decision below
+    escalate_below (or one that fails validation) moves up the ladder.
+    """
+
+    ladder: list[Route]
+    escalate_below: float = 0.6
+    confident_above: float = 0.8
+    large_change_bits: int = 20
+    history: int = 3
+
+    def start(self, previous_intent: str | None, change_bits: int, recent_confidence: float | None) -> tuple[int, str]:
+        top = len(self.ladder) - 1
+        if previous_intent in UNCERTAIN_INTENTS:
+            return min(1, top), "previous_uncertain"
+        if recent_confidence is not None and recent_confidence < self.escalate_below:
+            return min(1, top), "low_recent_confidence"
+        if previous_intent == "progress" and change_bits < self.large_change_bits:
+            return 0, "progress"
+        if change_bits >= self.large_change_bits and (recent_confidence or 0.0) < self.confident_above:
+            return min(1, top), "new_screen"
+        return 0, "default"
+
+    def should_escalate(self, decision: BrainDecision) -> bool:
+        return decision.needs_human or decision.confidence < self.escalate_below
+
+
+class RoutedBrain:
+    """Calls GeminiBrain on the route chosen by a RoutingPolicy, escalating as needed."""
+
+    def __init__(self, brain: GeminiBrain, policy: RoutingPolicy) -> None:
+        self.brain = brain
+        self.policy = policy
+        self.routes = {str(route): RouteStats() for route in policy.ladder}
+        self.confidences: deque[float] = deque(maxlen=policy.history)
+        self.last_routing: dict[str, Any] = {}
+        self.last_source = "model"
+        self._previous_hash: int | None = None
+        self._previous_intent: str | None = None
+
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision:
+        screen_hash = perceptual_hash(image_bytes)
+        change_bits = 64 if self._previous_hash is None else hamming_distance(screen_hash, self._previous_hash)
+        self._previous_hash = screen_hash
+        previous_intent = context.get("previous_intent") or self._previous_intent
+        recent = statistics.fmean(self.confidences) if self.confidences else None
+        rung, reason = self.policy.start(previous_intent, change_bits, recent)
+
+        attempts: list[dict[str, Any]] = []
+        self.last_routing = {"reason": reason, "change_bits": change_bits, "attempts": attempts}
+        top = len(self.policy.ladder) - 1
+        while True:
+            route = self.policy.ladder[rung]
+            stats = self.routes[str(route)]
+            stats.calls += 1
+            started = time.perf_counter()
+            try:
+                decision = self.brain.analyze_step(image_bytes, context, mime_type=mime_type, route=route)
+            except ValueError as exc:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                stats.failures += 1
+                stats.latencies_ms.append(elapsed_ms)
+                attempts.append({"route": str(route), "ms": round(elapsed_ms, 2), "error": str(exc)})
+                if rung >= top:
+                    raise
+                stats.escalated += 1
+                rung += 1
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats.latencies_ms.append(elapsed_ms)
+            attempts.append(
+                {
+                    "route": str(route),
+                    "ms": round(elapsed_ms, 2),
+                    "confidence": decision.confidence,
+                    "input_tokens": self.brain.last_usage.input_tokens,
+                }
+            )
+            if rung < top and self.policy.should_escalate(decision):
+                stats.escalated += 1
+                rung += 1
+                continue
+            stats.accepted += 1
+            break
+
+        self.last_routing["route"] = str(route)
+        self.confidences.append(decision.confidence)
+        self._previous_intent = decision.intent
+        return decision
+
+    def report(self) -> dict[str, Any]:
+        return {name: stats.summary() for name, stats in self.routes.items()}
@@ -1,3 +1,279 @@
+"""Thin VM-side executor: captures the screen, tracks windows and injects keys for a host controller.
+
+The guest dials the host (VMs rarely accept inbound connections), so:
+
+    python remote_agent.py --connect 10.0.2.2:8740 --token ...
+
+The host-side remote_controller owns the model and the step loop; this
+process only answers CAPTURE requests with keyframes or dirty-rectangle
+deltas, executes batched ACTIONS in order, reports window snapshots and the
+installer's exit code, and reconnects with backoff when the link drops.
 """
-first develop local_agent.py, then remote_agent.py
-"""
\ No newline at end of file
+
+from __future__ import annotations
+
+import argparse
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable
+
+from remote_protocol import (
+    ACTION_FOCUS,
+    ACTIONS,
+    BYE,
+    CAPTURE,
+    HEARTBEAT,
+    HELLO,
+    LAUNCH,
+    STATUS,
+    TOKEN_ENV,
+    WINDOWS,
+    FrameEncoder,
+    Link,
+    LinkClosed,
+    LinkStats,
+    pack_heartbeat,
+    pack_json,
+    unpack_actions,
+    unpack_capture,
+    unpack_heartbeat,
+    unpack_json,
+    window_snapshot,
+)
+
+Launcher = Callable[[str, bool], tuple[Any, int]]
+
+
+def _default_launcher(file: str, run_as_admin: bool) -> tuple[Any, int]:
+    from pathlib import Path
+
+    from local_agent import launch_installer
+
+    return launch_installer(Path(file), run_as_admin)
+
+
+class RemoteAgent:
+    """Guest side of one controller session, surviving reconnects.
+
+    screen is a ScreenBackend (pyautogui when omitted), windows a
+    WindowBackend (the Win32 backend on Windows when omitted) and launcher
+    starts the installer named in a LAUNCH request, returning an object
+    with poll() and its pid. Messages are handled in arrival order on the
+    reader thread, so actions always run before a capture sent after them.
+    ACTIONS sequence numbers already executed are skipped when the host
+    resends after a reconnect.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        token: str = "",
+        screen: Any = None,
+        windows: Any = None,
+        launcher: Launcher = _default_launcher,
+        heartbeat: float = 1.0,
+        max_delta_fraction: float = 0.3,
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 10.0,
+    ) -> None:
+        host, _, port = address.rpartition(":")
+        self.address = (host, int(port))
+        self.token = token
+        if screen is None:
+            from local_agent import warm_capture_backend
+
+            screen = warm_capture_backend()
+        if windows is None and platform.system() == "Windows":
+            from local_agent import Win32WindowBackend
+
+            windows = Win32WindowBackend()
+        self.screen = screen
+        self.windows = windows
+        self.launcher = launcher
+        self.heartbeat = heartbeat
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.session = uuid.uuid4().hex
+        self.encoder = FrameEncoder(max_delta_fraction)
+        self.stats = LinkStats()
+        self.connections = 0
+        self.actions_seq = 0
+        self.process: Any = None
+        self._link: Link | None = None
+        self._snapshot: bytes | None = None
+        self._parents: dict[int, int] = {}
+        self._window_pids: frozenset[int] = frozenset()
+        self._windows_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Serve the host until it says BYE or stop() is called."""
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=self.heartbeat * 3)
+            except OSError:
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            delay = self.reconnect_delay
+            sock.settimeout(None)  # Liveness is the heartbeat's job; a timed-out makefile() reader is unusable.
+            link = Link(sock, self.stats)
+            self._link = link
+            self.connections += 1
+            try:
+                if self._serve(link):
+                    return
+            except LinkClosed:
+                pass
+            finally:
+                link.close()
+                self._link = None
+
+    def stop(self) -> None:
+        self._stop.set()
+        link = self._link
+        if link is not None:
+            link.close()
+
+    def drop_link(self) -> None:
+        """Close the current connection without ending the session (exercises reconnects)."""
+        link = self._link
+        if link is not None:
+            link.close()
+
+    def _serve(self, link: Link) -> bool:
+        hello = {"session": self.session, "actions_seq": self.actions_seq, "token": self.token}
+        link.send((HELLO, 0, pack_json(hello)))
+        kind, _, payload = link.recv()
+        if kind != HELLO:
+            raise LinkClosed("expected HELLO from the controller")
+        self.heartbeat = float(unpack_json(payload).get("heartbeat", self.heartbeat))
+        self.encoder.reset()
+        self._snapshot = None
+        beat = threading.Thread(target=self._heartbeat_loop, args=(link,), name="remote-agent-heartbeat", daemon=True)
+        beat.start()
+        while True:
+            kind, seq, payload = link.recv()
+            if kind == CAPTURE:
+                self._capture(link, seq, payload)
+            elif kind == ACTIONS:
+                if seq > self.actions_seq:
+                    self._run_actions(payload)
+                    self.actions_seq = seq
+            elif kind == HEARTBEAT:
+                echo, sent_at, _, _ = unpack_heartbeat(payload)
+                if not echo:
+                    link.send((HEARTBEAT, seq, pack_heartbeat(True, sent_at, self.actions_seq, self._returncode())))
+            elif kind == LAUNCH:
+                link.send((STATUS, seq, pack_json(self._launch(unpack_json(payload)))))
+            elif kind == BYE:
+                return True
+
+    def _heartbeat_loop(self, link: Link) -> None:
+        while not self._stop.wait(self.heartbeat / 2) and link is self._link:
+            now = time.monotonic()
+            if now - link.last_received > self.heartbeat * 3:
+                link.close()  # Host went silent; run() reconnects.
+                return
+            try:
+                self._send_windows(link, refresh_parents=True)
+                if now - link.last_sent >= self.heartbeat:
+                    link.send((HEARTBEAT, 0, pack_heartbeat(False, time.time(), self.actions_seq, self._returncode())))
+            except LinkClosed:
+                return
+
+    def _capture(self, link: Link, seq: int, payload: bytes) -> None:
+        region, keyframe = unpack_capture(payload)
+        started = time.perf_counter()
+        image = self.screen.screenshot(region=region) if region is not None else self.screen.screenshot()
+        if keyframe:
+            self.encoder.reset()
+        kind, frame = self.encoder.encode(
+            image, self.actions_seq, (time.perf_counter() - started) * 1000, self._returncode()
+        )
+        self._send_windows(link, refresh_parents=False)
+        link.send((kind, seq, frame))
+
+    def _run_actions(self, payload: bytes) -> None:
+        for action in unpack_actions(payload):
+            if action.delay_ms:
+                time.sleep(action.delay_ms / 1000)
+            if action.kind == ACTION_FOCUS:
+                self._focus(action.hwnd)
+            elif len(action.keys) == 1:
+                self.screen.press(action.keys[0])
+            elif action.keys:
+                self.screen.hotkey(*action.keys)
+
+    def _focus(self, hwnd: int) -> None:
+        focus = getattr(self.windows, "focus", None)
+        if focus is not None:
+            focus(hwnd)
+        elif hasattr(self.windows, "foreground"):
+            self.windows.foreground = hwnd
+
+    def _launch(self, request: dict[str, Any]) -> dict[str, Any]:
+        try:
+            self.process, pid = self.launcher(str(request["file"]), bool(request.get("run_as_admin")))
+        except Exception as exc:
+            return {"error": str(exc)}
+        return {"pid": pid}
+
+    def _returncode(self) -> int | None:
+        return self.process.poll() if self.process is not None else None
+
+    def _send_windows(self, link: Link, refresh_parents: bool) -> None:
+        if self.windows is None:
+            return
+        with self._windows_lock:
+            pids = frozenset(self.windows.window_pid(hwnd) for hwnd in self.windows.enum_windows())
+            if refresh_parents or pids != self._window_pids:
+                self._parents = self.windows.parent_pids()
+                self._window_pids = pids
+            snapshot = pack_json(window_snapshot(self.windows, self._parents))
+            if snapshot != self._snapshot:
+                link.send((WINDOWS, 0, snapshot))
+                self._snapshot = snapshot
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="VM-side executor for a host remote_controller")
+    parser.add_argument("--connect", required=True, help="Controller host:port to dial")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV, ""),
+        help=f"Shared secret the controller expects in HELLO (default ${TOKEN_ENV})",
+    )
+    parser.add_argument("--heartbeat", type=float, default=1.0, help="Heartbeat interval in seconds")
+    parser.add_argument(
+        "--frame-delta-max",
+        type=float,
+        default=0.3,
+        help="Send a capture as changed tiles when they cover at most this fraction of it (0 sends keyframes only)",
+    )
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    args = parse_args()
+    agent = RemoteAgent(args.connect, args.token, heartbeat=args.heartbeat, max_delta_fraction=args.frame_delta_max)
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+    print(
+        f"session {agent.session}: {agent.connections} connections, {agent.stats.bytes_sent} bytes sent, "
+        f"{agent.stats.bytes_received} bytes received",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,672 @@
+"""Host-side controller for a VM running remote_agent: owns the brain and the step loop, streams frames back.
+
+Listen, start the guest with `remote_agent.py --connect <host>:<port>` and
+the same --token, then run the install; agent flags after -- are parsed as
+local_agent's:
+
+    python remote_controller.py --listen 0.0.0.0:8740 --token ... --file 'C:\\setup.exe' -- --gemini-api-key ...
+
+RemoteController is a ScreenBackend and RemoteWindows a WindowBackend, so
+StepPipeline runs unchanged against the guest through set_screen_backend()
+and set_window_backend().
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from agent_daemon import parse_address
+from event_journal import EventJournal
+from frame_store import FrameStats, FrameStore
+from image_pipeline import resolve_config
+from local_agent import BrainChain, StepPipeline, parse_args, set_screen_backend, set_window_backend
+from remote_protocol import (
+    ACTION_FOCUS,
+    ACTION_KEYS,
+    ACTIONS,
+    BYE,
+    CAPTURE,
+    DELTA,
+    HEARTBEAT,
+    HELLO,
+    KEYFRAME,
+    LAUNCH,
+    STATUS,
+    TOKEN_ENV,
+    WINDOWS,
+    Action,
+    FrameDecoder,
+    Link,
+    LinkClosed,
+    LinkStats,
+    is_loopback,
+    pack_actions,
+    pack_capture,
+    pack_heartbeat,
+    pack_json,
+    unpack_capture,
+    unpack_heartbeat,
+    unpack_json,
+)
+from window_tracker import (
+    EVENT_CREATE,
+    EVENT_DESTROY,
+    EVENT_HIDE,
+    EVENT_NAME,
+    EVENT_SHOW,
+    WindowEventCallback,
+)
+
+DEFAULT_LISTEN = "127.0.0.1:8740"
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+@dataclass(slots=True)
+class ControllerStats:
+    connections: int = 0
+    reconnects: int = 0
+    rejected: int = 0
+    keyframes: int = 0
+    deltas: int = 0
+    frame_bytes: int = 0
+    action_batches: int = 0
+    actions: int = 0
+    resent_batches: int = 0
+    resent_captures: int = 0
+    capture_ms: list[float] = field(default_factory=list)
+    guest_capture_ms: list[float] = field(default_factory=list)
+    heartbeat_ms: list[float] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class _Request:
+    kind: int
+    payload: bytes
+    sent_at: float = 0.0
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: BaseException | None = None
+
+
+class RemoteWindows:
+    """WindowBackend answered from the guest's latest WINDOWS snapshot.
+
+    Snapshots are diffed into create/destroy/show/hide/name events, so a
+    WindowTracker on the host stays event-driven. focus() is queued as an
+    action and runs on the guest in order with key presses.
+    """
+
+    def __init__(self, controller: RemoteController) -> None:
+        self._controller = controller
+        self._windows: dict[int, tuple[int, bool, str, tuple[int, int, int, int] | None]] = {}
+        self._foreground = 0
+        self._parents: dict[int, int] = {}
+        self._callback: WindowEventCallback | None = None
+        self._lock = threading.Lock()
+
+    def update(self, snapshot: dict[str, Any]) -> None:
+        windows = {
+            int(hwnd): (int(pid), bool(visible), str(title), tuple(rect) if rect is not None else None)
+            for hwnd, pid, visible, title, rect in snapshot.get("windows", [])
+        }
+        with self._lock:
+            previous = self._windows
+            self._windows = windows
+            self._foreground = int(snapshot.get("foreground") or 0)
+            self._parents = {int(pid): int(parent) for pid, parent in snapshot.get("parents", [])}
+        callback = self._callback
+        if callback is None:
+            return
+        for hwnd in previous.keys() - windows.keys():
+            callback(EVENT_DESTROY, hwnd)
+        for hwnd, (_, visible, title, _) in windows.items():
+            old = previous.get(hwnd)
+            if old is None:
+                callback(EVENT_CREATE, hwnd)
+                if visible:
+                    callback(EVENT_SHOW, hwnd)
+                continue
+            if old[1] != visible:
+                callback(EVENT_SHOW if visible else EVENT_HIDE, hwnd)
+            if old[2] != title:
+                callback(EVENT_NAME, hwnd)
+
+    def enum_windows(self) -> list[int]:
+        with self._lock:
+            return list(self._windows)
+
+    def is_window(self, hwnd: int) -> bool:
+        with self._lock:
+            return hwnd in self._windows
+
+    def is_visible(self, hwnd: int) -> bool:
+        with self._lock:
+            window = self._windows.get(hwnd)
+        return window is not None and window[1]
+
+    def window_pid(self, hwnd: int) -> int:
+        with self._lock:
+            window = self._windows.get(hwnd)
+        return window[0] if window is not None else 0
+
+    def window_title(self, hwnd: int) -> str:
+        with self._lock:
+            window = self._windows.get(hwnd)
+        return window[2] if window is not None else ""
+
+    def window_rect(self, hwnd: int) -> tuple[int, int, int, int] | None:
+        with self._lock:
+            window = self._windows.get(hwnd)
+        return window[3] if window is not None else None
+
+    def foreground_window(self) -> int:
+        with self._lock:
+            return self._foreground
+
+    def parent_pids(self) -> dict[int, int]:
+        with self._lock:
+            return dict(self._parents)
+
+    def focus(self, hwnd: int) -> None:
+        self._controller.queue_action(Action(ACTION_FOCUS, hwnd=hwnd))
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        self._callback = callback
+        return True
+
+    def unsubscribe(self) -> None:
+        self._callback = None
+
+
+class RemoteProcess:
+    """The guest-side installer as far as StepPipeline cares: a pid and poll()."""
+
+    def __init__(self, controller: RemoteController, pid: int | None) -> None:
+        self.controller = controller
+        self.pid = pid
+
+    def poll(self) -> int | None:
+        return self.controller.returncode
+
+
+class RemoteController:
+    """Listens for one remote_agent and drives it as a ScreenBackend.
+
+    press() and hotkey() queue actions, keeping the host-side gap between
+    them as a delay the guest replays; a batch is flushed batch_window after
+    its first action or together with the next capture, in the same write,
+    so a step costs one round trip. Every ACTIONS batch and CAPTURE carries a
+    sequence number: the guest acks the last batch it ran in each frame and
+    heartbeat, and when it reconnects (same session) unacked batches and
+    outstanding captures are resent, with captures forced to keyframes.
+    Either side closes a link that has been silent for three heartbeats.
+
+    A connection only becomes the guest's link once its HELLO carries token;
+    until then the current link is left alone, so a port scan or a stray
+    connect cannot interrupt an install. Listening anywhere but loopback
+    without a token is refused.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_LISTEN,
+        token: str = "",
+        heartbeat: float = 1.0,
+        reconnect_timeout: float = 30.0,
+        batch_window: float = 0.02,
+    ) -> None:
+        self.heartbeat = heartbeat
+        self.reconnect_timeout = reconnect_timeout
+        self.batch_window = batch_window
+        listen = parse_address(address)
+        if not token and not is_loopback(listen[0]):
+            raise ValueError(f"remote controller on {listen[0]} needs a shared secret (--token or ${TOKEN_ENV})")
+        self.token = token.encode("utf-8")
+        self.windows = RemoteWindows(self)
+        self.stats = ControllerStats()
+        self.link_stats = LinkStats()
+        self.session: str | None = None
+        self.returncode: int | None = None
+        self._server = socket.create_server(listen)
+        self._link: Link | None = None
+        self._connected = threading.Event()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._acked = 0
+        self._requests: dict[int, _Request] = {}
+        self._unacked: dict[int, bytes] = {}
+        self._pending: list[Action] = []
+        self._pending_since = 0.0
+        self._last_action_at = 0.0
+        self._flush_wakeup = threading.Condition(self._lock)
+        for target, name in (
+            (self._accept_loop, "remote-accept"),
+            (self._flush_loop, "remote-flush"),
+            (self._heartbeat_loop, "remote-heartbeat"),
+        ):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        host, port = self._server.getsockname()[:2]
+        return str(host), int(port)
+
+    def wait_for_guest(self, timeout: float | None = None) -> bool:
+        return self._connected.wait(timeout)
+
+    # ScreenBackend
+
+    def screenshot(self, region: tuple[int, int, int, int] | None = None) -> Image.Image:
+        return self._request(CAPTURE, pack_capture(region, keyframe=False))
+
+    def press(self, key: str) -> None:
+        self.queue_action(Action(ACTION_KEYS, keys=(key,)))
+
+    def hotkey(self, *keys: str) -> None:
+        self.queue_action(Action(ACTION_KEYS, keys=tuple(keys)))
+
+    def queue_action(self, action: Action) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._pending:
+                action.delay_ms = int((now - self._last_action_at) * 1000)
+            else:
+                self._pending_since = now
+            self._last_action_at = now
+            self._pending.append(action)
+            self._flush_wakeup.notify()
+
+    def launch(self, file: str, run_as_admin: bool = False) -> RemoteProcess:
+        """Start the installer on the guest; file is a guest path."""
+        status = self._request(LAUNCH, pack_json({"file": file, "run_as_admin": run_as_admin}))
+        if status.get("error"):
+            raise RuntimeError(f"Guest could not launch {file}: {status['error']}")
+        self.returncode = None
+        return RemoteProcess(self, status.get("pid"))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            link = self._link
+            self._flush_locked()
+            self._flush_wakeup.notify()
+        if link is not None:
+            try:
+                link.send((BYE, 0, b""))
+            except LinkClosed:
+                pass
+            link.close()
+        self._server.close()
+
+    def report(self, steps: int) -> dict[str, Any]:
+        stats = self.stats
+        total = self.link_stats.bytes_sent + self.link_stats.bytes_received
+        captures = stats.keyframes + stats.deltas
+        return {
+            "steps": steps,
+            "captures": captures,
+            "keyframes": stats.keyframes,
+            "deltas": stats.deltas,
+            "bytes_sent": self.link_stats.bytes_sent,
+            "bytes_received": self.link_stats.bytes_received,
+            "bytes_per_step": round(total / steps) if steps else 0,
+            "bytes_per_capture": round(stats.frame_bytes / captures) if captures else 0,
+            "capture_rtt_ms_p50": round(_percentile(stats.capture_ms, 0.5), 2),
+            "capture_rtt_ms_p95": round(_percentile(stats.capture_ms, 0.95), 2),
+            "guest_capture_ms_p50": round(_percentile(stats.guest_capture_ms, 0.5), 2),
+            "heartbeat_rtt_ms_p50": round(_percentile(stats.heartbeat_ms, 0.5), 2),
+            "action_batches": stats.action_batches,
+            "actions": stats.actions,
+            "reconnects": stats.reconnects,
+            "resent_batches": stats.resent_batches,
+            "resent_captures": stats.resent_captures,
+            "by_type": {"sent": self.link_stats.sent_by_type, "received": self.link_stats.received_by_type},
+        }
+
+    def _request(self, kind: int, payload: bytes) -> Any:
+        request = _Request(kind, payload)
+        with self._lock:
+            if self._closed:
+                raise LinkClosed("controller is closed")
+            self._seq += 1
+            seq = self._seq
+            self._requests[seq] = request
+            messages = self._flush_locked(send=False)
+            request.sent_at = time.perf_counter()
+            self._send_locked(*messages, (kind, seq, payload))
+        deadline = time.monotonic() + self.reconnect_timeout
+        while not request.done.wait(0.1):
+            if self._connected.is_set():
+                deadline = time.monotonic() + self.reconnect_timeout
+            elif time.monotonic() > deadline:
+                with self._lock:
+                    self._requests.pop(seq, None)
+                raise LinkClosed(f"guest did not reconnect within {self.reconnect_timeout:.0f}s")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _flush_locked(self, send: bool = True) -> list[tuple[int, int, bytes]]:
+        if not self._pending:
+            return []
+        self._seq += 1
+        payload = pack_actions(self._pending)
+        self.stats.action_batches += 1
+        self.stats.actions += len(self._pending)
+        self._pending = []
+        self._unacked[self._seq] = payload
+        message = (ACTIONS, self._seq, payload)
+        if send:
+            self._send_locked(message)
+        return [message]
+
+    def _send_locked(self, *messages: tuple[int, int, bytes]) -> None:
+        if self._link is None or not messages:
+            return  # Resent from _unacked/_requests once the guest reconnects.
+        try:
+            self._link.send(*messages)
+        except LinkClosed:
+            pass
+
+    def _flush_loop(self) -> None:
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._flush_wakeup.wait()
+                    continue
+                remaining = self._pending_since + self.batch_window - time.monotonic()
+                if remaining > 0:
+                    self._flush_wakeup.wait(remaining)
+                    continue
+                self._flush_locked()
+
+    def _heartbeat_loop(self) -> None:
+        # Sent even on a busy link: the echo is the round-trip sample, and it costs HEADER + 17 bytes.
+        while not self._closed:
+            time.sleep(self.heartbeat)
+            link = self._link
+            if link is None:
+                continue
+            if time.monotonic() - link.last_received > self.heartbeat * 3:
+                link.close()  # Guest went silent; it will dial back in.
+                continue
+            try:
+                link.send((HEARTBEAT, 0, pack_heartbeat(False, time.time())))
+            except LinkClosed:
+                pass
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            sock.settimeout(self.heartbeat * 3)  # Until HELLO; a silent connection is dropped.
+            threading.Thread(target=self._serve, args=(Link(sock, self.link_stats),), daemon=True).start()
+
+    def _serve(self, link: Link) -> None:
+        decoder = FrameDecoder()
+        try:
+            kind, _, payload = link.recv()
+            if kind != HELLO:
+                raise LinkClosed("expected HELLO from the guest")
+            hello = unpack_json(payload)
+            if not hmac.compare_digest(str(hello.get("token", "")).encode("utf-8"), self.token):
+                with self._lock:
+                    self.stats.rejected += 1
+                return
+            link.sock.settimeout(None)
+            link.send((HELLO, 0, pack_json({"heartbeat": self.heartbeat})))
+            with self._lock:
+                if self._closed:
+                    link.send((BYE, 0, b""))
+                    return
+                previous = self._link
+                resumed = hello.get("session") == self.session
+                self.session = str(hello.get("session"))
+                self.stats.connections += 1
+                if resumed:
+                    self.stats.reconnects += 1
+                self._ack_locked(int(hello.get("actions_seq", 0)) if resumed else self._seq)
+                self._link = link
+                self._connected.set()
+                self._resend_locked(link)
+            if previous is not None:
+                previous.close()  # A reconnecting guest replaces a half-open link.
+            while True:
+                kind, seq, payload = link.recv()
+                if kind in (KEYFRAME, DELTA):
+                    self._on_frame(decoder, kind, seq, payload)
+                elif kind == WINDOWS:
+                    self.windows.update(unpack_json(payload))
+                elif kind == HEARTBEAT:
+                    self._on_heartbeat(link, seq, payload)
+                elif kind == STATUS:
+                    self._resolve(seq, unpack_json(payload))
+        except (LinkClosed, ValueError):
+            pass  # A frame that does not decode against ours is dropped with its link; the resend is a keyframe.
+        finally:
+            link.close()
+            with self._lock:
+                if self._link is link:
+                    self._link = None
+                    self._connected.clear()
+                    for seq, request in list(self._requests.items()):
+                        if request.kind == LAUNCH:
+                            # A launch may or may not have happened; never start the installer twice.
+                            request.error = LinkClosed("link dropped before the guest answered LAUNCH")
+                            request.done.set()
+                            del self._requests[seq]
+
+    def _resend_locked(self, link: Link) -> None:
+        messages = [(ACTIONS, seq, payload) for seq, payload in sorted(self._unacked.items())]
+        self.stats.resent_batches += len(messages)
+        for seq, request in sorted(self._requests.items()):
+            if request.kind == CAPTURE:
+                region, _ = unpack_capture(request.payload)
+                messages.append((CAPTURE, seq, pack_capture(region, keyframe=True)))
+                self.stats.resent_captures += 1
+        if messages:
+            link.send(*messages)
+
+    def _ack_locked(self, actions_seq: int) -> None:
+        self._acked = max(self._acked, actions_seq)
+        for seq in [seq for seq in self._unacked if seq <= self._acked]:
+            del self._unacked[seq]
+
+    def _on_frame(self, decoder: FrameDecoder, kind: int, seq: int, payload: bytes) -> None:
+        frame = decoder.decode(kind, payload)
+        with self._lock:
+            self._ack_locked(frame.actions_seq)
+            self.returncode = frame.returncode
+            if kind == KEYFRAME:
+                self.stats.keyframes += 1
+            else:
+                self.stats.deltas += 1
+            self.stats.frame_bytes += len(payload)
+            self.stats.guest_capture_ms.append(frame.capture_ms)
+            request = self._requests.get(seq)
+            if request is not None:
+                self.stats.capture_ms.append((time.perf_counter() - request.sent_at) * 1000)
+        self._resolve(seq, frame.image)
+
+    def _on_heartbeat(self, link: Link, seq: int, payload: bytes) -> None:
+        echo, sent_at, actions_seq, returncode = unpack_heartbeat(payload)
+        with self._lock:
+            self._ack_locked(actions_seq)
+            self.returncode = returncode
+            if echo:
+                self.stats.heartbeat_ms.append((time.time() - sent_at) * 1000)
+        if not echo:
+            link.send((HEARTBEAT, seq, pack_heartbeat(True, sent_at)))
+
+    def _resolve(self, seq: int, result: Any) -> None:
+        with self._lock:
+            request = self._requests.pop(seq, None)
+        if request is not None:
+            request.result = result
+            request.done.set()
+
+
+@dataclass(slots=True)
+class RemoteRun:
+    status: str
+    reason: str
+    steps: int
+    brain_calls: int
+    wall_s: float
+    link: dict[str, Any] = field(default_factory=dict)
+    frame_store: FrameStats | None = None
+
+
+def run_remote_install(
+    controller: RemoteController,
+    brain: Any,
+    installer: str,
+    artifacts_dir: Path,
+    agent_args: list[str] | None = None,
+) -> RemoteRun:
+    """Launch installer (a guest path) and run StepPipeline against the guest through the controller.
+
+    Mirrors installer_sim.run_simulated_install: agent_args are parsed by
+    local_agent.parse_args and the screen and window backends are restored
+    afterwards. brain is a ready brain or a local_agent.BrainChain, whose
+    layers are reported in the journal as a local run does. The controller
+    is left open for the next install.
+    """
+    chain = brain if isinstance(brain, BrainChain) else None
+    if chain is not None:
+        brain = chain.brain
+    args = parse_args(["--file", installer, "--artifacts-dir", str(artifacts_dir), *(agent_args or [])])
+    preprocess_config = resolve_config(
+        args.image_preset,
+        max_side=args.image_max_side,
+        color=args.image_color,
+        image_format=args.image_format,
+        quality=args.image_quality,
+    )
+    set_window_backend(controller.windows)  # type: ignore[arg-type]
+    set_screen_backend(controller)
+    frames = FrameStore(artifacts_dir / "frames", max_delta_fraction=args.frame_delta_max)
+    journal = EventJournal(
+        artifacts_dir / "events.jsonl",
+        flush=args.events_flush,
+        flush_interval=args.events_flush_interval,
+        fsync=args.events_fsync,
+        max_bytes=args.events_max_bytes,
+    )
+    pipeline: StepPipeline | None = None
+    started = time.perf_counter()
+    try:
+        process = controller.launch(installer, args.run_as_admin)
+        pipeline = StepPipeline(
+            args=args,
+            brain=brain,
+            journal=journal,
+            screenshots_dir=artifacts_dir / "screenshots",
+            frames=frames,
+            preprocess_config=preprocess_config,
+            installer_pid=process.pid,
+            process=process,  # type: ignore[arg-type]
+            router=chain.router if chain is not None else None,
+            gemini=chain.clients.gemini if chain is not None else None,
+        )
+        asyncio.run(pipeline.run())
+    finally:
+        frame_stats = frames.close()
+        journal.write({"kind": "frame_store", **frame_stats.report()})
+        link = controller.report(pipeline.step_count if pipeline is not None else 0)
+        journal.write({"kind": "remote_link", **{key: value for key, value in link.items() if key != "by_type"}})
+        if chain is not None:
+            chain.write_reports(journal, args.session)
+        journal.close()
+        set_screen_backend(None)
+        set_window_backend(None)
+    return RemoteRun(
+        status=pipeline.final_status,
+        reason=pipeline.final_reason,
+        steps=pipeline.step_count,
+        brain_calls=pipeline.brain_calls,
+        wall_s=time.perf_counter() - started,
+        link=link,
+        frame_store=frame_stats,
+    )
+
+
+def parse_cli(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Drive an installer inside a VM through remote_agent")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help="host:port the guest dials")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV, ""),
+        help=f"Shared secret the guest's HELLO must carry; required off loopback (default ${TOKEN_ENV})",
+    )
+    parser.add_argument("--file", required=True, help="Installer path on the guest")
+    parser.add_argument("--artifacts-dir", default="artifacts-remote")
+    parser.add_argument("--heartbeat", type=float, default=1.0, help="Heartbeat interval in seconds")
+    parser.add_argument("--guest-timeout", type=float, default=120.0, help="Seconds to wait for the guest to dial in")
+    parser.add_argument("agent_args", nargs=argparse.REMAINDER, help="local_agent flags after --")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from local_agent import build_brain_chain, build_model_clients
+
+    cli = parse_cli(sys.argv[1:] if argv is None else argv)
+    agent_args = [a for a in cli.agent_args if a != "--"]
+    args = parse_args(["--file", cli.file, *agent_args])
+    if args.replay_store:
+        # Replay scripts are keyed by the installer's sha256, and the installer lives on the guest.
+        print("remote controller: --replay-store is not supported for guest installs", file=sys.stderr)
+        return 2
+    clients = build_model_clients(args)
+    try:
+        controller = RemoteController(cli.listen, cli.token, heartbeat=cli.heartbeat)
+    except ValueError as exc:
+        clients.close()
+        print(f"remote controller: {exc}", file=sys.stderr)
+        return 2
+    host, port = controller.address
+    print(f"remote controller listening on {host}:{port}", file=sys.stderr)
+    try:
+        if not controller.wait_for_guest(cli.guest_timeout):
+            print("remote controller: no guest connected", file=sys.stderr)
+            return 2
+        artifacts_dir = Path(cli.artifacts_dir).resolve()
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
+        clients.begin_job()
+        chain = build_brain_chain(args, clients)
+        run = run_remote_install(controller, chain, cli.file, artifacts_dir, agent_args)
+    finally:
+        controller.close()
+        clients.close()
+    report = asdict(run)
+    report["frame_store"] = run.frame_store.report() if run.frame_store is not None else None
+    print(json.dumps(report, ensure_ascii=True, indent=2))
+    return 0 if run.status == "success" else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
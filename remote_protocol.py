@@ -0,0 +1,351 @@
+"""Binary wire protocol between the host controller and the VM-side remote agent."""
+
+from __future__ import annotations
+
+import io
+import ipaddress
+import json
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from PIL import Image
+
+from frame_store import dirty_rects
+
+MAGIC = b"RA"
+VERSION = 1
+HEADER = struct.Struct(">2sBBII")  # magic, version, type, seq, payload length
+MAX_PAYLOAD = 64 << 20
+TOKEN_ENV = "REMOTE_AGENT_TOKEN"
+
+HELLO = 1  # JSON, both directions
+CAPTURE = 2  # host -> guest: flags, region
+KEYFRAME = 3  # guest -> host: frame meta + PNG
+DELTA = 4  # guest -> host: frame meta + base id + dirty-rectangle PNG patches
+ACTIONS = 5  # host -> guest: batched key and focus commands
+WINDOWS = 6  # guest -> host: JSON window snapshot, sent only when it changed
+HEARTBEAT = 7  # both directions; echoed for round-trip time
+LAUNCH = 8  # host -> guest: JSON {"file", "run_as_admin"}
+STATUS = 9  # guest -> host: JSON reply to LAUNCH
+BYE = 10  # host -> guest: end of session
+MESSAGE_NAMES = {
+    HELLO: "hello",
+    CAPTURE: "capture",
+    KEYFRAME: "keyframe",
+    DELTA: "delta",
+    ACTIONS: "actions",
+    WINDOWS: "windows",
+    HEARTBEAT: "heartbeat",
+    LAUNCH: "launch",
+    STATUS: "status",
+    BYE: "bye",
+}
+
+CAPTURE_REGION = 0x01
+CAPTURE_KEYFRAME = 0x02
+CAPTURE_FORMAT = struct.Struct(">B4i")
+# frame id, last executed ACTIONS seq, guest grab+encode ms, installer return code
+FRAME_META = struct.Struct(">IIfi")
+DELTA_HEAD = struct.Struct(">IH")  # base frame id, rect count
+DELTA_RECT = struct.Struct(">4HI")  # left, top, right, bottom, patch length
+HEARTBEAT_FORMAT = struct.Struct(">BdIi")  # echo flag, sender timestamp, last ACTIONS seq, return code
+NO_RETURNCODE = -(1 << 31)
+
+ACTION_KEYS = 0
+ACTION_FOCUS = 1
+ACTION_HEAD = struct.Struct(">BH")  # kind, delay before it in ms
+MAX_ACTION_DELAY_MS = 0xFFFF
+
+
+class LinkClosed(ConnectionError):
+    """The peer closed the connection or sent something that is not this protocol."""
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def pack_returncode(returncode: int | None) -> int:
+    return NO_RETURNCODE if returncode is None else returncode
+
+
+def unpack_returncode(value: int) -> int | None:
+    return None if value == NO_RETURNCODE else value
+
+
+@dataclass(slots=True)
+class LinkStats:
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    messages_sent: int = 0
+    messages_received: int = 0
+    sent_by_type: dict[str, int] = field(default_factory=dict)
+    received_by_type: dict[str, int] = field(default_factory=dict)
+
+
+class Link:
+    """One framed, bidirectional connection; send() is thread-safe, recv() has a single reader."""
+
+    def __init__(self, sock: socket.socket, stats: LinkStats | None = None) -> None:
+        self.sock = sock
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stats = stats if stats is not None else LinkStats()
+        self.last_received = time.monotonic()
+        self.last_sent = time.monotonic()
+        self._reader = sock.makefile("rb")
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def send(self, *messages: tuple[int, int, bytes]) -> None:
+        """Send (type, seq, payload) messages back to back in one write."""
+        data = b"".join(
+            HEADER.pack(MAGIC, VERSION, kind, seq, len(payload)) + payload for kind, seq, payload in messages
+        )
+        with self._lock:
+            if self._closed:
+                raise LinkClosed("link is closed")
+            try:
+                self.sock.sendall(data)
+            except OSError as exc:
+                raise LinkClosed(str(exc)) from exc
+            self.last_sent = time.monotonic()
+            self.stats.bytes_sent += len(data)
+            self.stats.messages_sent += len(messages)
+            for kind, _, payload in messages:
+                name = MESSAGE_NAMES.get(kind, str(kind))
+                self.stats.sent_by_type[name] = self.stats.sent_by_type.get(name, 0) + HEADER.size + len(payload)
+
+    def recv(self) -> tuple[int, int, bytes]:
+        try:
+            header = self._reader.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise LinkClosed("peer closed the connection")
+            magic, version, kind, seq, length = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION or length > MAX_PAYLOAD:
+                raise LinkClosed(f"bad frame header {header!r}")
+            payload = self._reader.read(length)
+            if len(payload) < length:
+                raise LinkClosed("peer closed the connection mid-message")
+        except OSError as exc:
+            raise LinkClosed(str(exc)) from exc
+        self.last_received = time.monotonic()
+        self.stats.bytes_received += HEADER.size + length
+        self.stats.messages_received += 1
+        name = MESSAGE_NAMES.get(kind, str(kind))
+        self.stats.received_by_type[name] = self.stats.received_by_type.get(name, 0) + HEADER.size + length
+        return kind, seq, payload
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for closer in (lambda: self.sock.shutdown(socket.SHUT_RDWR), self._reader.close, self.sock.close):
+            try:
+                closer()
+            except OSError:
+                pass
+
+
+def pack_json(payload: dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=True, separators=(",", ":")).encode("ascii")
+
+
+def unpack_json(payload: bytes) -> dict[str, Any]:
+    value = json.loads(payload)
+    if not isinstance(value, dict):
+        raise LinkClosed("expected a JSON object")
+    return value
+
+
+def pack_capture(region: tuple[int, int, int, int] | None, keyframe: bool) -> bytes:
+    flags = (CAPTURE_REGION if region is not None else 0) | (CAPTURE_KEYFRAME if keyframe else 0)
+    return CAPTURE_FORMAT.pack(flags, *(region or (0, 0, 0, 0)))
+
+
+def unpack_capture(payload: bytes) -> tuple[tuple[int, int, int, int] | None, bool]:
+    flags, left, top, width, height = CAPTURE_FORMAT.unpack(payload)
+    region = (left, top, width, height) if flags & CAPTURE_REGION else None
+    return region, bool(flags & CAPTURE_KEYFRAME)
+
+
+def pack_heartbeat(echo: bool, timestamp: float, actions_seq: int = 0, returncode: int | None = None) -> bytes:
+    return HEARTBEAT_FORMAT.pack(int(echo), timestamp, actions_seq, pack_returncode(returncode))
+
+
+def unpack_heartbeat(payload: bytes) -> tuple[bool, float, int, int | None]:
+    echo, timestamp, actions_seq, returncode = HEARTBEAT_FORMAT.unpack(payload)
+    return bool(echo), timestamp, actions_seq, unpack_returncode(returncode)
+
+
+@dataclass(slots=True)
+class Action:
+    kind: int
+    keys: tuple[str, ...] = ()
+    hwnd: int = 0
+    delay_ms: int = 0
+
+
+def pack_actions(actions: list[Action]) -> bytes:
+    parts = [struct.pack(">H", len(actions))]
+    for action in actions:
+        parts.append(ACTION_HEAD.pack(action.kind, min(action.delay_ms, MAX_ACTION_DELAY_MS)))
+        if action.kind == ACTION_FOCUS:
+            parts.append(struct.pack(">Q", action.hwnd))
+            continue
+        parts.append(struct.pack(">B", len(action.keys)))
+        for key in action.keys:
+            encoded = key.encode("ascii")
+            parts.append(struct.pack(">B", len(encoded)) + encoded)
+    return b"".join(parts)
+
+
+def unpack_actions(payload: bytes) -> list[Action]:
+    (count,) = struct.unpack_from(">H", payload)
+    offset = 2
+    actions: list[Action] = []
+    for _ in range(count):
+        kind, delay_ms = ACTION_HEAD.unpack_from(payload, offset)
+        offset += ACTION_HEAD.size
+        if kind == ACTION_FOCUS:
+            (hwnd,) = struct.unpack_from(">Q", payload, offset)
+            offset += 8
+            actions.append(Action(kind, hwnd=hwnd, delay_ms=delay_ms))
+            continue
+        keys = []
+        count_keys = payload[offset]
+        offset += 1
+        for _ in range(count_keys):
+            length = payload[offset]
+            keys.append(payload[offset + 1 : offset + 1 + length].decode("ascii"))
+            offset += 1 + length
+        actions.append(Action(kind, keys=tuple(keys), delay_ms=delay_ms))
+    return actions
+
+
+class FrameEncoder:
+    """Guest side: turns captures into KEYFRAME or DELTA payloads against the previous frame sent.
+
+    A capture becomes a delta when its changed 32px tiles cover at most
+    max_delta_fraction of the frame; an unchanged capture is a delta with
+    no rectangles.
+    reset() forces the next capture to be a keyframe (used after reconnects).
+    """
+
+    def __init__(self, max_delta_fraction: float = 0.3, compress_level: int = 1) -> None:
+        self.max_delta_fraction = max_delta_fraction
+        self.compress_level = compress_level
+        self._previous: Image.Image | None = None
+        self._frame_id = 0
+
+    def reset(self) -> None:
+        self._previous = None
+
+    def encode(
+        self,
+        image: Image.Image,
+        actions_seq: int,
+        capture_ms: float,
+        returncode: int | None,
+    ) -> tuple[int, bytes]:
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        previous = self._previous
+        self._frame_id += 1
+        meta = FRAME_META.pack(self._frame_id, actions_seq, capture_ms, pack_returncode(returncode))
+        self._previous = image
+        if (
+            previous is not None
+            and self.max_delta_fraction > 0
+            and previous.size == image.size
+            and previous.mode == image.mode
+        ):
+            rects = dirty_rects(previous, image)
+            area = sum((right - left) * (bottom - top) for left, top, right, bottom in rects)
+            if area <= self.max_delta_fraction * image.width * image.height:
+                patches = [self._png(image.crop(box)) for box in rects]
+                body = DELTA_HEAD.pack(self._frame_id - 1, len(rects)) + b"".join(
+                    DELTA_RECT.pack(*box, len(patch)) for box, patch in zip(rects, patches)
+                )
+                return DELTA, meta + body + b"".join(patches)
+        return KEYFRAME, meta + self._png(image)
+
+    def _png(self, image: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=self.compress_level)
+        return buffer.getvalue()
+
+
+@dataclass(slots=True)
+class DecodedFrame:
+    image: Image.Image
+    frame_id: int
+    actions_seq: int
+    capture_ms: float
+    returncode: int | None
+    keyframe: bool
+
+
+class FrameDecoder:
+    """Host side: rebuilds images from KEYFRAME and DELTA payloads."""
+
+    def __init__(self) -> None:
+        self._previous: Image.Image | None = None
+        self._frame_id = 0
+
+    def reset(self) -> None:
+        self._previous = None
+
+    def decode(self, kind: int, payload: bytes) -> DecodedFrame:
+        frame_id, actions_seq, capture_ms, returncode = FRAME_META.unpack_from(payload)
+        offset = FRAME_META.size
+        if kind == KEYFRAME:
+            with Image.open(io.BytesIO(payload[offset:])) as decoded:
+                image = decoded.copy()
+        else:
+            base_id, count = DELTA_HEAD.unpack_from(payload, offset)
+            if self._previous is None or base_id != self._frame_id:
+                raise ValueError(f"delta against frame {base_id} but frame {self._frame_id} is the last one decoded")
+            offset += DELTA_HEAD.size
+            rects = [DELTA_RECT.unpack_from(payload, offset + index * DELTA_RECT.size) for index in range(count)]
+            offset += count * DELTA_RECT.size
+            image = self._previous.copy()
+            for left, top, _, _, length in rects:
+                with Image.open(io.BytesIO(payload[offset : offset + length])) as patch:
+                    image.paste(patch, (left, top))
+                offset += length
+        self._previous = image
+        self._frame_id = frame_id
+        return DecodedFrame(image, frame_id, actions_seq, capture_ms, unpack_returncode(returncode), kind == KEYFRAME)
+
+
+def window_snapshot(backend: Any, parents: dict[int, int]) -> dict[str, Any]:
+    """Everything the host's WindowTracker asks a WindowBackend, captured in one pass on the guest."""
+    windows = []
+    for hwnd in backend.enum_windows():
+        if not backend.is_window(hwnd):
+            continue
+        rect = backend.window_rect(hwnd)
+        windows.append(
+            [
+                hwnd,
+                backend.window_pid(hwnd),
+                backend.is_visible(hwnd),
+                backend.window_title(hwnd),
+                list(rect) if rect is not None else None,
+            ]
+        )
+    return {
+        "windows": windows,
+        "foreground": backend.foreground_window(),
+        "parents": [[pid, parent] for pid, parent in parents.items()],
+    }
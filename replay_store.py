@@ -0,0 +1,189 @@
+"""Record-and-replay of successful installer runs keyed by installer content hash."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from brain_agent import BrainDecision
+from decision_cache import Brain, decision_from_dict, hamming_distance, perceptual_hash
+from event_journal import read_events
+from frame_store import frame_exists, read_frame
+
+REPLAY_FORMAT_VERSION = 1
+FINGERPRINT_HASH_SIZE = 16
+
+
+@dataclass(slots=True)
+class ReplayStep:
+    fingerprint: str
+    window_title: str
+    decision: dict[str, Any]
+
+
+@dataclass(slots=True)
+class ReplayScript:
+    installer_sha256: str
+    revision: int
+    created_at: float
+    steps: list[ReplayStep] = field(default_factory=list)
+    version: int = REPLAY_FORMAT_VERSION
+
+
+def screen_fingerprint(image_bytes: bytes) -> str:
+    return f"{perceptual_hash(image_bytes, FINGERPRINT_HASH_SIZE):064x}"
+
+
+def compile_script(events_file: Path, installer_sha256: str, revision: int) -> ReplayScript:
+    """Turn the decision events of a successful run into an ordered replay script."""
+    steps: list[ReplayStep] = []
+    for event in read_events(events_file):
+        observation = event.get("observation")
+        decision = event.get("decision")
+        if not isinstance(observation, dict) or not isinstance(decision, dict):
+            continue
+        screenshot = observation["screenshot_path"]
+        if not frame_exists(screenshot):
+            raise FileNotFoundError(f"Screenshot missing for replay compile: {screenshot}")
+        steps.append(
+            ReplayStep(
+                fingerprint=screen_fingerprint(read_frame(screenshot)),
+                window_title=str(observation.get("window_title", "")),
+                decision={
+                    "ocr_text": observation.get("ocr_text", ""),
+                    "language": "unknown",
+                    "intent": decision["intent"],
+                    "done": decision["done"],
+                    "needs_human": decision["needs_human"],
+                    "confidence": decision["confidence"],
+                    "reason": decision["reason"],
+                    "actions": decision["actions"],
+                },
+            )
+        )
+    return ReplayScript(installer_sha256=installer_sha256, revision=revision, created_at=time.time(), steps=steps)
+
+
+class ReplayStore:
+    """Directory of versioned replay scripts with count and age based eviction."""
+
+    def __init__(self, root: str | Path, max_scripts: int = 500, max_age_seconds: float = 90 * 24 * 3600) -> None:
+        self.root = Path(root).expanduser().resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_scripts = max_scripts
+        self.max_age_seconds = max_age_seconds
+
+    def _path(self, installer_sha256: str) -> Path:
+        return self.root / f"{installer_sha256}.json"
+
+    def load(self, installer_sha256: str) -> ReplayScript | None:
+        path = self._path(installer_sha256)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if payload.get("version") != REPLAY_FORMAT_VERSION:
+            path.unlink(missing_ok=True)
+            return None
+        if time.time() - path.stat().st_mtime > self.max_age_seconds:
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)
+        steps = [ReplayStep(**step) for step in payload.pop("steps")]
+        return ReplayScript(steps=steps, **payload)
+
+    def save(self, script: ReplayScript) -> Path:
+        path = self._path(script.installer_sha256)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(script), ensure_ascii=True), encoding="utf-8")
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def record(self, events_file: Path, installer_sha256: str, previous: ReplayScript | None) -> ReplayScript:
+        revision = previous.revision + 1 if previous is not None else 1
+        script = compile_script(events_file, installer_sha256, revision)
+        self.save(script)
+        return script
+
+    def evict(self) -> int:
+        scripts = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for index, path in enumerate(scripts):
+            if index >= self.max_scripts or path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class ReplayBrain:
+    """Replays recorded decisions while screens match, then defers to the wrapped brain.
+
+    No-action steps (e.g. progress screens) may be matched repeatedly or skipped,
+    so installs that run faster or slower than the recording do not diverge on
+    timing alone.
+    """
+
+    def __init__(self, brain: Brain, script: ReplayScript | None, max_distance: int = 10) -> None:
+        self.brain = brain
+        self.script = script
+        self.max_distance = max_distance
+        self.cursor = 0
+        self.diverged = script is None or not script.steps
+        self.replayed_steps = 0
+        self.inferred_steps = 0
+        self.last_source = "model"
+
+    def analyze_step(
+        self,
+        image_bytes: bytes,
+        context: dict[str, Any],
+        mime_type: str = "image/png",
+    ) -> BrainDecision:
+        if not self.diverged:
+            replayed = self._replay(image_bytes, str(context.get("window_title", "")))
+            if replayed is not None:
+                self.replayed_steps += 1
+                self.last_source = "replay"
+                return replayed
+            self.diverged = True
+
+        self.inferred_steps += 1
+        decision = self.brain.analyze_step(image_bytes=image_bytes, context=context, mime_type=mime_type)
+        self.last_source = getattr(self.brain, "last_source", "model")
+        return decision
+
+    @property
+    def fully_replayed(self) -> bool:
+        return not self.diverged and self.inferred_steps == 0
+
+    def _replay(self, image_bytes: bytes, window_title: str) -> BrainDecision | None:
+        if self.script is None:
+            return None
+        fingerprint = int(screen_fingerprint(image_bytes), 16)
+        steps = self.script.steps
+        candidates: list[int] = []
+        if self.cursor > 0 and not steps[self.cursor - 1].decision["actions"]:
+            candidates.append(self.cursor - 1)
+        for index in range(self.cursor, len(steps)):
+            candidates.append(index)
+            if steps[index].decision["actions"]:
+                break
+
+        best: tuple[int, int] | None = None
+        for index in candidates:
+            step = steps[index]
+            if step.window_title != window_title:
+                continue
+            distance = hamming_distance(fingerprint, int(step.fingerprint, 16))
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, index)
+        if best is None:
+            return None
+        self.cursor = max(self.cursor, best[1] + 1)
+        return decision_from_dict(steps[best[1]].decision)
@@ -0,0 +1,295 @@
+"""Deadline-aware retries and hedged requests around model calls."""
+
+from __future__ import annotations
+
+import bisect
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+import httpx
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from model_client import ModelClient, ModelReply, TextCallback
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Log-spaced bucket upper bounds in ms: 5 ms .. ~5 min, 25% apart.
+BUCKET_BOUNDS_MS = tuple(5.0 * 1.25**index for index in range(50))
+POOL_WORKERS = 4
+
+
+class DeadlineExceeded(TimeoutError):
+    """The model call did not produce an answer within its deadline."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS
+    return isinstance(exc, (ConnectionError, TimeoutError, httpx.TransportError))
+
+
+@dataclass(slots=True)
+class LatencyHistogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKET_BOUNDS_MS) + 1))
+    total: int = 0
+
+    def record(self, latency_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, latency_ms)] += 1
+        self.total += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile, or None when empty."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS_MS[min(index, len(BUCKET_BOUNDS_MS) - 1)]
+        return BUCKET_BOUNDS_MS[-1]
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.total,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+        }
+
+
+@dataclass(slots=True, frozen=True)
+class RequestPolicy:
+    deadline: float = 120.0
+    attempt_timeout: float = 60.0
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+
+
+@dataclass(slots=True)
+class ExecutorStats:
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    timeouts: int = 0
+    failures: int = 0
+    pool_resets: int = 0
+
+
+class ResilientClient:
+    """ModelClient wrapper adding deadlines, jittered backoff and optional hedging.
+
+    Hedging sends a second identical request once the primary has been in flight
+    longer than the model's observed hedge_quantile latency (after
+    hedge_min_samples calls) and returns whichever succeeds first. The losing
+    request is abandoned, not cancelled, so hedging trades extra calls for tail
+    latency. Streams are never hedged and are only retried while no text has
+    been delivered.
+
+    An abandoned attempt keeps its worker until the wrapped client gives up
+    (GenaiClient's HTTP timeout). If every worker is still busy when a new
+    attempt is submitted, the pool is swapped for a fresh one and the old
+    threads are left to finish, so hung requests cannot starve later calls.
+    """
+
+    def __init__(self, client: ModelClient, policy: RequestPolicy, seed: int | None = None) -> None:
+        self.client = client
+        self.policy = policy
+        self.stats = ExecutorStats()
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.last_call: dict[str, Any] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="model")
+        self._pool_generation = 0
+        self._busy = 0
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def generate(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        return self._execute(
+            lambda deadline, call: self._attempt(model, contents, config, system_instruction, deadline, call)
+        )
+
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        delivered = threading.Event()
+
+        def attempt(deadline: float, call: dict[str, Any]) -> ModelReply:
+            call["streamed"] = True
+            active = threading.Event()
+            active.set()
+
+            def forward(text: str) -> None:
+                # An abandoned (timed out) stream must not deliver late text.
+                if active.is_set():
+                    delivered.set()
+                    on_text(text)
+
+            def request() -> ModelReply:
+                return self.client.stream(model, contents, config, forward, system_instruction=system_instruction)
+
+            future = self._submit(model, request)
+            timeout_at = min(deadline, time.monotonic() + self.policy.attempt_timeout)
+            try:
+                return future.result(timeout=max(0.0, timeout_at - time.monotonic()))
+            except FutureTimeout:
+                with self._lock:
+                    self.stats.timeouts += 1
+                raise DeadlineExceeded(f"{model} stream did not finish within {self.policy.attempt_timeout:.1f}s")
+            finally:
+                active.clear()
+
+        return self._execute(attempt, can_retry=lambda: not delivered.is_set())
+
+    def _execute(
+        self,
+        attempt_once: Callable[[float, dict[str, Any]], ModelReply],
+        can_retry: Callable[[], bool] = lambda: True,
+    ) -> ModelReply:
+        policy = self.policy
+        started = time.monotonic()
+        deadline = started + policy.deadline
+        call: dict[str, Any] = {"attempts": 0, "hedged": False, "hedge_won": False, "errors": []}
+        self.last_call = call
+        with self._lock:
+            self.stats.calls += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            call["attempts"] = attempt
+            try:
+                reply = attempt_once(deadline, call)
+            except Exception as exc:
+                call["errors"].append(f"{type(exc).__name__}: {exc}")
+                remaining = deadline - time.monotonic()
+                retry = is_retryable(exc) and can_retry()
+                if not retry or attempt >= policy.max_attempts or remaining <= 0:
+                    with self._lock:
+                        self.stats.failures += 1
+                    raise
+                delay = min(policy.backoff_max, policy.backoff_base * 2 ** (attempt - 1))
+                delay = min(self._random.uniform(0, delay), remaining)
+                with self._lock:
+                    self.stats.retries += 1
+                time.sleep(delay)
+                continue
+            call["ms"] = round((time.monotonic() - started) * 1000, 2)
+            return reply
+
+    def _attempt(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        system_instruction: str | None,
+        deadline: float,
+        call: dict[str, Any],
+    ) -> ModelReply:
+        timeout_at = min(deadline, time.monotonic() + self.policy.attempt_timeout)
+
+        def request() -> ModelReply:
+            return self.client.generate(model, contents, config, system_instruction=system_instruction)
+
+        pending = {self._submit(model, request)}
+        primary = next(iter(pending))
+        hedge_after = self._hedge_delay(model)
+        if hedge_after is not None:
+            done, _ = wait(pending, timeout=max(0.0, min(hedge_after, timeout_at - time.monotonic())))
+            if not done and time.monotonic() < timeout_at:
+                pending.add(self._submit(model, request))
+                call["hedged"] = True
+                with self._lock:
+                    self.stats.hedges += 1
+
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                exc = future.exception()
+                if exc is not None:
+                    error = exc
+                    continue
+                if future is not primary:
+                    call["hedge_won"] = True
+                    with self._lock:
+                        self.stats.hedge_wins += 1
+                return future.result()
+        if error is not None and not pending:
+            raise error
+        with self._lock:
+            self.stats.timeouts += 1
+        raise DeadlineExceeded(f"{model} did not answer within {self.policy.attempt_timeout:.1f}s")
+
+    def _submit(self, model: str, request: Callable[[], ModelReply]) -> Future[ModelReply]:
+        with self._lock:
+            self.stats.attempts += 1
+            if self._busy >= POOL_WORKERS:
+                self._pool.shutdown(wait=False)
+                self._pool = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="model")
+                self._pool_generation += 1
+                self._busy = 0
+                self.stats.pool_resets += 1
+            self._busy += 1
+            generation = self._pool_generation
+            pool = self._pool
+
+        def run() -> ModelReply:
+            started = time.perf_counter()
+            try:
+                reply = request()
+            finally:
+                with self._lock:
+                    if generation == self._pool_generation:
+                        self._busy -= 1
+            self._record(model, (time.perf_counter() - started) * 1000)
+            return reply
+
+        return pool.submit(run)
+
+    def _record(self, model: str, latency_ms: float) -> None:
+        with self._lock:
+            self.histograms.setdefault(model, LatencyHistogram()).record(latency_ms)
+
+    def _hedge_delay(self, model: str) -> float | None:
+        if not self.policy.hedge:
+            return None
+        with self._lock:
+            histogram = self.histograms.get(model)
+            if histogram is None or histogram.total < self.policy.hedge_min_samples:
+                return None
+            quantile = histogram.quantile(self.policy.hedge_quantile)
+        return quantile / 1000 if quantile is not None else None
+
+    def report(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "models": {model: histogram.summary() for model, histogram in self.histograms.items()},
+            }
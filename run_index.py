@@ -0,0 +1,404 @@
+"""Incremental SQLite index of .agent_runs history with a query CLI."""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from event_journal import segment_paths
+
+RUN_PREFIX = "run-"
+COMMIT_EVERY = 200
+QUANTILES = (0.5, 0.9, 0.99)
+# Only these names are ever interpolated into SQL.
+METRICS = ("model_ms", "inference_ms", "capture_ms", "encode_ms", "actions_ms", "wait_ms", "ttfa_ms")
+LATENCY_GROUPS = ("intent", "source", "framework", "status")
+FAILURE_GROUPS = {"installer": "installer_sha256", "framework": "framework", "status": "status"}
+STEP_COLUMNS = (
+    "run_id",
+    "step",
+    "framework",
+    "status",
+    "intent",
+    "confidence",
+    "source",
+    "done",
+    "needs_human",
+    "upload_bytes",
+    "input_tokens",
+    *METRICS,
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    started_at REAL,
+    status TEXT NOT NULL,
+    reason TEXT,
+    error_code TEXT,
+    steps INTEGER NOT NULL,
+    framework TEXT,
+    install_mode TEXT,
+    installer_sha256 TEXT,
+    model_calls INTEGER,
+    wall_s REAL,
+    malformed_lines INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_installer ON runs(installer_sha256, status);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    framework TEXT,
+    status TEXT,
+    intent TEXT,
+    confidence REAL,
+    source TEXT,
+    done INTEGER,
+    needs_human INTEGER,
+    upload_bytes INTEGER,
+    input_tokens INTEGER,
+    {", ".join(f"{metric} REAL" for metric in METRICS)},
+    PRIMARY KEY (run_id, step)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS steps_intent ON steps(intent, confidence);
+"""
+
+
+@dataclass(slots=True)
+class IngestStats:
+    scanned: int = 0
+    ingested: int = 0
+    unchanged: int = 0
+    steps: int = 0
+    malformed_lines: int = 0
+    seconds: float = 0.0
+
+
+def _run_started(name: str) -> float | None:
+    try:
+        return time.mktime(time.strptime(name[len(RUN_PREFIX) :], "%Y%m%d-%H%M%S"))
+    except ValueError:
+        return None
+
+
+def _journal_lines(events_file: Path) -> Iterator[str]:
+    """Lines of a run's journal, including rotated and compressed segments."""
+    for segment in segment_paths(events_file):
+        opener = gzip.open if segment.suffix == ".gz" else open
+        with opener(segment, "rt", encoding="utf-8", errors="replace") as handle:
+            yield from handle
+    with events_file.open("r", encoding="utf-8", errors="replace") as handle:
+        yield from handle
+
+
+class RunIndex:
+    """SQLite store of one row per run and per step, built by streaming events.jsonl files.
+
+    Runs are keyed on their events.jsonl path; a file is re-read only when its
+    size or mtime changed since it was indexed, so repeated ingests over a
+    growing history touch only new (or still-running) runs. Each file is
+    streamed line by line and at most one run's steps are held in memory.
+    Run-level framework and status are copied onto steps so latency queries
+    never join; the (group, metric) index a latency query needs is created on
+    first use, after which percentiles are index seeks rather than sorts.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path).expanduser().resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def ingest(self, root: str | Path) -> IngestStats:
+        started = time.perf_counter()
+        stats = IngestStats()
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self._conn.execute("SELECT path, size, mtime_ns FROM runs")
+        }
+        root_dir = Path(root).expanduser().resolve()
+        with self._conn, os.scandir(root_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith(RUN_PREFIX) or not entry.is_dir():
+                    continue
+                events_file = root_dir / entry.name / "events.jsonl"
+                try:
+                    stat = events_file.stat()
+                except FileNotFoundError:
+                    continue
+                stats.scanned += 1
+                key = str(events_file)
+                if known.get(key) == (stat.st_size, stat.st_mtime_ns):
+                    stats.unchanged += 1
+                    continue
+                steps, malformed = self._ingest_run(key, events_file, stat, _run_started(entry.name))
+                stats.ingested += 1
+                stats.steps += steps
+                stats.malformed_lines += malformed
+                if stats.ingested % COMMIT_EVERY == 0:
+                    self._conn.commit()
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def _ingest_run(
+        self,
+        key: str,
+        events_file: Path,
+        stat: os.stat_result,
+        started_at: float | None,
+    ) -> tuple[int, int]:
+        run: dict[str, Any] = {"status": None, "reason": None, "steps": 0, "model_calls": None, "wall_s": None}
+        steps: dict[int, dict[str, Any]] = {}
+        last_done = False
+        brain_error: str | None = None
+        malformed = 0
+        for line in _journal_lines(events_file):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # A crashed run can leave a torn last line.
+                malformed += 1
+                continue
+            if not isinstance(event, dict):
+                malformed += 1
+                continue
+            kind = event.get("kind")
+            if "decision" in event or kind == "timings":
+                try:
+                    step = int(event["step"])
+                except (KeyError, TypeError, ValueError):
+                    malformed += 1
+                    continue
+            if "decision" in event:
+                decision = event["decision"]
+                if not isinstance(decision, dict):
+                    malformed += 1
+                    continue
+                row = steps.setdefault(step, {})
+                upload = event.get("upload") or {}
+                usage = event.get("usage") or {}
+                row.update(
+                    intent=decision.get("intent"),
+                    confidence=decision.get("confidence"),
+                    source=event.get("source", "model"),
+                    done=int(bool(decision.get("done"))),
+                    needs_human=int(bool(decision.get("needs_human"))),
+                    upload_bytes=upload.get("bytes"),
+                    input_tokens=usage.get("input_tokens"),
+                    model_ms=upload.get("model_ms"),
+                    encode_ms=upload.get("encode_ms"),
+                )
+                last_done = bool(decision.get("done"))
+            elif kind == "timings":
+                row = steps.setdefault(step, {})
+                for metric in ("capture_ms", "inference_ms", "actions_ms", "wait_ms", "ttfa_ms"):
+                    row[metric] = event.get(metric)
+            elif kind == "brain_error":
+                brain_error = event.get("error")
+            elif kind == "fingerprint":
+                run["framework"] = event.get("framework")
+            elif kind == "replay":
+                run["installer_sha256"] = event.get("installer_sha256")
+            elif kind == "model_usage":
+                run["model_calls"] = event.get("calls")
+            elif kind == "pipeline":
+                run["wall_s"] = event.get("wall_s")
+            elif kind == "result":
+                for name in ("status", "reason", "error_code", "steps", "framework", "install_mode"):
+                    run[name] = event.get(name)
+                run["installer_sha256"] = event.get("installer_sha256") or run.get("installer_sha256")
+
+        if run["status"] is None:
+            # Runs from before result events (or killed mid-run) are classified from their steps.
+            if last_done:
+                run["status"], run["reason"] = "success", "Installer flow indicates completion"
+            elif brain_error is not None:
+                run["status"], run["reason"] = "failed", f"Gemini decision failed: {brain_error}"
+            else:
+                run["status"] = "unknown"
+            run["steps"] = max(steps, default=0)
+
+        existing = self._conn.execute("SELECT id FROM runs WHERE path = ?", (key,)).fetchone()
+        if existing is not None:
+            self._conn.execute("DELETE FROM steps WHERE run_id = ?", existing)
+            self._conn.execute("DELETE FROM runs WHERE id = ?", existing)
+        cursor = self._conn.execute(
+            "INSERT INTO runs (path, size, mtime_ns, started_at, status, reason, error_code, steps, framework,"
+            " install_mode, installer_sha256, model_calls, wall_s, malformed_lines)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                stat.st_size,
+                stat.st_mtime_ns,
+                started_at if started_at is not None else stat.st_mtime,
+                run["status"],
+                run["reason"],
+                run.get("error_code"),
+                run["steps"] or 0,
+                run.get("framework"),
+                run.get("install_mode"),
+                run.get("installer_sha256"),
+                run["model_calls"],
+                run["wall_s"],
+                malformed,
+            ),
+        )
+        run_id = cursor.lastrowid
+        rows = [
+            (run_id, step, run.get("framework"), run["status"], *(values.get(column) for column in STEP_COLUMNS[4:]))
+            for step, values in sorted(steps.items())
+        ]
+        placeholders = ", ".join("?" for _ in STEP_COLUMNS)
+        self._conn.executemany(f"INSERT INTO steps ({', '.join(STEP_COLUMNS)}) VALUES ({placeholders})", rows)
+        return len(rows), malformed
+
+    def latency(self, metric: str = "model_ms", by: str = "intent") -> list[dict[str, Any]]:
+        """Nearest-rank percentiles of a step metric per group."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}")
+        if by not in LATENCY_GROUPS:
+            raise ValueError(f"Unknown grouping {by!r}; expected one of {', '.join(LATENCY_GROUPS)}")
+        with self._conn:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS steps_{by}_{metric} ON steps({by}, {metric})")
+        groups = self._conn.execute(
+            f"SELECT {by}, COUNT({metric}), AVG({metric}) FROM steps"
+            f" WHERE {metric} IS NOT NULL GROUP BY {by} ORDER BY COUNT({metric}) DESC"
+        ).fetchall()
+        rows: list[dict[str, Any]] = []
+        for group, count, mean in groups:
+            row: dict[str, Any] = {by: group, "count": count, "mean": round(mean, 2)}
+            for quantile in QUANTILES:
+                (value,) = self._conn.execute(
+                    f"SELECT {metric} FROM steps WHERE {by} IS ? AND {metric} IS NOT NULL"
+                    f" ORDER BY {metric} LIMIT 1 OFFSET ?",
+                    (group, max(0, math.ceil(quantile * count) - 1)),
+                ).fetchone()
+                row[f"p{int(quantile * 100)}"] = round(value, 2)
+            rows.append(row)
+        return rows
+
+    def failures(self, by: str = "installer", limit: int = 20) -> list[dict[str, Any]]:
+        """Most frequent non-success reasons per group."""
+        try:
+            column = FAILURE_GROUPS[by]
+        except KeyError:
+            raise ValueError(f"Unknown grouping {by!r}; expected one of {', '.join(FAILURE_GROUPS)}") from None
+        sql = (
+            f"SELECT {column} AS {by}, status, reason, COUNT(*) AS runs, MAX(started_at) AS last_seen"
+            " FROM runs WHERE status != 'success'"
+            f" GROUP BY {column}, status, reason ORDER BY runs DESC LIMIT ?"
+        )
+        rows = self._rows(sql, (limit,))
+        for row in rows:
+            row["last_seen"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["last_seen"]))
+        return rows
+
+    def confidence(self, intent: str | None = None, bins: int = 10) -> list[dict[str, Any]]:
+        """Histogram of decision confidence, optionally for one intent."""
+        where = "WHERE confidence IS NOT NULL" + (" AND intent = ?" if intent else "")
+        sql = (
+            f"SELECT MIN(CAST(confidence * {bins} AS INTEGER), {bins - 1}) AS bin, COUNT(*) AS steps"
+            f" FROM steps {where} GROUP BY bin ORDER BY bin"
+        )
+        rows = self._rows(sql, (intent,) if intent else ())
+        return [
+            {"range": f"{row['bin'] / bins:.2f}-{(row['bin'] + 1) / bins:.2f}", "steps": row["steps"]} for row in rows
+        ]
+
+    def summary(self) -> list[dict[str, Any]]:
+        sql = (
+            "SELECT status, COUNT(*) AS runs, SUM(steps) AS steps, ROUND(AVG(wall_s), 1) AS wall_s_mean,"
+            " ROUND(AVG(model_calls), 1) AS model_calls_mean FROM runs GROUP BY status ORDER BY runs DESC"
+        )
+        return self._rows(sql)
+
+    def _rows(self, sql: str, params: tuple[Any, ...] = ()) -> list[dict[str, Any]]:
+        cursor = self._conn.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def format_table(rows: list[dict[str, Any]]) -> str:
+    if not rows:
+        return "(no rows)"
+    names = list(rows[0])
+    cells = [[("" if row[name] is None else str(row[name])) for name in names] for row in rows]
+    widths = [max(len(name), *(len(line[index]) for line in cells)) for index, name in enumerate(names)]
+    lines = ["  ".join(name.ljust(width) for name, width in zip(names, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Index and query installer agent run history")
+    parser.add_argument("--artifacts-dir", default=".agent_runs", help="Directory holding run-<stamp> folders")
+    parser.add_argument("--index", default=None, help="SQLite index path (default: <artifacts-dir>/runs-index.sqlite)")
+    parser.add_argument("--json", action="store_true", help="Print query results as JSON")
+    parser.add_argument("--no-ingest", action="store_true", help="Query the index without picking up new runs first")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("ingest", help="Index new and changed runs")
+    commands.add_parser("summary", help="Runs, steps and wall time per final status")
+    latency = commands.add_parser("latency", help="Step latency percentiles per group")
+    latency.add_argument("--metric", choices=METRICS, default="model_ms")
+    latency.add_argument("--by", choices=LATENCY_GROUPS, default="intent")
+    failures = commands.add_parser("failures", help="Failure reasons per group")
+    failures.add_argument("--by", choices=tuple(FAILURE_GROUPS), default="installer")
+    failures.add_argument("--limit", type=int, default=20)
+    confidence = commands.add_parser("confidence", help="Decision confidence histogram")
+    confidence.add_argument("--intent", default=None)
+    confidence.add_argument("--bins", type=int, default=10)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    index = RunIndex(args.index or Path(args.artifacts_dir) / "runs-index.sqlite")
+    try:
+        if args.command == "ingest" or not args.no_ingest:
+            stats = index.ingest(args.artifacts_dir)
+            print(
+                f"indexed {stats.ingested} of {stats.scanned} runs ({stats.steps} steps, "
+                f"{stats.malformed_lines} malformed lines) in {stats.seconds * 1000:.0f} ms",
+                file=sys.stderr,
+            )
+            if args.command == "ingest":
+                print(json.dumps(asdict(stats), indent=2))
+                return 0
+        started = time.perf_counter()
+        if args.command == "summary":
+            rows = index.summary()
+        elif args.command == "latency":
+            rows = index.latency(args.metric, args.by)
+        elif args.command == "failures":
+            rows = index.failures(args.by, args.limit)
+        else:
+            rows = index.confidence(args.intent, args.bins)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    finally:
+        index.close()
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows))
+    print(f"query took {elapsed_ms:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+"""Incremental parser for streamed decision JSON."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+StreamEvent = tuple[str, str | int, Any]
+
+
+class DecisionStreamParser:
+    """Reports top-level fields and "actions" elements of a JSON object as soon as each is complete.
+
+    feed() returns ("field", name, value) when a top-level value closes and
+    ("action", index, item) when an element of the top-level "actions" array
+    closes. Text before the opening brace (e.g. a Markdown fence) is ignored.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.fields: dict[str, Any] = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._key: str | None = None
+        self._expect = "key"
+        self._value_start = -1
+        self._element_start = -1
+        self._elements = 0
+
+    def feed(self, chunk: str) -> list[StreamEvent]:
+        self.text += chunk
+        text = self.text
+        events: list[StreamEvent] = []
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = self._load(text[self._string_start : index + 1])
+                        self._expect = "colon"
+                    elif self._depth == 1 and self._expect == "string":
+                        self._complete(text[self._value_start : index + 1], events)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+                if self._depth == 1 and self._expect == "value":
+                    self._value_start = index
+                    self._expect = "string"
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and self._expect == "value":
+                    self._value_start = index
+                    self._expect = "nested"
+                elif self._depth == 3 and char == "{" and self._key == "actions" and self._expect == "nested":
+                    self._element_start = index
+            elif char in "}]":
+                if self._depth == 1 and self._expect == "scalar":
+                    self._complete(text[self._value_start : index], events)
+                self._depth -= 1
+                if self._depth == 2 and self._element_start >= 0:
+                    item = self._load(text[self._element_start : index + 1])
+                    events.append(("action", self._elements, item))
+                    self._elements += 1
+                    self._element_start = -1
+                elif self._depth == 1 and self._expect == "nested":
+                    self._complete(text[self._value_start : index + 1], events)
+            elif self._depth == 1:
+                if char == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif char == ",":
+                    if self._expect == "scalar":
+                        self._complete(text[self._value_start : index], events)
+                    self._expect = "key"
+                elif self._expect == "value" and not char.isspace():
+                    self._value_start = index
+                    self._expect = "scalar"
+        self._pos = len(text)
+        return events
+
+    def _complete(self, raw: str, events: list[StreamEvent]) -> None:
+        self._expect = "comma"
+        if self._key is None:
+            return
+        value = self._load(raw.strip())
+        self.fields[self._key] = value
+        events.append(("field", self._key, value))
+
+    @staticmethod
+    def _load(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
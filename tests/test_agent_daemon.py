@@ -0,0 +1,88 @@
+"""AgentDaemon authentication and submit_job deadlines over loopback sockets."""
+
+from __future__ import annotations
+
+import argparse
+import socket
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from agent_daemon import AgentDaemon, control, main, submit_job
+from local_agent import ModelClients, RunResult
+
+TOKEN = "s3cret"
+
+
+class Runner:
+    def __init__(self) -> None:
+        self.files: list[str] = []
+
+    def __call__(self, args: argparse.Namespace, clients: ModelClients | None) -> tuple[int, RunResult]:
+        self.files.append(args.file)
+        return 0, RunResult(status="success", reason="ran", binary_paths=[], artifacts_dir="", steps=1)
+
+
+@pytest.fixture
+def runner() -> Runner:
+    return Runner()
+
+
+@pytest.fixture
+def address(runner: Runner, monkeypatch: pytest.MonkeyPatch) -> Iterator[str]:
+    # No model key here: job clients fail to build and the runner gets None, as on a cold daemon.
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    daemon = AgentDaemon([], TOKEN, address="127.0.0.1:0", runner=runner)
+    host, port = daemon.start()
+    yield f"{host}:{port}"
+    daemon.stop()
+
+
+def test_daemon_refuses_to_start_without_a_token() -> None:
+    with pytest.raises(ValueError, match="shared secret"):
+        AgentDaemon([], "", address="127.0.0.1:0")
+    assert main(["--address", "0.0.0.0:0", "--token", "", "serve"]) == 2
+
+
+@pytest.mark.parametrize("token", [None, "wrong", "s3creté"])
+def test_job_without_the_token_is_never_launched(address: str, runner: Runner, token: str | None) -> None:
+    with pytest.raises(RuntimeError, match="bad token"):
+        submit_job(address, ["--file", "setup.exe"], token=token, timeout=5.0)
+    assert control(address, "ping", token=TOKEN)["rejected"] == 1
+    assert runner.files == []
+
+
+def test_control_requests_need_the_token_too(address: str) -> None:
+    assert control(address, "shutdown", token="wrong") == {"kind": "error", "reason": "bad token"}
+    assert control(address, "ping", token=TOKEN)["kind"] == "pong"
+
+
+def test_job_with_the_token_runs(address: str, runner: Runner) -> None:
+    exit_code, result = submit_job(address, ["--file", "setup.exe"], token=TOKEN, timeout=10.0)
+    assert (exit_code, result.reason) == (0, "ran")
+    assert runner.files == ["setup.exe"]
+
+
+def test_submit_timeout_is_a_total_deadline() -> None:
+    # A daemon that keeps talking (a progress line every 100 ms) must not keep the client waiting forever.
+    server = socket.create_server(("127.0.0.1", 0))
+    stop = threading.Event()
+
+    def chatter() -> None:
+        conn, _ = server.accept()
+        with conn:
+            while not stop.wait(0.1):
+                conn.sendall(b'{"kind": "accepted", "job_id": "1", "queued": 1}\n')
+
+    threading.Thread(target=chatter, daemon=True).start()
+    host, port = server.getsockname()[:2]
+    started = time.monotonic()
+    try:
+        with pytest.raises(TimeoutError):
+            submit_job(f"{host}:{port}", ["--file", "setup.exe"], token=TOKEN, timeout=0.5)
+    finally:
+        stop.set()
+        server.close()
+    assert time.monotonic() - started < 2.0
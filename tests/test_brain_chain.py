@@ -0,0 +1,58 @@
+"""build_brain_chain layering, shared by local installs and remote_controller."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import remote_controller
+from brain_agent import GeminiBrain
+from decision_cache import CachedBrain, DecisionCache
+from install_plan import PlanningBrain
+from local_agent import ModelClients, build_brain_chain, parse_args
+from model_client import SimulatedClient, lognormal_latency
+from model_router import RoutedBrain
+from replay_store import ReplayBrain
+from request_executor import RequestPolicy, ResilientClient
+
+
+def make_clients(decision_cache: DecisionCache | None = None) -> ModelClients:
+    resilient = ResilientClient(SimulatedClient(["{}"], lognormal_latency(1.0)), RequestPolicy())
+    return ModelClients(GeminiBrain(client=resilient), resilient, decision_cache)
+
+
+def test_fixed_routing_without_layers_leaves_gemini_unwrapped() -> None:
+    clients = make_clients()
+    chain = build_brain_chain(parse_args(["--file", "setup.exe", "--routing", "fixed"]), clients)
+    assert chain.brain is clients.gemini
+    assert (chain.router, chain.tiered, chain.planner, chain.replay) == (None, None, None, None)
+    clients.close()
+
+
+def test_layers_wrap_in_order(tmp_path: Path) -> None:
+    clients = make_clients(DecisionCache(tmp_path / "cache.sqlite"))
+    args = parse_args(["--file", "setup.exe", "--plan", "--replay-store", str(tmp_path / "replay")])
+    chain = build_brain_chain(args, clients, installer_sha256="ab" * 32)
+    layers = []
+    brain = chain.brain
+    while brain is not clients.gemini:
+        layers.append(type(brain))
+        brain = brain.brain
+    assert layers == [ReplayBrain, PlanningBrain, CachedBrain, RoutedBrain]
+    assert chain.replay is chain.brain
+    assert chain.replay_script is None
+    clients.close()
+
+
+def test_replay_store_needs_the_installer_hash(tmp_path: Path) -> None:
+    clients = make_clients()
+    with pytest.raises(ValueError, match="sha256"):
+        build_brain_chain(parse_args(["--file", "setup.exe", "--replay-store", str(tmp_path)]), clients)
+    clients.close()
+
+
+def test_remote_controller_rejects_replay_store(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    argv = ["--file", "C:\\setup.exe", "--", "--replay-store", str(tmp_path)]
+    assert remote_controller.main(argv) == 2
+    assert "--replay-store" in capsys.readouterr().err
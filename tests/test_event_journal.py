@@ -0,0 +1,129 @@
+"""EventJournal flush policies, rotation and crash recovery (torn tails, segments left mid-rotation)."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from event_journal import EventJournal, read_events, recover_tail, segment_paths
+
+
+def wait_until(predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def lines(path: Path) -> list[str]:
+    return path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+
+
+def event(step: int) -> dict[str, object]:
+    return {"step": step, "kind": "step", "note": "x" * 40}
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> Path:
+    return tmp_path / "events.jsonl"
+
+
+def test_unknown_flush_policy(path: Path) -> None:
+    with pytest.raises(ValueError, match="flush policy"):
+        EventJournal(path, flush="never")
+
+
+def test_step_policy_flushes_at_step_boundaries(path: Path) -> None:
+    with EventJournal(path, flush="step") as journal:
+        journal.write(event(1))
+        journal.mark_step()
+        assert wait_until(lambda: len(lines(path)) == 1)
+    assert journal.stats.flushes >= 1
+
+
+def test_interval_policy_flushes_without_step_marks(path: Path) -> None:
+    with EventJournal(path, flush="interval", flush_interval=0.05) as journal:
+        journal.write(event(1))
+        assert wait_until(lambda: len(lines(path)) == 1)
+
+
+def test_exit_policy_holds_events_until_flush_or_close(path: Path) -> None:
+    journal = EventJournal(path, flush="exit")
+    journal.write(event(1))
+    journal.mark_step()
+    time.sleep(0.2)
+    assert lines(path) == []
+    assert journal.flush(timeout=5.0)
+    assert len(lines(path)) == 1
+    journal.write(event(2))
+    journal.close()
+    assert [json.loads(line)["step"] for line in lines(path)] == [1, 2]
+    assert journal.flush() is True
+
+
+def test_fsync_is_counted(path: Path) -> None:
+    with EventJournal(path, fsync=True) as journal:
+        journal.write(event(1))
+        assert journal.flush(timeout=5.0)
+    assert journal.stats.fsyncs >= 1
+
+
+def test_unserialisable_event_is_dropped_and_the_writer_survives(path: Path) -> None:
+    with EventJournal(path) as journal:
+        journal.write({"step": 1, "bad": object()})
+        journal.write(event(2))
+        assert journal.flush(timeout=5.0)
+    assert journal.stats.errors == 1
+    assert [e["step"] for e in read_events(path)] == [2]
+
+
+def test_rotation_compresses_segments_and_read_events_keeps_order(path: Path) -> None:
+    with EventJournal(path, max_bytes=300) as journal:
+        for step in range(20):
+            journal.write(event(step))
+            journal.mark_step()
+            assert journal.flush(timeout=5.0)
+    segments = segment_paths(path)
+    assert journal.stats.rotations == len(segments) > 1
+    assert all(segment.suffix == ".gz" for segment in segments)
+    assert [e["step"] for e in read_events(path)] == list(range(20))
+
+
+def test_torn_tail_is_truncated_on_open(path: Path) -> None:
+    path.write_text(json.dumps(event(1)) + "\n" + '{"step": 2, "kin', encoding="utf-8")
+    with EventJournal(path) as journal:
+        assert journal.stats.recovered_bytes == len('{"step": 2, "kin')
+        journal.write(event(3))
+    assert [e["step"] for e in read_events(path)] == [1, 3]
+
+
+def test_recover_tail_of_a_file_without_any_newline(path: Path) -> None:
+    path.write_bytes(b'{"step": 1')
+    assert recover_tail(path) == 10
+    assert path.read_bytes() == b""
+    assert recover_tail(path.with_name("absent.jsonl")) == 0
+
+
+def test_segment_left_uncompressed_by_a_crash_is_read_and_recovered(path: Path) -> None:
+    # Crash after the rename, mid-compression: a complete plain segment next to a truncated .gz.
+    first = path.with_name("events.000001.jsonl")
+    path.with_name("events.000001.jsonl.gz").write_bytes(gzip.compress(b'{"step": 1}\n')[:12])
+    first.write_text("".join(json.dumps(event(step)) + "\n" for step in (1, 2)), encoding="utf-8")
+    path.write_text(json.dumps(event(3)) + "\n", encoding="utf-8")
+
+    assert segment_paths(path) == [first]
+    assert [e["step"] for e in read_events(path)] == [1, 2, 3]
+
+    with EventJournal(path, max_bytes=1) as journal:
+        assert journal.stats.recovered_segments == 1
+        journal.write(event(4))
+    assert not first.exists()
+    assert [p.name for p in segment_paths(path)] == ["events.000001.jsonl.gz", "events.000002.jsonl.gz"]
+    assert [e["step"] for e in read_events(path)] == [1, 2, 3, 4]
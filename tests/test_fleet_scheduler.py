@@ -0,0 +1,124 @@
+"""FleetScheduler queueing, retries and aggregation with in-process workers, plus one real fake-agent job."""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from fleet_scheduler import (
+    FleetScheduler,
+    Job,
+    WorkerError,
+    WorkerTimeout,
+    build_worker,
+    load_jobs,
+    parse_run_result,
+)
+from local_agent import RunResult
+
+
+def success(job: Job) -> RunResult:
+    return RunResult(status="success", reason="ok", binary_paths=[], artifacts_dir="", steps=job.job_id + 1)
+
+
+class ScriptedWorker:
+    def __init__(self, name: str, outcome: Callable[[Job], RunResult] = success) -> None:
+        self.name = name
+        self.outcome = outcome
+        self.jobs: list[int] = []
+        self._lock = threading.Lock()
+
+    def run(self, job: Job, timeout: float) -> RunResult:
+        with self._lock:
+            self.jobs.append(job.job_id)
+        return self.outcome(job)
+
+
+def jobs(count: int) -> list[Job]:
+    return [Job(job_id=index, file=f"setup-{index}.exe") for index in range(count)]
+
+
+def test_every_job_runs_once_and_is_aggregated() -> None:
+    workers = [ScriptedWorker("a"), ScriptedWorker("b")]
+    report = FleetScheduler(workers).run(jobs(10))
+    assert [r.job_id for r in report.jobs] == list(range(10))
+    assert sorted(workers[0].jobs + workers[1].jobs) == list(range(10))
+    assert report.status_counts == {"success": 10}
+    assert [r.result.steps for r in report.jobs] == [index + 1 for index in range(10)]
+    assert all(r.attempts == 1 for r in report.jobs)
+    assert report.jobs_per_minute > 0
+    assert report.queue_latency_p50 <= report.queue_latency_p95
+
+
+def test_worker_errors_are_retried_up_to_max_attempts() -> None:
+    def crash(job: Job) -> RunResult:
+        raise WorkerError("worker exited with 3 without a RunResult")
+
+    report = FleetScheduler([ScriptedWorker("a", crash)], max_attempts=2, max_worker_failures=10).run(jobs(1))
+    (job,) = report.jobs
+    assert job.attempts == 2
+    assert job.result.error_code == "worker_failed"
+
+
+def test_a_flaky_job_succeeds_on_retry() -> None:
+    failed: set[int] = set()
+
+    def flaky(job: Job) -> RunResult:
+        if job.job_id not in failed:
+            failed.add(job.job_id)
+            raise WorkerError("connection reset")
+        return success(job)
+
+    report = FleetScheduler([ScriptedWorker("a", flaky)], max_worker_failures=10).run(jobs(3))
+    assert report.status_counts == {"success": 3}
+    assert [r.attempts for r in report.jobs] == [2, 2, 2]
+
+
+def test_timed_out_jobs_are_not_retried() -> None:
+    # The installer may still be running on the worker; a retry would start a second copy next to it.
+    def hang(job: Job) -> RunResult:
+        raise WorkerTimeout("job timed out after 1s")
+
+    worker = ScriptedWorker("a", hang)
+    report = FleetScheduler([worker], max_attempts=3, max_worker_failures=10).run(jobs(2))
+    assert worker.jobs == [0, 1]
+    assert [(r.attempts, r.result.error_code) for r in report.jobs] == [(1, "worker_timeout"), (1, "worker_timeout")]
+
+
+def test_unhealthy_workers_are_retired_and_the_rest_fail() -> None:
+    def crash(job: Job) -> RunResult:
+        raise WorkerError("boom")
+
+    report = FleetScheduler([ScriptedWorker("a", crash)], max_attempts=5, max_worker_failures=2).run(jobs(3))
+    assert report.status_counts == {"failed": 3}
+    assert "no healthy workers left" in {r.result.reason for r in report.jobs}
+
+
+def test_parse_run_result_finds_the_json_in_noisy_output() -> None:
+    payload = json.dumps({"status": "success", "reason": "ok", "binary_paths": [], "artifacts_dir": "", "steps": 4})
+    assert parse_run_result(f"warming up\n{payload}\n", 0).steps == 4
+    with pytest.raises(WorkerError, match="without a RunResult"):
+        parse_run_result("Traceback ...", 1)
+    with pytest.raises(WorkerError, match="malformed"):
+        parse_run_result('{"status": "success"}', 0)
+
+
+def test_load_jobs_reads_a_manifest(tmp_path: Path) -> None:
+    manifest = tmp_path / "jobs.txt"
+    manifest.write_text('# nightly\nC:\\a.exe\n\n{"file": "C:\\\\b.zip", "zip_password": "pw"}\n', encoding="utf-8")
+    assert [(j.job_id, j.file, j.zip_password) for j in load_jobs(str(manifest))] == [
+        (0, "C:\\a.exe", None),
+        (1, "C:\\b.zip", "pw"),
+    ]
+
+
+def test_fake_worker_runs_the_step_pipeline(tmp_path: Path) -> None:
+    worker = build_worker("fake:0.01", 0, ["--progress-seconds", "0.2", "--artifacts-dir", str(tmp_path)])
+    result = worker.run(Job(job_id=0, file="setup.exe"), timeout=120.0)
+    assert (result.status, result.error_code) == ("success", None)
+    assert result.steps >= 5
+    assert (Path(result.artifacts_dir) / "events.jsonl").is_file()
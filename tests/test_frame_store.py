@@ -0,0 +1,136 @@
+"""FrameStore dup/delta/key storage and FrameReader reconstruction, checked pixel-for-pixel."""
+
+from __future__ import annotations
+
+import io
+import random
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageDraw
+
+from frame_store import FrameReader, FrameStore, frame_exists, load_frame, read_frame
+
+SIZE = (256, 192)
+
+
+def noise(seed: int) -> Image.Image:
+    # Incompressible content, so a small dirty rectangle always encodes smaller than the whole frame.
+    rng = random.Random(seed)
+    return Image.frombytes("RGB", SIZE, rng.randbytes(SIZE[0] * SIZE[1] * 3))
+
+
+def patched(base: Image.Image, box: tuple[int, int, int, int], fill: tuple[int, int, int]) -> Image.Image:
+    image = base.copy()
+    ImageDraw.Draw(image).rectangle(box, fill=fill)
+    return image
+
+
+def png(image: Image.Image, compress_level: int = 6) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def same_pixels(left: Image.Image, right: Image.Image) -> bool:
+    return (left.size, left.mode, left.tobytes()) == (right.size, right.mode, right.tobytes())
+
+
+@pytest.fixture
+def frames() -> dict[str, Image.Image]:
+    first = noise(1)
+    second = noise(2)
+    return {
+        "step-001": first,
+        "step-002": patched(first, (10, 10, 40, 30), (255, 0, 0)),
+        "step-003": first,
+        "step-004": first,
+        "step-005": second,
+        "step-006": patched(second, (200, 150, 230, 170), (0, 0, 255)),
+        "step-007": patched(first, (10, 10, 40, 30), (255, 0, 0)),
+    }
+
+
+@pytest.fixture
+def store(tmp_path: Path, frames: dict[str, Image.Image]) -> tuple[Path, FrameStore]:
+    root = tmp_path / "frames"
+    store = FrameStore(root, max_delta_fraction=0.3)
+    for name, image in frames.items():
+        # step-004 re-encodes step-001 with other bytes, so only the pixel comparison can catch it.
+        store.submit(name, png(image, compress_level=1 if name == "step-004" else 6), "image/png")
+    store.close()
+    return root, store
+
+
+def test_frames_are_stored_as_dup_delta_and_key(store: tuple[Path, FrameStore]) -> None:
+    root, frame_store = store
+    entries = FrameReader(root).entries
+    assert {name: entry.kind for name, entry in entries.items()} == {
+        "step-001": "key",
+        "step-002": "delta",
+        "step-003": "dup",
+        "step-004": "dup",
+        "step-005": "key",
+        "step-006": "delta",
+        "step-007": "dup",
+    }
+    assert entries["step-002"].base == entries["step-001"].object
+    assert entries["step-006"].base == entries["step-005"].object
+    stats = frame_store.stats
+    assert (stats.frames, stats.keyframes, stats.deltas, stats.duplicates, stats.errors) == (7, 2, 2, 3, 0)
+    assert stats.stored_bytes < stats.raw_bytes
+
+
+def test_every_frame_round_trips_pixel_exact(store: tuple[Path, FrameStore], frames: dict[str, Image.Image]) -> None:
+    root, _ = store
+    reader = FrameReader(root)
+    assert reader.names() == sorted(frames)
+    for name, expected in frames.items():
+        assert same_pixels(reader.load(name), expected), name
+        data, _ = reader.read(name)
+        with Image.open(io.BytesIO(data)) as decoded:
+            assert same_pixels(decoded.convert("RGB"), expected), name
+
+
+def test_delta_chain_survives_its_keyframe_being_replaced(
+    store: tuple[Path, FrameStore],
+    frames: dict[str, Image.Image],
+) -> None:
+    # step-007 repeats the bytes of step-002 after step-005 evicted step-001 as the store's keyframe;
+    # it must still resolve through step-001's object rather than the current keyframe.
+    root, _ = store
+    entry = FrameReader(root).entries["step-007"]
+    assert entry.base == FrameReader(root).entries["step-001"].object
+    for ref in (root / "step-002", root / "step-007"):
+        assert frame_exists(ref)
+        assert same_pixels(load_frame(ref), frames["step-007"])
+        with Image.open(io.BytesIO(read_frame(ref))) as decoded:
+            assert same_pixels(decoded.convert("RGB"), frames["step-007"])
+
+
+def test_references_resolve_frames_appended_after_a_first_read(tmp_path: Path) -> None:
+    root = tmp_path / "frames"
+    first = noise(3)
+    store = FrameStore(root)
+    store.submit("step-001", png(first), "image/png")
+    store.close()
+    assert same_pixels(load_frame(root / "step-001"), first)
+
+    later = patched(first, (0, 0, 20, 20), (0, 255, 0))
+    store = FrameStore(root)
+    store.submit("step-002", png(later), "image/png")
+    store.close()
+    assert frame_exists(root / "step-002")
+    assert same_pixels(load_frame(root / "step-002"), later)
+    assert not frame_exists(root / "step-003")
+    with pytest.raises(FileNotFoundError):
+        read_frame(root / "step-003")
+
+
+def test_plain_files_are_read_directly(tmp_path: Path) -> None:
+    image = noise(4)
+    path = tmp_path / "step-001.png"
+    path.write_bytes(png(image))
+    assert frame_exists(path)
+    assert read_frame(path) == path.read_bytes()
+    assert same_pixels(load_frame(path), image)
@@ -0,0 +1,141 @@
+"""Framework fingerprinting and silent commands against synthetic PE files."""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+
+import pytest
+
+from installer_detect import (
+    OLE_SIGNATURE,
+    InstallerFingerprint,
+    fingerprint_installer,
+    fingerprint_view,
+    parse_pe_sections,
+    run_silent_install,
+    silent_command,
+)
+
+PE_OFFSET = 0x40
+FILE_ALIGNMENT = 0x200
+
+
+def build_pe(sections: list[tuple[str, bytes]], overlay: bytes = b"") -> bytes:
+    """A minimal PE image: DOS stub, COFF header without an optional header, a section table, raw data, overlay."""
+    header = bytearray(PE_OFFSET)
+    header[:2] = b"MZ"
+    struct.pack_into("<I", header, 0x3C, PE_OFFSET)
+    header += b"PE\0\0" + struct.pack("<HHIIIHH", 0x14C, len(sections), 0, 0, 0, 0, 0)
+    offset = FILE_ALIGNMENT
+    table = bytearray()
+    body = bytearray()
+    for name, data in sections:
+        size = -(-len(data) // FILE_ALIGNMENT) * FILE_ALIGNMENT
+        table += struct.pack("<8sIIII", name.encode("ascii"), len(data), offset, size, offset) + bytes(16)
+        body += data.ljust(size, b"\0")
+        offset += size
+    image = bytes(header + table).ljust(FILE_ALIGNMENT, b"\0") + bytes(body)
+    return image + overlay
+
+
+def test_parse_pe_sections_reads_the_section_table() -> None:
+    image = build_pe([(".text", b"\x90" * 10), (".rsrc", b"x" * 600)])
+    sections = parse_pe_sections(image)
+    assert sections is not None
+    assert [(s.name, s.raw_offset, s.raw_size) for s in sections] == [(".text", 0x200, 0x200), (".rsrc", 0x400, 0x400)]
+
+
+@pytest.mark.parametrize(
+    ("sections", "overlay", "framework", "evidence"),
+    [
+        ([(".text", b"code"), (".ndata", b"")], b"", "nsis", "section:.ndata"),
+        ([(".text", b"code"), (".wixburn", b"burn")], b"", "wix_burn", "section:.wixburn"),
+        ([(".text", b"code")], b"Inno Setup Setup Data (6.2.0)", "inno", "overlay:b'Inno Setup Setup Data'"),
+        ([(".text", b"Nullsoft.NSIS.exehead")], b"", "nsis", "body:b'Nullsoft.NSIS.exehead'"),
+        (
+            [(".text", b"code"), (".rsrc", "WiX Toolset".encode("utf-16-le"))],
+            b"",
+            "wix_burn",
+            "version_resource:WiX Toolset",
+        ),
+    ],
+)
+def test_fingerprint_view_detects_framework(
+    sections: list[tuple[str, bytes]],
+    overlay: bytes,
+    framework: str,
+    evidence: str,
+) -> None:
+    result = fingerprint_view(build_pe(sections, overlay))
+    assert result.framework == framework
+    assert evidence in result.evidence
+
+
+def test_fingerprint_view_records_the_overlay_offset() -> None:
+    result = fingerprint_view(build_pe([(".text", b"code")], b"Inno Setup Setup Data"))
+    assert result.overlay_offset == 0x400
+    assert result.sections == [".text"]
+
+
+def test_strongest_evidence_wins() -> None:
+    # A .ndata section (weight 3) and an NSIS overlay (3) outvote a stray Inno resource string (2).
+    image = build_pe(
+        [(".ndata", b""), (".rsrc", "Inno Setup".encode("utf-16-le"))],
+        b"\xef\xbe\xad\xdeNullsoftInst",
+    )
+    assert fingerprint_view(image).framework == "nsis"
+
+
+def test_installscript_and_basic_msi_installshield_are_told_apart() -> None:
+    installscript = fingerprint_view(build_pe([(".text", b"code")], b"InstallShield\0data1.hdr"))
+    assert installscript.framework == "installshield"
+    basic_msi = fingerprint_view(build_pe([(".text", b"code")], b"ISSetupStream\0" + OLE_SIGNATURE + bytes(64)))
+    assert basic_msi.framework == "installshield_msi"
+    assert "overlay:embedded_msi" in basic_msi.evidence
+
+
+def test_fingerprint_view_rejects_non_pe_input() -> None:
+    assert fingerprint_view(b"#!/bin/sh\necho hi\n" + bytes(64)).evidence == ["not_pe"]
+    assert fingerprint_view(build_pe([(".text", b"code")])).framework == "unknown"
+    assert fingerprint_view(OLE_SIGNATURE + bytes(512)).framework == "msi"
+
+
+def test_fingerprint_installer_maps_the_file(tmp_path: Path) -> None:
+    setup = tmp_path / "setup.exe"
+    setup.write_bytes(build_pe([(".text", b"code"), (".ndata", b"")]))
+    assert fingerprint_installer(setup).framework == "nsis"
+    empty = tmp_path / "empty.exe"
+    empty.write_bytes(b"")
+    assert fingerprint_installer(empty).framework == "unknown"
+    package = tmp_path / "product.msi"
+    package.write_bytes(b"")
+    assert fingerprint_installer(package).evidence == ["extension:.msi"]
+
+
+@pytest.mark.parametrize(
+    ("framework", "path", "expected"),
+    [
+        ("msi", "C:\\Setup Files\\app.msi", ("msiexec", '/i "C:\\Setup Files\\app.msi" /qn /norestart')),
+        ("nsis", "C:\\Setup Files\\setup.exe", ("C:\\Setup Files\\setup.exe", "/S")),
+        (
+            "inno",
+            "C:\\Setup Files\\setup.exe",
+            ("C:\\Setup Files\\setup.exe", "/VERYSILENT /SUPPRESSMSGBOXES /NORESTART /SP-"),
+        ),
+        ("installshield_msi", "C:\\Setup Files\\setup.exe", ("C:\\Setup Files\\setup.exe", '/s /v"/qn /norestart"')),
+        ("wix_burn", "C:\\Setup Files\\setup.exe", ("C:\\Setup Files\\setup.exe", "/quiet /norestart")),
+        ("installshield", "C:\\Setup Files\\setup.exe", None),
+        ("unknown", "C:\\Setup Files\\setup.exe", None),
+    ],
+)
+def test_silent_command(framework: str, path: str, expected: tuple[str, str] | None) -> None:
+    # The /v argument must reach setup.exe exactly as written; list2cmdline would turn it into "/v\"/qn ...\"".
+    assert silent_command(framework, Path(path)) == expected
+
+
+def test_run_silent_install_without_a_command_does_not_launch(tmp_path: Path) -> None:
+    result = run_silent_install(InstallerFingerprint("installshield"), tmp_path / "setup.exe", timeout=1.0)
+    assert not result.succeeded
+    assert result.command == ""
+    assert result.reason == "no silent command for framework"
@@ -0,0 +1,112 @@
+"""Tier-0 training labels and TieredBrain serving: state-dependent decisions never become local answers."""
+
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from PIL import Image, ImageDraw
+
+from brain_agent import BrainDecision
+from local_classifier import (
+    Sample,
+    ScreenClassifier,
+    TieredBrain,
+    journal_decision,
+    label_key,
+    load_training_samples,
+    screen_features,
+    servable,
+)
+
+
+def screen(shade: int) -> Image.Image:
+    image = Image.new("RGB", (320, 240), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 320, 28), fill=(shade, shade, 255))
+    draw.rectangle((220, 200, 300, 225), outline="black")
+    return image
+
+
+def decision(keys: list[list[str]], done: bool = False, confidence: float = 0.95) -> dict[str, Any]:
+    return {
+        "intent": "license",
+        "confidence": confidence,
+        "done": done,
+        "needs_human": False,
+        "reason": "model",
+        "actions": [{"keys": combo, "reason": ""} for combo in keys],
+    }
+
+
+def write_run(root: Path, name: str, decisions: list[dict[str, Any]]) -> None:
+    run = root / name
+    (run / "screenshots").mkdir(parents=True)
+    with (run / "events.jsonl").open("w", encoding="utf-8") as events:
+        for step, item in enumerate(decisions, start=1):
+            path = run / "screenshots" / f"step-{step:03d}.png"
+            screen(step * 20).save(path)
+            event = {"step": step, "observation": {"screenshot_path": str(path)}, "decision": item, "source": "model"}
+            events.write(json.dumps(event) + "\n")
+
+
+@pytest.mark.parametrize(
+    ("keys", "done", "expected"),
+    [
+        ([["alt", "n"]], False, True),
+        ([["space"]], False, False),
+        ([["alt", "a"], ["alt", "n"]], False, False),
+        ([["alt", "f"]], True, False),
+    ],
+)
+def test_servable(keys: list[list[str]], done: bool, expected: bool) -> None:
+    assert servable(journal_decision(decision(keys, done))) is expected
+
+
+def test_toggle_and_stateful_decisions_never_become_labels(tmp_path: Path) -> None:
+    write_run(
+        tmp_path,
+        "run-001",
+        [
+            decision([["space"]]),
+            decision([["alt", "a"], ["alt", "n"]]),
+            decision([["alt", "f"]], done=True),
+            decision([["alt", "n"]]),
+            decision([["alt", "n"]], confidence=0.5),
+        ],
+    )
+    samples, labels = load_training_samples(tmp_path, min_confidence=0.8, limit=100)
+    assert labels == [label_key(decision([["alt", "n"]]))]
+    assert len(samples) == 1
+
+
+class Escalation:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.last_source = "model"
+
+    def analyze_step(self, image_bytes: bytes, context: dict[str, Any], mime_type: str = "image/png") -> BrainDecision:
+        self.calls += 1
+        return journal_decision(decision([["alt", "n"]]))
+
+
+def png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(("keys", "served"), [([["alt", "n"]], True), ([["space"]], False)])
+def test_tiered_brain_escalates_unservable_labels(keys: list[list[str]], served: bool) -> None:
+    # A model trained before the filter existed can still carry a toggle label; it must not be served.
+    features = screen_features(screen(40))
+    classifier = ScreenClassifier([Sample(features, 0, "run-001")], [label_key(decision(keys))], [1.0], [1.0], k=1)
+    inner = Escalation()
+    brain = TieredBrain(inner, classifier, threshold=0.9)
+    result = brain.analyze_step(png(screen(40)), {})
+    assert (brain.last_source == "tier0") is served
+    assert inner.calls == (0 if served else 1)
+    assert result.actions[0].keys == ["alt", "n"]
@@ -0,0 +1,127 @@
+"""Record a GeminiBrain session with RecordingClient and replay it offline through RecordedClient."""
+
+from __future__ import annotations
+
+import io
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from brain_agent import GeminiBrain
+from model_client import RecordedClient, RecordingClient, RecordingMismatch, SimulatedClient, lognormal_latency
+
+MODEL = "gemini-test"
+REPLIES = [
+    json.dumps(
+        {
+            "ocr_text": text,
+            "language": "en",
+            "intent": intent,
+            "done": done,
+            "needs_human": False,
+            "confidence": 0.9,
+            "reason": "recorded",
+            "actions": [{"keys": keys, "reason": "next"}],
+        }
+    )
+    for text, intent, keys, done in (
+        ("Welcome to Setup", "confirm", ["alt", "n"], False),
+        ("License Agreement", "license", ["alt", "a"], False),
+        ("Setup has finished", "finish", ["enter"], True),
+    )
+]
+TITLES = ("Setup - Welcome", "Setup - License", "Setup - Finish")
+
+
+def screenshot(shade: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (shade, shade, 255)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def run_session(brain: GeminiBrain, images: list[bytes] | None = None) -> list[dict[str, object]]:
+    images = images or [screenshot(40 * step) for step in range(len(TITLES))]
+    decisions = []
+    for step, (title, image) in enumerate(zip(TITLES, images), start=1):
+        context = {"step_index": step, "window_title": title, "recent_actions": [["alt", "n"]] * (step - 1)}
+        decisions.append(asdict(brain.analyze_step(image, context)))
+    return decisions
+
+
+@pytest.fixture(params=[False, True], ids=["generate", "stream"])
+def stream(request: pytest.FixtureRequest) -> bool:
+    return bool(request.param)
+
+
+@pytest.fixture
+def recording(tmp_path: Path, stream: bool) -> tuple[Path, list[dict[str, object]]]:
+    path = tmp_path / "session.jsonl"
+    live = SimulatedClient(REPLIES, lognormal_latency(1.0), seed=5)
+    brain = GeminiBrain(model=MODEL, client=RecordingClient(live, path), session=True, stream=stream)
+    return path, run_session(brain)
+
+
+def replay_brain(path: Path, stream: bool, model: str = MODEL) -> GeminiBrain:
+    return GeminiBrain(model=model, client=RecordedClient.load(path, strict=True), session=True, stream=stream)
+
+
+def test_replay_reproduces_the_recorded_session(recording: tuple[Path, list[dict[str, object]]], stream: bool) -> None:
+    path, recorded = recording
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["text"] for line in lines] == REPLIES
+    brain = replay_brain(path, stream)
+    assert run_session(brain) == recorded
+    assert brain.client.calls == len(REPLIES)  # type: ignore[attr-defined]
+    # Replaying is read-only: the recording is byte-for-byte what the live session wrote.
+    assert path.read_text(encoding="utf-8").splitlines() == lines
+
+
+def test_missing_recording(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        RecordedClient.load(tmp_path / "absent.jsonl")
+    empty = tmp_path / "empty.jsonl"
+    empty.write_text("", encoding="utf-8")
+    with pytest.raises(ValueError, match="at least one reply"):
+        RecordedClient.load(empty)
+
+
+def test_strict_replay_past_the_end_of_the_recording(
+    recording: tuple[Path, list[dict[str, object]]],
+    stream: bool,
+) -> None:
+    path, _ = recording
+    brain = replay_brain(path, stream)
+    run_session(brain)
+    with pytest.raises(RecordingMismatch, match="call 4 has none"):
+        brain.analyze_step(screenshot(0), {"step_index": 4, "window_title": "Setup"})
+
+
+def test_strict_replay_rejects_a_diverging_request(
+    recording: tuple[Path, list[dict[str, object]]],
+    stream: bool,
+) -> None:
+    path, _ = recording
+    images = [screenshot(0), screenshot(200), screenshot(80)]
+    with pytest.raises(RecordingMismatch, match="call 2 sent a different request"):
+        run_session(replay_brain(path, stream), images)
+
+
+def test_strict_replay_rejects_another_model(
+    recording: tuple[Path, list[dict[str, object]]],
+    stream: bool,
+) -> None:
+    path, _ = recording
+    with pytest.raises(RecordingMismatch, match="asked gemini-other"):
+        run_session(replay_brain(path, stream, model="gemini-other"))
+
+
+def test_lenient_replay_cycles_through_the_recording(recording: tuple[Path, list[dict[str, object]]]) -> None:
+    path, recorded = recording
+    brain = GeminiBrain(model=MODEL, client=RecordedClient.load(path), session=False)
+    images = [screenshot(9)] * len(TITLES)
+    assert [d["intent"] for d in run_session(brain, images) + run_session(brain, images)] == [
+        d["intent"] for d in recorded * 2
+    ]
@@ -0,0 +1,299 @@
+"""Remote link over loopback: wire framing, frame deltas, HELLO authentication, takeover and resume."""
+
+from __future__ import annotations
+
+import dataclasses
+import random
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from PIL import Image, ImageDraw
+
+from installer_sim import DEFAULT_PAGES, FakeBrain, SimulatedWizard
+from model_client import lognormal_latency
+from remote_agent import RemoteAgent
+from remote_controller import RemoteController, run_remote_install
+from remote_protocol import (
+    BYE,
+    DELTA,
+    HEADER,
+    HELLO,
+    KEYFRAME,
+    MAGIC,
+    VERSION,
+    FrameDecoder,
+    FrameEncoder,
+    Link,
+    LinkClosed,
+)
+
+TOKEN = "s3cret"
+SIZE = (256, 192)
+
+
+class GatedScreen:
+    """The wizard as a screen, except that an armed capture blocks until released."""
+
+    def __init__(self, wizard: SimulatedWizard) -> None:
+        self.wizard = wizard
+        self.armed = False
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def press(self, key: str) -> None:
+        self.wizard.press(key)
+
+    def hotkey(self, *keys: str) -> None:
+        self.wizard.hotkey(*keys)
+
+    def screenshot(self, region: tuple[int, int, int, int] | None = None) -> Image.Image:
+        if self.armed:
+            self.armed = False
+            self.entered.set()
+            self.release.wait(5.0)
+        return self.wizard.screenshot(region)
+
+
+def start_agent(
+    controller: RemoteController,
+    wizard: SimulatedWizard,
+    token: str = TOKEN,
+    screen: Any = None,
+) -> RemoteAgent:
+    host, port = controller.address
+    agent = RemoteAgent(
+        f"{host}:{port}",
+        token,
+        screen=screen or wizard,
+        windows=wizard.windows,
+        launcher=lambda _file, _admin: (wizard, wizard.pid),
+        heartbeat=0.2,
+        reconnect_delay=0.05,
+    )
+    threading.Thread(target=agent.run, name="remote-agent", daemon=True).start()
+    return agent
+
+
+def wait_until(predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def same_pixels(left: Image.Image, right: Image.Image) -> bool:
+    return (left.size, left.mode, left.tobytes()) == (right.size, right.mode, right.tobytes())
+
+
+def noise(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    return Image.frombytes("RGB", SIZE, rng.randbytes(SIZE[0] * SIZE[1] * 3))
+
+
+def patched(base: Image.Image, box: tuple[int, int, int, int]) -> Image.Image:
+    image = base.copy()
+    ImageDraw.Draw(image).rectangle(box, fill=(255, 0, 0))
+    return image
+
+
+@pytest.fixture
+def tcp_pair() -> Iterator[tuple[socket.socket, socket.socket]]:
+    server = socket.create_server(("127.0.0.1", 0))
+    client = socket.create_connection(server.getsockname())
+    accepted, _ = server.accept()
+    server.close()
+    yield client, accepted
+    client.close()
+    accepted.close()
+
+
+@pytest.fixture
+def controller() -> Iterator[RemoteController]:
+    controller = RemoteController("127.0.0.1:0", TOKEN, heartbeat=0.2, reconnect_timeout=5.0)
+    yield controller
+    controller.close()
+
+
+@pytest.fixture
+def wizard() -> SimulatedWizard:
+    wizard = SimulatedWizard()
+    wizard.start()
+    return wizard
+
+
+def test_controller_off_loopback_needs_a_token() -> None:
+    with pytest.raises(ValueError, match="shared secret"):
+        RemoteController("0.0.0.0:0")
+
+
+def test_stray_connection_and_bad_token_leave_the_guest_link_alone(
+    controller: RemoteController,
+    wizard: SimulatedWizard,
+) -> None:
+    agent = start_agent(controller, wizard)
+    try:
+        assert controller.wait_for_guest(5.0)
+        link = controller._link
+        stray = socket.create_connection(controller.address)
+        intruder = start_agent(controller, SimulatedWizard(), token="wrong")
+        assert wait_until(lambda: controller.stats.rejected >= 1)
+        intruder.stop()
+        assert controller.screenshot().size == wizard.screenshot().size
+        assert controller._link is link
+        assert controller.stats.connections == 1
+        stray.close()
+    finally:
+        agent.stop()
+
+
+def test_link_frames_messages_with_the_binary_header(tcp_pair: tuple[socket.socket, socket.socket]) -> None:
+    sender, receiver = Link(tcp_pair[0]), Link(tcp_pair[1])
+    sender.send((HELLO, 7, b'{"session":"a"}'), (BYE, 8, b""))
+    assert receiver.recv() == (HELLO, 7, b'{"session":"a"}')
+    assert receiver.recv() == (BYE, 8, b"")
+    assert sender.stats.bytes_sent == receiver.stats.bytes_received == 2 * HEADER.size + 15
+    assert receiver.stats.received_by_type == {"hello": HEADER.size + 15, "bye": HEADER.size}
+
+
+@pytest.mark.parametrize(
+    "header",
+    [HEADER.pack(b"XX", VERSION, HELLO, 0, 0), HEADER.pack(MAGIC, VERSION + 1, HELLO, 0, 0)],
+    ids=["magic", "version"],
+)
+def test_link_rejects_a_foreign_header(tcp_pair: tuple[socket.socket, socket.socket], header: bytes) -> None:
+    tcp_pair[0].sendall(header)
+    with pytest.raises(LinkClosed, match="bad frame header"):
+        Link(tcp_pair[1]).recv()
+
+
+def test_link_reports_a_message_cut_short(tcp_pair: tuple[socket.socket, socket.socket]) -> None:
+    tcp_pair[0].sendall(HEADER.pack(MAGIC, VERSION, HELLO, 0, 10) + b"abc")
+    tcp_pair[0].close()
+    with pytest.raises(LinkClosed, match="mid-message"):
+        Link(tcp_pair[1]).recv()
+
+
+def test_frame_deltas_decode_pixel_exact() -> None:
+    encoder, decoder = FrameEncoder(max_delta_fraction=0.3), FrameDecoder()
+    first = noise(1)
+    frames = [
+        (first, KEYFRAME),
+        (patched(first, (10, 10, 40, 30)), DELTA),
+        (patched(first, (10, 10, 40, 30)), DELTA),  # unchanged: a delta with no rectangles
+        (noise(2), KEYFRAME),
+        (patched(noise(2), (200, 150, 250, 190)), DELTA),
+    ]
+    for actions_seq, (image, expected) in enumerate(frames, start=1):
+        kind, payload = encoder.encode(image, actions_seq, 1.5, None if actions_seq < 5 else 0)
+        assert kind == expected
+        frame = decoder.decode(kind, payload)
+        assert same_pixels(frame.image, image)
+        assert (frame.frame_id, frame.actions_seq, frame.keyframe) == (actions_seq, actions_seq, kind == KEYFRAME)
+    assert frame.returncode == 0
+
+    encoder.reset()
+    kind, payload = encoder.encode(first, 6, 1.0, None)
+    assert kind == KEYFRAME
+    assert same_pixels(FrameDecoder().decode(kind, payload).image, first)
+
+
+def test_delta_against_a_frame_the_host_never_decoded_is_refused() -> None:
+    encoder = FrameEncoder()
+    encoder.encode(noise(1), 0, 1.0, None)
+    kind, payload = encoder.encode(patched(noise(1), (0, 0, 20, 20)), 0, 1.0, None)
+    assert kind == DELTA
+    with pytest.raises(ValueError, match="delta against frame 1"):
+        FrameDecoder().decode(kind, payload)
+
+
+def test_resume_resends_lost_captures_and_unacked_actions_once(
+    controller: RemoteController,
+    wizard: SimulatedWizard,
+) -> None:
+    screen = GatedScreen(wizard)
+    agent = start_agent(controller, wizard, screen=screen)
+    try:
+        assert controller.wait_for_guest(5.0)
+        assert same_pixels(controller.screenshot(), wizard.screenshot())
+        assert same_pixels(controller.screenshot(), wizard.screenshot())
+        assert (controller.stats.keyframes, controller.stats.deltas) == (1, 1)
+
+        # The guest runs alt+n, then stalls in the capture sent with it; alt+b is queued behind the capture.
+        screen.armed = True
+        captured: list[Image.Image] = []
+
+        def run_step() -> None:
+            controller.hotkey("alt", "n")
+            captured.append(controller.screenshot())
+
+        step = threading.Thread(target=run_step)
+        step.start()
+        assert screen.entered.wait(5.0)
+        controller.hotkey("alt", "b")
+        assert wait_until(lambda: controller.stats.action_batches == 2)
+        agent.drop_link()  # The frame and the alt+b batch are lost with the connection.
+        screen.release.set()
+        step.join(10.0)
+
+        assert len(captured) == 1
+        assert wait_until(lambda: wizard.keys == ["alt+n", "alt+b"])
+        assert same_pixels(captured[0], wizard.screenshot())
+        stats = controller.stats
+        assert (stats.connections, stats.reconnects, agent.connections) == (2, 1, 2)
+        # alt+n was acked by the guest's HELLO; only alt+b and the capture go out again, the capture as a keyframe.
+        assert (stats.resent_batches, stats.resent_captures, stats.keyframes) == (1, 1, 2)
+        time.sleep(0.3)
+        assert wizard.keys == ["alt+n", "alt+b"]
+    finally:
+        agent.stop()
+
+
+def test_install_completes_across_a_dropped_link(controller: RemoteController, tmp_path: Path) -> None:
+    pages = tuple(
+        dataclasses.replace(page, progress_seconds=0.3) if page.progress_seconds else page for page in DEFAULT_PAGES
+    )
+    wizard = SimulatedWizard(pages)
+    brain = FakeBrain(wizard, lognormal_latency(30.0, sigma=0.25), seed=7)
+    host, port = controller.address
+
+    def launch(_file: str, _run_as_admin: bool) -> tuple[SimulatedWizard, int]:
+        wizard.start()
+        return wizard, wizard.pid
+
+    agent = RemoteAgent(
+        f"{host}:{port}",
+        TOKEN,
+        screen=wizard,
+        windows=wizard.windows,
+        launcher=launch,
+        heartbeat=0.2,
+        reconnect_delay=0.05,
+    )
+    guest = threading.Thread(target=agent.run, name="remote-agent", daemon=True)
+    guest.start()
+    done = threading.Event()
+
+    def drop_after(frames: int) -> None:
+        while not done.wait(0.005):
+            if controller.stats.keyframes + controller.stats.deltas >= frames:
+                agent.drop_link()
+                return
+
+    threading.Thread(target=drop_after, args=(4,), daemon=True).start()
+    try:
+        assert controller.wait_for_guest(5.0)
+        run = run_remote_install(controller, brain, "simulated-setup.exe", tmp_path)
+    finally:
+        done.set()
+        agent.stop()
+    assert run.status == "success", run.reason
+    assert wizard.returncode == 0
+    assert run.link["reconnects"] >= 1
+    assert agent.connections >= 2
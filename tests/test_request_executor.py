@@ -0,0 +1,128 @@
+"""ResilientClient hedging, stream retries, deadlines and pool recovery against SimulatedClient."""
+
+from __future__ import annotations
+
+import random
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from google.genai import types
+
+from model_client import LatencySampler, ModelReply, SimulatedClient, TextCallback, lognormal_latency
+from request_executor import POOL_WORKERS, DeadlineExceeded, RequestPolicy, ResilientClient
+
+MODEL = "gemini-test"
+CONFIG = types.GenerateContentConfig()
+CONTENTS = [types.Content(role="user", parts=[types.Part(text="next step?")])]
+
+
+def then(first_ms: float, rest: LatencySampler) -> LatencySampler:
+    """One call at first_ms, every later call from rest."""
+    calls = 0
+
+    def sample(rng: random.Random) -> float:
+        nonlocal calls
+        calls += 1
+        return first_ms if calls == 1 else rest(rng)
+
+    return sample
+
+
+class FailsAfterFirstText(SimulatedClient):
+    def stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        on_text: TextCallback,
+        system_instruction: str | None = None,
+    ) -> ModelReply:
+        self.calls += 1
+        on_text('{"intent": ')
+        raise ConnectionError("stream reset mid-reply")
+
+
+@pytest.fixture
+def executors() -> Iterator[list[ResilientClient]]:
+    created: list[ResilientClient] = []
+    yield created
+    for executor in created:
+        executor.close()
+
+
+def make(executors: list[ResilientClient], client: SimulatedClient, **policy: Any) -> ResilientClient:
+    executor = ResilientClient(client, RequestPolicy(**policy), seed=1)
+    executors.append(executor)
+    return executor
+
+
+def test_hedge_fires_after_p95_and_wins(executors: list[ResilientClient]) -> None:
+    fast = lognormal_latency(10.0, sigma=0.1)
+    client = SimulatedClient(['{"intent": "confirm"}'], fast, seed=3)
+    executor = make(executors, client, hedge=True, hedge_min_samples=10, attempt_timeout=5.0)
+    for _ in range(10):
+        executor.generate(MODEL, CONTENTS, CONFIG)
+    assert executor.stats.hedges == 0
+    hedge_after = executor._hedge_delay(MODEL)
+    assert hedge_after is not None and hedge_after < 0.1
+
+    client.latency = then(2000.0, fast)
+    started = time.monotonic()
+    reply = executor.generate(MODEL, CONTENTS, CONFIG)
+    assert reply.text == '{"intent": "confirm"}'
+    assert time.monotonic() - started < 1.0
+    assert executor.last_call["hedged"] and executor.last_call["hedge_won"]
+    assert (executor.stats.hedges, executor.stats.hedge_wins) == (1, 1)
+
+
+def test_no_hedge_before_enough_samples(executors: list[ResilientClient]) -> None:
+    client = SimulatedClient(["{}"], lognormal_latency(5.0, sigma=0.1), seed=3)
+    executor = make(executors, client, hedge=True, hedge_min_samples=10)
+    executor.generate(MODEL, CONTENTS, CONFIG)
+    assert executor._hedge_delay(MODEL) is None
+    assert executor.stats.hedges == 0
+
+
+def test_stream_is_not_retried_after_the_first_text(executors: list[ResilientClient]) -> None:
+    client = FailsAfterFirstText(["{}"], lognormal_latency(5.0))
+    executor = make(executors, client, backoff_base=0.01)
+    received: list[str] = []
+    with pytest.raises(ConnectionError, match="mid-reply"):
+        executor.stream(MODEL, CONTENTS, CONFIG, received.append)
+    assert received == ['{"intent": ']
+    assert client.calls == 1
+    assert executor.stats.retries == 0
+
+
+def test_stream_failing_before_any_text_is_retried(executors: list[ResilientClient]) -> None:
+    client = SimulatedClient(["{}"], lognormal_latency(5.0), failure_rate=1.0)
+    executor = make(executors, client, backoff_base=0.01, max_attempts=3)
+    with pytest.raises(ConnectionError):
+        executor.stream(MODEL, CONTENTS, CONFIG, lambda _text: None)
+    assert client.calls == 3
+    assert executor.stats.retries == 2
+
+
+def test_deadline_bounds_the_whole_call(executors: list[ResilientClient]) -> None:
+    client = SimulatedClient(["{}"], lognormal_latency(1500.0, sigma=0.01))
+    executor = make(executors, client, deadline=0.3, attempt_timeout=0.2, max_attempts=5, backoff_base=0.01)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        executor.generate(MODEL, CONTENTS, CONFIG)
+    assert time.monotonic() - started < 0.6
+    assert executor.stats.timeouts >= 1
+    assert executor.stats.failures == 1
+
+
+def test_hung_attempts_do_not_starve_later_calls(executors: list[ResilientClient]) -> None:
+    client = SimulatedClient(["{}"], lognormal_latency(1000.0, sigma=0.01))
+    executor = make(executors, client, attempt_timeout=0.05, max_attempts=1)
+    for _ in range(POOL_WORKERS):
+        with pytest.raises(DeadlineExceeded):
+            executor.generate(MODEL, CONTENTS, CONFIG)
+    client.latency = lognormal_latency(5.0, sigma=0.01)
+    executor.policy = RequestPolicy(attempt_timeout=0.5, max_attempts=1)
+    assert executor.generate(MODEL, CONTENTS, CONFIG).text == "{}"
+    assert executor.stats.pool_resets == 1
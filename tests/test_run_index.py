@@ -0,0 +1,55 @@
+"""RunIndex ingest: malformed journal lines are counted and skipped, never abort the ingest."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+from run_index import RunIndex
+
+
+def decision(intent: str, done: bool = False) -> dict[str, Any]:
+    return {"intent": intent, "confidence": 0.9, "done": done, "needs_human": False, "actions": []}
+
+
+def write_run(root: Path, name: str, lines: list[Any]) -> None:
+    run = root / name
+    run.mkdir(parents=True)
+    with (run / "events.jsonl").open("w", encoding="utf-8") as events:
+        for line in lines:
+            events.write((line if isinstance(line, str) else json.dumps(line)) + "\n")
+
+
+def test_events_without_a_usable_step_are_malformed(tmp_path: Path) -> None:
+    runs = tmp_path / "runs"
+    write_run(
+        runs,
+        "run-20260101-120000",
+        [
+            {"step": 1, "decision": decision("confirm"), "upload": {"model_ms": 120.0}},
+            {"decision": decision("license")},
+            {"step": "two", "decision": decision("license")},
+            {"step": None, "kind": "timings", "capture_ms": 5.0},
+            {"step": 2, "decision": "not a decision"},
+            '{"step": 3, "decis',
+            {"step": 3, "kind": "timings", "capture_ms": 7.0},
+            {"step": "3", "decision": decision("finish", done=True)},
+        ],
+    )
+    write_run(runs, "run-20260101-130000", [{"step": 1, "decision": decision("confirm", done=True)}])
+    index = RunIndex(tmp_path / "index.db")
+    try:
+        stats = index.ingest(runs)
+        assert (stats.ingested, stats.steps, stats.malformed_lines) == (2, 3, 5)
+        assert index.summary()[0]["runs"] == 2
+        rows = index._rows(
+            "SELECT step, intent, capture_ms FROM steps JOIN runs ON runs.id = steps.run_id ORDER BY runs.path, step"
+        )
+        assert rows == [
+            {"step": 1, "intent": "confirm", "capture_ms": None},
+            {"step": 3, "intent": "finish", "capture_ms": 7.0},
+            {"step": 1, "intent": "confirm", "capture_ms": None},
+        ]
+    finally:
+        index.close()
@@ -0,0 +1,154 @@
+"""WindowTracker caching, event invalidation, process hand-off and polling against FakeWindowSystem."""
+
+from __future__ import annotations
+
+import pytest
+
+import window_tracker
+from window_tracker import FakeWindowSystem, WindowTracker, descendant_pids
+
+ROOT = 100
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(window_tracker.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def system() -> FakeWindowSystem:
+    system = FakeWindowSystem()
+    system.spawn(ROOT)
+    system.create_window(999, "Desktop")
+    return system
+
+
+def test_descendant_pids_follows_the_tree_and_ignores_cycles() -> None:
+    parents = {ROOT: 1, 200: ROOT, 300: 200, 400: 1, 500: 500, 600: 700, 700: 600}
+    assert descendant_pids(ROOT, parents) == {ROOT, 200, 300}
+    assert descendant_pids(600, parents) == {600, 700}
+
+
+def test_lookups_are_served_from_cache_until_an_event(clock: Clock, system: FakeWindowSystem) -> None:
+    hwnd = system.create_window(ROOT, "Setup - Welcome")
+    tracker = WindowTracker(system, ROOT)
+    assert tracker.events_enabled
+    assert [tracker.target() for _ in range(5)] == [hwnd] * 5
+    assert tracker.stats.scans == 1
+    assert tracker.stats.cache_hits == 4
+    assert system.enum_calls == 1
+
+
+def test_create_event_from_the_process_tree_invalidates(clock: Clock, system: FakeWindowSystem) -> None:
+    first = system.create_window(ROOT, "Setup - Welcome")
+    tracker = WindowTracker(system, ROOT)
+    assert tracker.target() == first
+    second = system.create_window(ROOT, "Setup - License")
+    system.foreground = second
+    assert tracker.target() == second
+    assert tracker.stats.scans == 2
+
+
+def test_events_from_unrelated_processes_keep_the_cache(clock: Clock, system: FakeWindowSystem) -> None:
+    hwnd = system.create_window(ROOT, "Setup")
+    tracker = WindowTracker(system, ROOT)
+    tracker.target()
+    system.spawn(999)
+    system.create_window(999, "Notepad")
+    assert tracker.target() == hwnd
+    # The unknown pid only cost a process-tree refresh, not a window enumeration.
+    assert tracker.stats.scans == 1
+    assert tracker.stats.process_refreshes == 2
+
+
+def test_destroying_or_hiding_the_target_invalidates(clock: Clock, system: FakeWindowSystem) -> None:
+    wizard = system.create_window(ROOT, "Setup - Ready")
+    splash = system.create_window(ROOT, "Setup")
+    tracker = WindowTracker(system, ROOT)
+    assert tracker.target() == wizard
+    system.destroy_window(wizard)
+    assert tracker.target() == splash
+    system.set_visible(splash, False)
+    assert tracker.target() is None
+    assert tracker.stats.scans == 3
+
+
+def test_name_event_makes_an_untitled_window_a_candidate(clock: Clock, system: FakeWindowSystem) -> None:
+    bootstrapper = system.create_window(ROOT, "Extracting")
+    system.spawn(200, parent=ROOT)
+    tracker = WindowTracker(system, ROOT)
+    untitled = system.create_window(200, "")
+    assert tracker.target() == bootstrapper
+    system.set_title(untitled, "Setup - Installing")
+    assert tracker.target() == untitled
+    assert tracker.window().title == "Setup - Installing"
+
+
+def test_name_event_on_the_target_needs_no_rescan(clock: Clock, system: FakeWindowSystem) -> None:
+    hwnd = system.create_window(ROOT, "Setup - Welcome")
+    tracker = WindowTracker(system, ROOT)
+    assert tracker.window().title == "Setup - Welcome"
+    system.set_title(hwnd, "Setup - License")
+    assert tracker.window().title == "Setup - License"
+    assert tracker.stats.scans == 1
+
+
+def test_window_from_a_spawned_child_is_handed_off(clock: Clock, system: FakeWindowSystem) -> None:
+    bootstrapper = system.create_window(ROOT, "Extracting")
+    tracker = WindowTracker(system, ROOT)
+    assert tracker.target() == bootstrapper
+    # setup.exe starts msiexec, which starts the UI process that owns the wizard.
+    system.spawn(200, parent=ROOT)
+    system.spawn(300, parent=200)
+    wizard = system.create_window(300, "Product Setup")
+    assert tracker.target() == wizard
+    assert tracker.pids == {ROOT, 200, 300}
+    assert tracker.spawn_order == [ROOT, 200, 300]
+    system.destroy_window(wizard)
+    assert tracker.target() == bootstrapper
+
+
+def test_polling_fallback_when_subscribe_is_unsupported(clock: Clock, system: FakeWindowSystem) -> None:
+    system.supports_events = False
+    first = system.create_window(ROOT, "Setup - Welcome")
+    tracker = WindowTracker(system, ROOT, max_age=1.0, event_max_age=5.0)
+    assert not tracker.events_enabled
+    assert tracker.target() == first
+    second = system.create_window(ROOT, "Setup - License")
+    system.foreground = second
+    clock.now += 0.5
+    assert tracker.target() == first
+    clock.now += 0.6
+    assert tracker.target() == second
+    assert tracker.stats.events == 0
+    assert tracker.stats.scans == 2
+
+
+def test_event_driven_cache_still_expires(clock: Clock, system: FakeWindowSystem) -> None:
+    hwnd = system.create_window(ROOT, "Setup")
+    tracker = WindowTracker(system, ROOT, max_age=1.0, event_max_age=5.0)
+    tracker.target()
+    clock.now += 4.0
+    assert tracker.target() == hwnd
+    assert tracker.stats.scans == 1
+    clock.now += 1.5
+    assert tracker.target() == hwnd
+    assert tracker.stats.scans == 2
+
+
+def test_close_unsubscribes(clock: Clock, system: FakeWindowSystem) -> None:
+    tracker = WindowTracker(system, ROOT)
+    tracker.close()
+    assert not tracker.events_enabled
+    system.create_window(ROOT, "Setup")
+    assert tracker.stats.events == 0
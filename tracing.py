@@ -0,0 +1,167 @@
+"""Lightweight tracing spans with a run summary and Prometheus/OpenMetrics export."""
+
+from __future__ import annotations
+
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+METRIC_NAME = "installer_agent_span_seconds"
+SUMMARY_QUANTILES = (0.5, 0.95)
+
+
+@dataclass(slots=True)
+class SpanRecord:
+    name: str
+    step: int | None
+    start_s: float
+    duration_ms: float
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "step", "attrs", "started")
+
+    def __init__(self, tracer: Tracer, name: str, step: int | None, attrs: dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.step = step
+        self.attrs = attrs
+        self.started = 0.0
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> Span:
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        ended = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish(self, ended)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects timed spans from any thread; a disabled tracer hands out one shared no-op span."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.step: int | None = None
+        self.origin = time.perf_counter()
+        self.records: list[SpanRecord] = []
+        self._pending: list[SpanRecord] = []
+        self._lock = threading.Lock()
+
+    def reset(self, enabled: bool) -> None:
+        """Start a new run: drop recorded spans and measure from now."""
+        with self._lock:
+            self.enabled = enabled
+            self.step = None
+            self.origin = time.perf_counter()
+            self.records = []
+            self._pending = []
+
+    def span(self, name: str, step: int | None = None, **attrs: Any) -> Span | _NullSpan:
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, self.step if step is None else step, attrs)
+
+    def _finish(self, span: Span, ended: float) -> None:
+        record = SpanRecord(
+            name=span.name,
+            step=span.step,
+            start_s=round(span.started - self.origin, 6),
+            duration_ms=round((ended - span.started) * 1000, 3),
+            attrs=span.attrs,
+        )
+        with self._lock:
+            self.records.append(record)
+            self._pending.append(record)
+
+    def drain(self) -> list[SpanRecord]:
+        """Spans finished since the previous drain, for incremental event logging."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def summary(self, wall_seconds: float) -> dict[str, dict[str, float]]:
+        by_name: dict[str, list[float]] = {}
+        with self._lock:
+            for record in self.records:
+                by_name.setdefault(record.name, []).append(record.duration_ms)
+        report: dict[str, dict[str, float]] = {}
+        for name, durations in sorted(by_name.items()):
+            ordered = sorted(durations)
+            total = sum(ordered)
+            report[name] = {
+                "count": len(ordered),
+                "p50_ms": round(statistics.median(ordered), 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+                "total_s": round(total / 1000, 3),
+                "wall_share": round(total / 1000 / wall_seconds, 4) if wall_seconds > 0 else 0.0,
+            }
+        return report
+
+    def write_metrics(self, path: Path, openmetrics: bool = False) -> None:
+        by_name: dict[str, list[float]] = {}
+        with self._lock:
+            for record in self.records:
+                by_name.setdefault(record.name, []).append(record.duration_ms / 1000)
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of installer agent pipeline spans.",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for name, durations in sorted(by_name.items()):
+            ordered = sorted(durations)
+            for quantile in SUMMARY_QUANTILES:
+                value = ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+                lines.append(f'{METRIC_NAME}{{span="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{span="{name}"}} {sum(ordered):.6f}')
+            lines.append(f'{METRIC_NAME}_count{{span="{name}"}} {len(ordered)}')
+        if openmetrics:
+            lines.append("# EOF")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def format_summary(report: dict[str, dict[str, float]], wall_seconds: float) -> str:
+    header = f"{'span':<22} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'total s':>9} {'wall %':>7}"
+    rows = [header, "-" * len(header)]
+    for name, entry in report.items():
+        rows.append(
+            f"{name:<22} {entry['count']:>6} {entry['p50_ms']:>10.2f} {entry['p95_ms']:>10.2f} "
+            f"{entry['total_s']:>9.3f} {entry['wall_share'] * 100:>6.1f}%"
+        )
+    rows.append(f"wall time {wall_seconds:.3f}s (spans on concurrent stages overlap, so shares can exceed 100%)")
+    return "\n".join(rows)
+
+
+TRACER = Tracer()
+
+
+def span(name: str, step: int | None = None, **attrs: Any) -> Span | _NullSpan:
+    return TRACER.span(name, step, **attrs)
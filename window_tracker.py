@@ -0,0 +1,287 @@
+"""Cached, event-driven tracking of the installer's top-level window."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Protocol
+
+EVENT_CREATE = "create"
+EVENT_DESTROY = "destroy"
+EVENT_SHOW = "show"
+EVENT_HIDE = "hide"
+EVENT_NAME = "name"
+
+WindowEventCallback = Callable[[str, int], None]
+
+
+class WindowBackend(Protocol):
+    def enum_windows(self) -> list[int]: ...
+
+    def is_window(self, hwnd: int) -> bool: ...
+
+    def is_visible(self, hwnd: int) -> bool: ...
+
+    def window_pid(self, hwnd: int) -> int: ...
+
+    def window_title(self, hwnd: int) -> str: ...
+
+    def window_rect(self, hwnd: int) -> tuple[int, int, int, int] | None: ...
+
+    def foreground_window(self) -> int: ...
+
+    def parent_pids(self) -> dict[int, int]: ...
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        """Start delivering window events; return False when unsupported."""
+        ...
+
+    def unsubscribe(self) -> None: ...
+
+
+@dataclass(slots=True)
+class TrackerStats:
+    lookups: int = 0
+    cache_hits: int = 0
+    scans: int = 0
+    process_refreshes: int = 0
+    events: int = 0
+
+
+@dataclass(slots=True)
+class TrackedWindow:
+    hwnd: int
+    pid: int
+    title: str
+    rect: tuple[int, int, int, int] | None
+
+
+def descendant_pids(root_pid: int, parents: dict[int, int]) -> set[int]:
+    children: dict[int, list[int]] = {}
+    for pid, parent in parents.items():
+        if pid != parent:
+            children.setdefault(parent, []).append(pid)
+    tree = {root_pid}
+    pending = [root_pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            if child not in tree:
+                tree.add(child)
+                pending.append(child)
+    return tree
+
+
+class WindowTracker:
+    """Tracks the installer process tree and caches its visible titled window.
+
+    The cached hwnd is reused until a window event from the process tree
+    invalidates it or max_age seconds have passed (event_max_age when the
+    backend delivers events). Only then is a full window enumeration performed.
+    Windows shown by unknown processes trigger a process-tree refresh so
+    hand-offs to child installers (msiexec, elevated helpers) are picked up.
+    """
+
+    def __init__(
+        self,
+        backend: WindowBackend,
+        root_pid: int,
+        max_age: float = 1.0,
+        event_max_age: float = 5.0,
+    ) -> None:
+        self.backend = backend
+        self.root_pid = root_pid
+        self.max_age = max_age
+        self.event_max_age = event_max_age
+        self.stats = TrackerStats()
+        self.pids: set[int] = {root_pid}
+        self.spawn_order: list[int] = [root_pid]
+        self._hwnd: int | None = None
+        self._dirty = True
+        self._pids_stale = False
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self.events_enabled = backend.subscribe(self._on_event)
+
+    def close(self) -> None:
+        if self.events_enabled:
+            self.backend.unsubscribe()
+            self.events_enabled = False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._dirty = True
+
+    def window(self) -> TrackedWindow | None:
+        hwnd = self.target()
+        if hwnd is None:
+            return None
+        return TrackedWindow(
+            hwnd=hwnd,
+            pid=self.backend.window_pid(hwnd),
+            title=self.backend.window_title(hwnd),
+            rect=self.backend.window_rect(hwnd),
+        )
+
+    def target(self) -> int | None:
+        with self._lock:
+            self.stats.lookups += 1
+            hwnd = self._hwnd
+            max_age = self.event_max_age if self.events_enabled else self.max_age
+            fresh = time.monotonic() - self._scanned_at < max_age
+            if self._pids_stale and not self._dirty:
+                self._pids_stale = False
+                known = len(self.pids)
+                self._refresh_pids()
+                self._dirty = len(self.pids) != known
+            if hwnd is not None and not self._dirty and fresh and self._usable(hwnd):
+                self.stats.cache_hits += 1
+                return hwnd
+            self._hwnd = self._scan()
+            self._dirty = False
+            self._scanned_at = time.monotonic()
+            return self._hwnd
+
+    def _usable(self, hwnd: int) -> bool:
+        return self.backend.is_window(hwnd) and self.backend.is_visible(hwnd)
+
+    def _refresh_pids(self) -> None:
+        self.stats.process_refreshes += 1
+        tree = descendant_pids(self.root_pid, self.backend.parent_pids())
+        for pid in sorted(tree - self.pids):
+            self.spawn_order.append(pid)
+        self.pids |= tree
+
+    def _scan(self) -> int | None:
+        self.stats.scans += 1
+        self._pids_stale = False
+        self._refresh_pids()
+        foreground = self.backend.foreground_window()
+        matches: dict[int, int] = {}
+        for hwnd in self.backend.enum_windows():
+            if not self.backend.is_visible(hwnd):
+                continue
+            pid = self.backend.window_pid(hwnd)
+            # Past a process's first titled window only the foreground one matters (a dialog it opened).
+            if pid not in self.pids or (pid in matches and hwnd != foreground):
+                continue
+            if self.backend.window_title(hwnd).strip():
+                if hwnd == foreground:
+                    return hwnd
+                matches[pid] = hwnd
+        if not matches:
+            return None
+        newest = max(matches, key=self.spawn_order.index)
+        return matches[newest]
+
+    def _on_event(self, event: str, hwnd: int) -> None:
+        with self._lock:
+            self.stats.events += 1
+            if hwnd == self._hwnd:
+                if event in (EVENT_DESTROY, EVENT_HIDE):
+                    self._dirty = True
+            elif event in (EVENT_CREATE, EVENT_SHOW):
+                if self.backend.window_pid(hwnd) in self.pids:
+                    self._dirty = True
+                else:
+                    self._pids_stale = True
+            elif event == EVENT_NAME and self.backend.window_pid(hwnd) in self.pids:
+                # An untitled window of the tree (created before its caption was set) may now qualify.
+                self._dirty = True
+
+
+@dataclass(slots=True)
+class FakeWindow:
+    pid: int
+    title: str
+    rect: tuple[int, int, int, int] = (0, 0, 640, 480)
+    visible: bool = True
+    labels: tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class FakeWindowSystem:
+    """In-memory window system implementing WindowBackend for tests and benchmarks."""
+
+    windows: dict[int, FakeWindow] = field(default_factory=dict)
+    parents: dict[int, int] = field(default_factory=dict)
+    foreground: int = 0
+    supports_events: bool = True
+    enum_calls: int = 0
+    title_calls: int = 0
+    _callback: WindowEventCallback | None = None
+    _next_hwnd: int = 0x1000
+
+    def spawn(self, pid: int, parent: int = 0) -> None:
+        self.parents[pid] = parent
+
+    def create_window(self, pid: int, title: str, visible: bool = True) -> int:
+        self._next_hwnd += 4
+        hwnd = self._next_hwnd
+        self.windows[hwnd] = FakeWindow(pid=pid, title=title, visible=visible)
+        self._emit(EVENT_CREATE, hwnd)
+        if visible:
+            self._emit(EVENT_SHOW, hwnd)
+        return hwnd
+
+    def destroy_window(self, hwnd: int) -> None:
+        self.windows.pop(hwnd, None)
+        self._emit(EVENT_DESTROY, hwnd)
+
+    def set_visible(self, hwnd: int, visible: bool) -> None:
+        self.windows[hwnd].visible = visible
+        self._emit(EVENT_SHOW if visible else EVENT_HIDE, hwnd)
+
+    def set_title(self, hwnd: int, title: str) -> None:
+        self.windows[hwnd].title = title
+        self._emit(EVENT_NAME, hwnd)
+
+    def set_labels(self, hwnd: int, labels: tuple[str, ...]) -> None:
+        self.windows[hwnd].labels = labels
+
+    def _emit(self, event: str, hwnd: int) -> None:
+        if self._callback is not None:
+            self._callback(event, hwnd)
+
+    def enum_windows(self) -> list[int]:
+        self.enum_calls += 1
+        return list(self.windows)
+
+    def is_window(self, hwnd: int) -> bool:
+        return hwnd in self.windows
+
+    def is_visible(self, hwnd: int) -> bool:
+        window = self.windows.get(hwnd)
+        return window is not None and window.visible
+
+    def window_pid(self, hwnd: int) -> int:
+        window = self.windows.get(hwnd)
+        return window.pid if window is not None else 0
+
+    def window_title(self, hwnd: int) -> str:
+        self.title_calls += 1
+        window = self.windows.get(hwnd)
+        return window.title if window is not None else ""
+
+    def window_rect(self, hwnd: int) -> tuple[int, int, int, int] | None:
+        window = self.windows.get(hwnd)
+        return window.rect if window is not None else None
+
+    def window_labels(self, hwnd: int) -> list[str]:
+        window = self.windows.get(hwnd)
+        return list(window.labels) if window is not None else []
+
+    def foreground_window(self) -> int:
+        return self.foreground
+
+    def parent_pids(self) -> dict[int, int]:
+        return dict(self.parents)
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        if not self.supports_events:
+            return False
+        self._callback = callback
+        return True
+
+    def unsubscribe(self) -> None:
+        self._callback = None